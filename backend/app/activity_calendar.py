@@ -0,0 +1,99 @@
+from datetime import date, datetime
+from typing import Dict, Any, Optional
+
+def _trailing_ones(bits: int) -> int:
+    return (bits ^ (bits + 1)).bit_length() - 1
+
+class ActivityCalendar:
+    """The days a user was active, one bit per day
+
+    Bit k is set if the user was active k days before `last_day`, the most
+    recent active day. A year of history is 46 bytes, and streaks, active-day
+    counts and completion ratios are a few integer operations on it instead of
+    a scan of user_behavior. Stored on the user's progress document as a hex
+    string (see fields()).
+    """
+
+    def __init__(self, bits: int = 0, last_day: Optional[date] = None, longest_streak: int = 0):
+        self.bits = bits
+        self.last_day = last_day
+        self.longest_streak = longest_streak
+
+    @classmethod
+    def from_progress(cls, progress: Optional[Dict[str, Any]]) -> "ActivityCalendar":
+        progress = progress or {}
+        if progress.get("activity_last_day"):
+            return cls(
+                int(progress.get("activity_days") or "0", 16),
+                date.fromisoformat(progress["activity_last_day"]),
+                progress.get("longest_streak", 0)
+            )
+
+        # Progress from before the calendar: start from the streak it recorded
+        calendar = cls()
+        streak = progress.get("current_streak", 0)
+        last_activity = progress.get("last_activity")
+        if streak > 0 and isinstance(last_activity, datetime):
+            calendar.bits = (1 << streak) - 1
+            calendar.last_day = last_activity.date()
+            calendar.longest_streak = streak
+        return calendar
+
+    def is_active(self, day: date) -> bool:
+        if self.last_day is None or day > self.last_day:
+            return False
+        return bool(self.bits >> (self.last_day - day).days & 1)
+
+    def record(self, day: date) -> bool:
+        """Mark a day active; False if it already was"""
+        if self.last_day is None:
+            self.bits, self.last_day, position = 1, day, 0
+        elif day > self.last_day:
+            self.bits = (self.bits << (day - self.last_day).days) | 1
+            self.last_day, position = day, 0
+        else:
+            position = (self.last_day - day).days
+            if self.bits >> position & 1:
+                return False
+            self.bits |= 1 << position
+
+        # A late event can join two runs, so measure the run through the new day
+        below = ~self.bits & ((1 << position) - 1)
+        run = _trailing_ones(self.bits >> position) + position - below.bit_length()
+        self.longest_streak = max(self.longest_streak, run)
+        return True
+
+    def current_streak(self, today: Optional[date] = None) -> int:
+        """Active days in a row up to today, or up to yesterday while today is still open"""
+        today = today or datetime.utcnow().date()
+        if self.last_day is None or (today - self.last_day).days > 1:
+            return 0
+        return _trailing_ones(self.bits)
+
+    def active_days(self) -> int:
+        return bin(self.bits).count("1")
+
+    def completion(self, days: int, today: Optional[date] = None) -> float:
+        """Share of the `days` days up to today the user was active"""
+        today = today or datetime.utcnow().date()
+        if self.last_day is None:
+            return 0.0
+        gap = (today - self.last_day).days
+        if gap >= days:
+            return 0.0
+        window = self.bits & ((1 << (days - gap)) - 1)
+        return bin(window).count("1") / days
+
+    def fields(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """Progress document fields holding the calendar and the figures derived from it"""
+        today = today or datetime.utcnow().date()
+        return {
+            "activity_days": format(self.bits, "x"),
+            "activity_last_day": self.last_day.isoformat() if self.last_day else None,
+            "current_streak": self.current_streak(today),
+            "longest_streak": self.longest_streak,
+            "active_days": self.active_days(),
+            "daily_completion": self.completion(1, today),
+            "weekly_completion": self.completion(7, today),
+            "monthly_completion": self.completion(30, today)
+        }
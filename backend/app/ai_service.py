@@ -1,22 +1,178 @@
 import os
 import json
-from typing import Dict, List, Any, Optional
+import asyncio
+import hashlib
+import importlib.util
+import random
+import time
+from typing import Dict, List, Any, Optional, AsyncIterator
 from datetime import datetime, timedelta
-from emergentintegrations.llm.chat import LlmChat, UserMessage
 from .database import (
     chat_history_collection, 
     user_behavior_collection, 
     user_progress_collection,
     users_collection
 )
+from .activity_calendar import ActivityCalendar
 from .models import User, UserBehavior
+from .insights_worker import insights_worker
+from .metrics import cache_requests_total, llm_request_duration_seconds
 from dotenv import load_dotenv
 
 load_dotenv()
 
+class LLMBackend:
+    """Interface for the chat model behind the AI routes"""
+    
+    name = "base"
+    
+    def stream_message(self, session_id: str, system_message: str, text: str) -> AsyncIterator[str]:
+        """Yield the response to a user message chunk by chunk"""
+        raise NotImplementedError
+    
+    async def send_message(self, session_id: str, system_message: str, text: str) -> str:
+        """Get the complete response to a user message"""
+        chunks = []
+        async for chunk in self.stream_message(session_id, system_message, text):
+            chunks.append(chunk)
+        return "".join(chunks)
+    
+    def is_available(self) -> bool:
+        """Whether the backend can currently serve requests"""
+        return True
+
+class EmergentLLMBackend(LLMBackend):
+    """Gemini via emergentintegrations (requires network and API key)"""
+    
+    name = "emergent"
+    
+    def __init__(self, api_key: str, provider: str = "gemini", model: str = "gemini-2.0-flash"):
+        self.api_key = api_key
+        self.provider = provider
+        self.model = model
+    
+    async def send_message(self, session_id: str, system_message: str, text: str) -> str:
+        """Send a message through LlmChat"""
+        # Imported lazily so the AI routes load without emergentintegrations installed
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+        
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=session_id,
+            system_message=system_message
+        ).with_model(self.provider, self.model)
+        
+        return await chat.send_message(UserMessage(text=text))
+    
+    async def stream_message(self, session_id: str, system_message: str, text: str) -> AsyncIterator[str]:
+        """LlmChat has no streaming API, so the full response is a single chunk"""
+        yield await self.send_message(session_id, system_message, text)
+    
+    def is_available(self) -> bool:
+        return importlib.util.find_spec("emergentintegrations") is not None
+
+class LocalLLMBackend(LLMBackend):
+    """Deterministic offline stand-in for load testing the AI routes
+    
+    The response text and timing are derived from a hash of the seed, session and
+    message, so the same request always produces the same tokens and latency.
+    """
+    
+    name = "local"
+    
+    # Latency profiles: time to first token, time per subsequent token, token count
+    # and relative jitter applied to each delay
+    PROFILES = {
+        "instant": {"first_token_ms": 0, "token_ms": 0, "tokens": 40, "jitter": 0.0},
+        "fast": {"first_token_ms": 150, "token_ms": 5, "tokens": 80, "jitter": 0.1},
+        "realistic": {"first_token_ms": 600, "token_ms": 20, "tokens": 180, "jitter": 0.25},
+        "slow": {"first_token_ms": 2500, "token_ms": 45, "tokens": 300, "jitter": 0.4}
+    }
+    
+    VOCABULARY = [
+        "stretch", "breathe", "posture", "mobility", "focus", "energy", "rest", "hydrate",
+        "walk", "balance", "core", "shoulders", "neck", "mindful", "routine", "consistency",
+        "progress", "streak", "recovery", "sleep", "stress", "calm", "strength", "daily",
+        "gentle", "minutes", "habit", "goal", "today", "try", "your", "a", "and", "to", "with"
+    ]
+    
+    def __init__(
+        self,
+        profile: str = "fast",
+        seed: int = 0,
+        first_token_ms: Optional[float] = None,
+        token_ms: Optional[float] = None,
+        tokens: Optional[int] = None,
+        jitter: Optional[float] = None
+    ):
+        if profile not in self.PROFILES:
+            raise ValueError(f"Unknown LLM latency profile: {profile}")
+        
+        settings = dict(self.PROFILES[profile])
+        overrides = {"first_token_ms": first_token_ms, "token_ms": token_ms, "tokens": tokens, "jitter": jitter}
+        settings.update({key: value for key, value in overrides.items() if value is not None})
+        
+        self.profile = profile
+        self.seed = seed
+        self.first_token_ms = float(settings["first_token_ms"])
+        self.token_ms = float(settings["token_ms"])
+        self.tokens = int(settings["tokens"])
+        self.jitter = float(settings["jitter"])
+    
+    def _rng(self, session_id: str, text: str) -> random.Random:
+        """Random generator seeded from the request so output is reproducible"""
+        digest = hashlib.sha256(f"{self.seed}:{session_id}:{text}".encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+    
+    def _delay(self, rng: random.Random, base_ms: float) -> float:
+        """Delay in seconds with the profile's jitter applied"""
+        if base_ms <= 0:
+            return 0.0
+        factor = 1 + rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, base_ms * factor) / 1000
+    
+    async def stream_message(self, session_id: str, system_message: str, text: str) -> AsyncIterator[str]:
+        """Yield whitespace-separated tokens with the configured timing"""
+        rng = self._rng(session_id, text)
+        
+        for index in range(self.tokens):
+            delay = self._delay(rng, self.first_token_ms if index == 0 else self.token_ms)
+            if delay:
+                await asyncio.sleep(delay)
+            else:
+                # Still yield to the event loop so streaming behaves like a real backend
+                await asyncio.sleep(0)
+            
+            word = rng.choice(self.VOCABULARY)
+            yield word if index == 0 else f" {word}"
+
+def get_llm_backend(name: Optional[str] = None) -> LLMBackend:
+    """Build the LLM backend selected by LLM_BACKEND (emergent or local)"""
+    name = (name or os.getenv("LLM_BACKEND", "emergent")).lower()
+    
+    if name == "emergent":
+        return EmergentLLMBackend(api_key=os.getenv("GEMINI_API_KEY", "your-gemini-api-key"))
+    
+    if name == "local":
+        def _env_number(key: str, cast):
+            value = os.getenv(key)
+            return cast(value) if value not in (None, "") else None
+        
+        return LocalLLMBackend(
+            profile=os.getenv("LLM_LOCAL_PROFILE", "fast"),
+            seed=int(os.getenv("LLM_LOCAL_SEED", "0")),
+            first_token_ms=_env_number("LLM_LOCAL_FIRST_TOKEN_MS", float),
+            token_ms=_env_number("LLM_LOCAL_TOKEN_MS", float),
+            tokens=_env_number("LLM_LOCAL_TOKENS", int),
+            jitter=_env_number("LLM_LOCAL_JITTER", float)
+        )
+    
+    raise ValueError(f"Unknown LLM backend: {name}")
+
 class WellnessAIService:
-    def __init__(self):
+    def __init__(self, llm_backend: Optional[LLMBackend] = None):
         self.gemini_api_key = os.getenv("GEMINI_API_KEY", "your-gemini-api-key")
+        self.llm_backend = llm_backend or get_llm_backend()
         self.system_message = """You are Welly, an AI wellness coach for Team Welly, a comprehensive health and wellness platform.
 
 Your role:
@@ -55,36 +211,31 @@ Always prioritize user safety and suggest consulting healthcare professionals fo
             # Create personalized system message
             personalized_system = self._create_personalized_system_message(user_data)
             
-            # Initialize chat with Gemini
-            chat = LlmChat(
-                api_key=self.gemini_api_key,
-                session_id=session_id,
-                system_message=personalized_system
-            ).with_model("gemini", "gemini-2.0-flash")
-            
             # Get recent chat history for context
             recent_messages = await self._get_recent_chat_history(user_id, session_id)
             
             # Create user message with context
             contextual_message = self._create_contextual_message(message, user_data, recent_messages)
-            user_message = UserMessage(text=contextual_message)
             
             # Get AI response
-            ai_response = await chat.send_message(user_message)
+            with llm_request_duration_seconds.labels(self.llm_backend.name, "total").time():
+                ai_response = await self.llm_backend.send_message(session_id, personalized_system, contextual_message)
             
             # Save chat history
             await self._save_chat_message(user_id, session_id, message, ai_response, user_data)
             
-            # Generate user insights
-            insights = await self._generate_user_insights(user_id, user_data)
-            
-            # Generate recommendations
-            recommendations = await self._generate_recommendations(user_id, user_data)
+            # Use the precomputed insights snapshot, building it inline only on first use
+            snapshot = insights_worker.get_snapshot(user_id)
+            cache_requests_total.labels("insights_snapshot", "miss" if snapshot is None else "hit").inc()
+            if snapshot is None:
+                insights = await self._generate_user_insights(user_id, user_data)
+                recommendations = await self._generate_recommendations(user_id, user_data)
+                snapshot = insights_worker.store(user_id, insights, recommendations)
             
             return {
                 "response": ai_response,
-                "insights": insights,
-                "recommendations": recommendations,
+                "insights": snapshot["user_insights"],
+                "recommendations": snapshot["recommendations"],
                 "timestamp": datetime.utcnow()
             }
             
@@ -97,6 +248,32 @@ Always prioritize user safety and suggest consulting healthcare professionals fo
                 "timestamp": datetime.utcnow()
             }
 
+    async def stream_chat_response(self, user_id: str, message: str, session_id: str) -> AsyncIterator[str]:
+        """Stream the AI response token by token, saving chat history once complete"""
+        user_data = await self._get_user_context(user_id)
+        personalized_system = self._create_personalized_system_message(user_data)
+        recent_messages = await self._get_recent_chat_history(user_id, session_id)
+        contextual_message = self._create_contextual_message(message, user_data, recent_messages)
+        
+        chunks = []
+        start = time.perf_counter()
+        async for chunk in self.llm_backend.stream_message(session_id, personalized_system, contextual_message):
+            if not chunks:
+                llm_request_duration_seconds.labels(self.llm_backend.name, "first_token").observe(time.perf_counter() - start)
+            chunks.append(chunk)
+            yield chunk
+        llm_request_duration_seconds.labels(self.llm_backend.name, "total").observe(time.perf_counter() - start)
+        
+        await self._save_chat_message(user_id, session_id, message, "".join(chunks), user_data)
+
+    async def build_insights(self, user_id: str) -> Dict[str, Any]:
+        """Build insights and recommendations for a user from fresh context"""
+        user_data = await self._get_user_context(user_id)
+        return {
+            "user_insights": await self._generate_user_insights(user_id, user_data),
+            "recommendations": await self._generate_recommendations(user_id, user_data)
+        }
+
     async def _get_user_context(self, user_id: str) -> Dict[str, Any]:
         """Get comprehensive user context for personalization"""
         user_doc = await users_collection.find_one({"_id": user_id})
@@ -114,6 +291,8 @@ Always prioritize user safety and suggest consulting healthcare professionals fo
         return {
             "user": user_doc,
             "progress": progress_doc,
+            # The stored streak is as of the last activity; this one is as of today
+            "current_streak": ActivityCalendar.from_progress(progress_doc).current_streak(),
             "recent_behavior": recent_behavior,
             "goals": user_doc.get("selected_goals", []) if user_doc else [],
             "assessment": user_doc.get("assessment_data", {}) if user_doc else {}
@@ -123,8 +302,8 @@ Always prioritize user safety and suggest consulting healthcare professionals fo
         """Create personalized system message based on user data"""
         base_message = self.system_message
         
-        user = user_data.get("user", {})
-        progress = user_data.get("progress", {})
+        user = user_data.get("user") or {}
+        progress = user_data.get("progress") or {}
         goals = user_data.get("goals", [])
         assessment = user_data.get("assessment", {})
         
@@ -134,7 +313,7 @@ User Profile:
 - Name: {user.get('name', 'User')}
 - Plan: {user.get('plan', 'basic')}
 - Goals: {', '.join(goals) if goals else 'General wellness'}
-- Current streak: {progress.get('current_streak', 0) if progress else 0} days
+- Current streak: {user_data.get('current_streak', 0)} days
 - WellyPoints: {progress.get('welly_points', 0) if progress else 0}
 
 Assessment Data:
@@ -210,6 +389,7 @@ Tailor your responses to this user's specific situation and goals."""
 
     async def _save_chat_message(self, user_id: str, session_id: str, user_message: str, ai_response: str, user_data: Dict[str, Any]):
         """Save chat message to database"""
+        progress = user_data.get("progress") or {}
         chat_doc = {
             "user_id": user_id,
             "session_id": session_id,
@@ -218,8 +398,8 @@ Tailor your responses to this user's specific situation and goals."""
             "timestamp": datetime.utcnow(),
             "user_context": {
                 "goals": user_data.get("goals", []),
-                "current_streak": user_data.get("progress", {}).get("current_streak", 0),
-                "welly_points": user_data.get("progress", {}).get("welly_points", 0)
+                "current_streak": user_data.get("current_streak", 0),
+                "welly_points": progress.get("welly_points", 0)
             }
         }
         
@@ -227,14 +407,14 @@ Tailor your responses to this user's specific situation and goals."""
 
     async def _generate_user_insights(self, user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate insights about user behavior and progress"""
-        progress = user_data.get("progress", {})
+        progress = user_data.get("progress") or {}
         recent_behavior = user_data.get("recent_behavior", [])
         
         insights = {
             "engagement_level": self._calculate_engagement_level(recent_behavior),
-            "consistency_score": progress.get("current_streak", 0) * 10,
+            "consistency_score": user_data.get("current_streak", 0) * 10,
             "preferred_activities": self._get_preferred_activities(recent_behavior),
-            "progress_trend": self._calculate_progress_trend(user_id, progress),
+            "progress_trend": self._calculate_progress_trend(user_id, progress, user_data.get("current_streak", 0)),
             "time_of_day_preference": self._get_time_preferences(recent_behavior)
         }
         
@@ -267,9 +447,8 @@ Tailor your responses to this user's specific situation and goals."""
         # Return top 3 activities
         return sorted(activity_counts.keys(), key=lambda x: activity_counts[x], reverse=True)[:3]
 
-    def _calculate_progress_trend(self, user_id: str, progress: Dict[str, Any]) -> str:
+    def _calculate_progress_trend(self, user_id: str, progress: Dict[str, Any], current_streak: int) -> str:
         """Calculate progress trend"""
-        current_streak = progress.get("current_streak", 0)
         welly_points = progress.get("welly_points", 0)
         
         if current_streak >= 7 and welly_points >= 500:
@@ -308,12 +487,12 @@ Tailor your responses to this user's specific situation and goals."""
         """Generate personalized recommendations"""
         recommendations = []
         
-        progress = user_data.get("progress", {})
+        progress = user_data.get("progress") or {}
         goals = user_data.get("goals", [])
         recent_behavior = user_data.get("recent_behavior", [])
         
         # Streak-based recommendations
-        current_streak = progress.get("current_streak", 0)
+        current_streak = user_data.get("current_streak", 0)
         if current_streak == 0:
             recommendations.append("Start with a simple 5-minute morning stretch to build your wellness habit")
         elif current_streak < 3:
@@ -339,4 +518,7 @@ Tailor your responses to this user's specific situation and goals."""
         return recommendations[:5]  # Return max 5 recommendations
 
 # Initialize the AI service
-ai_service = WellnessAIService()
\ No newline at end of file
+ai_service = WellnessAIService()
+
+# Background insights precomputation uses this service
+insights_worker.set_compute(ai_service.build_insights)
\ No newline at end of file
@@ -2,6 +2,31 @@ from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 from .database import user_behavior_collection, user_progress_collection
 from .models import UserBehavior
+from .insights_worker import insights_worker
+from .leaderboard import leaderboards
+from .activity_calendar import ActivityCalendar
+from .notification_scheduler import notification_scheduler
+from .challenge_engine import challenge_engine, ENGINE_SOURCE
+from .company_rollups import company_rollups
+
+# Welly points per action; challenges and plan upgrades carry their own points (see points_for)
+ACTION_POINTS = {
+    "complete_program": 50,
+    "start_program": 10,
+    "complete_challenge": 30,
+    "chat_interaction": 5,
+    "login": 5,
+    "book_session": 20,
+    "bookmark_program": 5
+}
+
+def points_for(action: str, details: Dict[str, Any]) -> int:
+    """Welly points an action earns"""
+    if action == "complete_challenge":
+        return details.get("challenge_points", ACTION_POINTS[action])
+    if action == "plan_upgrade":
+        return details.get("bonus_points", 0)
+    return ACTION_POINTS.get(action, 0)
 
 class BehaviorTracker:
     """Track and analyze user behavior for wellness insights"""
@@ -24,100 +49,58 @@ class BehaviorTracker:
             timestamp=datetime.utcnow()
         )
         
-        await user_behavior_collection.insert_one(behavior.dict())
+        event = behavior.dict()
+        await user_behavior_collection.insert_one(event)
         
         # Update user progress based on action
-        await BehaviorTracker._update_progress(user_id, action, details or {})
-    
-    @staticmethod
-    async def _update_progress(user_id: str, action: str, details: Dict[str, Any]):
-        """Update user progress based on action"""
-        progress_update = {}
-        
-        # Award points for different actions
-        points_awarded = 0
-        
-        if action == "complete_program":
-            points_awarded = 50
-            await BehaviorTracker._add_completed_program(user_id, details.get("program_id"))
-        elif action == "start_program":
-            points_awarded = 10
-        elif action == "complete_challenge":
-            points_awarded = details.get("challenge_points", 30)
-            await BehaviorTracker._add_completed_challenge(user_id, details.get("challenge_id"))
-        elif action == "chat_interaction":
-            points_awarded = 5
-        elif action == "login":
-            points_awarded = 5
-            await BehaviorTracker._update_streak(user_id)
-        elif action == "book_session":
-            points_awarded = 20
-        elif action == "bookmark_program":
-            points_awarded = 5
+        await BehaviorTracker._update_progress(user_id, action, details or {}, behavior.timestamp)
         
-        if points_awarded > 0:
-            await user_progress_collection.update_one(
-                {"user_id": user_id},
-                {
-                    "$inc": {"welly_points": points_awarded},
-                    "$set": {"last_activity": datetime.utcnow(), "updated_at": datetime.utcnow()}
-                },
-                upsert=True
-            )
-    
-    @staticmethod
-    async def _add_completed_program(user_id: str, program_id: str):
-        """Add a completed program to user's progress"""
-        if program_id:
-            await user_progress_collection.update_one(
-                {"user_id": user_id},
-                {"$addToSet": {"completed_programs": program_id}},
-                upsert=True
-            )
-    
-    @staticmethod
-    async def _add_completed_challenge(user_id: str, challenge_id: str):
-        """Add a completed challenge to user's progress"""
-        if challenge_id:
-            await user_progress_collection.update_one(
-                {"user_id": user_id},
-                {"$addToSet": {"completed_challenges": challenge_id}},
-                upsert=True
-            )
-    
-    @staticmethod
-    async def _update_streak(user_id: str):
-        """Update user's daily streak"""
-        today = datetime.utcnow().date()
+        # Advance (and possibly complete) the user's challenges
+        await challenge_engine.consume(event)
         
-        progress = await user_progress_collection.find_one({"user_id": user_id})
+        # Count it towards the user's company analytics
+        await company_rollups.record(event)
         
-        if progress:
-            last_activity = progress.get("last_activity")
-            if last_activity:
-                last_activity_date = last_activity.date()
-                
-                if last_activity_date == today:
-                    # Already logged today, no streak update needed
-                    return
-                elif last_activity_date == today - timedelta(days=1):
-                    # Consecutive day, increment streak
-                    await user_progress_collection.update_one(
-                        {"user_id": user_id},
-                        {"$inc": {"current_streak": 1}}
-                    )
-                else:
-                    # Streak broken, reset to 1
-                    await user_progress_collection.update_one(
-                        {"user_id": user_id},
-                        {"$set": {"current_streak": 1}}
-                    )
-            else:
-                # First time logging, start streak
-                await user_progress_collection.update_one(
-                    {"user_id": user_id},
-                    {"$set": {"current_streak": 1}}
-                )
+        # Refresh precomputed AI insights off the request path
+        insights_worker.notify(user_id)
+    
+    @staticmethod
+    async def _update_progress(user_id: str, action: str, details: Dict[str, Any], at: datetime):
+        """Update user progress based on action, in one atomic read-modify-write"""
+        now = datetime.utcnow()
+        points_awarded = points_for(action, details)
+        # Set by build_update when this event is the first of its day
+        recorded = []
+        
+        def build_update(progress: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+            update: Dict[str, Dict[str, Any]] = {}
+            
+            # Every event marks its day active; streaks and completion rates follow from that
+            calendar = ActivityCalendar.from_progress(progress)
+            if calendar.record(at.date()):
+                update["$set"] = calendar.fields(now.date())
+                recorded.append(calendar)
+            
+            if action == "complete_program" and details.get("program_id"):
+                update["$addToSet"] = {"completed_programs": details["program_id"]}
+            elif action == "complete_challenge" and details.get("challenge_id"):
+                update["$addToSet"] = {"completed_challenges": details["challenge_id"]}
+            
+            # Award points for different actions
+            if points_awarded > 0:
+                update["$inc"] = {"welly_points": points_awarded}
+                update.setdefault("$set", {}).update({"last_activity": now, "updated_at": now})
+            return update
+        
+        # The calendar is rewritten from the stored one, so concurrent events must not interleave
+        await user_progress_collection.update_one_with({"user_id": user_id}, build_update, upsert=True)
+        
+        if recorded:
+            # First activity of the day: move tomorrow's streak reminder along
+            calendar = recorded[-1]
+            notification_scheduler.remind_streak(user_id, calendar.current_streak(now.date()), calendar.last_day)
+        if points_awarded > 0:
+            await leaderboards.record(user_id, points_awarded)
     
     @staticmethod
     async def get_user_analytics(user_id: str) -> Dict[str, Any]:
@@ -224,7 +207,22 @@ class BehaviorTracker:
         if action_counts.get("book_session", 0) == 0:
             recommendations.append("Consider booking a coaching session for personalized support")
         
-        if progress and progress.get("current_streak", 0) < 3:
+        if progress and ActivityCalendar.from_progress(progress).current_streak() < 3:
             recommendations.append("Build consistency by logging in daily for better results")
         
-        return recommendations[:3]  # Return max 3 recommendations
\ No newline at end of file
+        return recommendations[:3]  # Return max 3 recommendations
+
+async def _award_challenge(user_id: str, challenge: Dict[str, Any]):
+    await BehaviorTracker.track_action(
+        user_id=user_id,
+        action="complete_challenge",
+        page="challenges",
+        details={
+            "challenge_id": challenge["id"],
+            "challenge_title": challenge.get("title"),
+            "challenge_points": challenge.get("points", ACTION_POINTS["complete_challenge"]),
+            "awarded_by": ENGINE_SOURCE
+        }
+    )
+
+challenge_engine.on_complete(_award_challenge)
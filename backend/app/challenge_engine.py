@@ -0,0 +1,252 @@
+import asyncio
+from datetime import datetime, date, timedelta
+from itertools import chain
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+from .database import challenges_collection, challenge_progress_collection, challenge_awards_collection
+from .leaderboard import week_key
+from .metrics import registry
+
+# Marks the complete_challenge events the engine itself tracks, so it does not consume them
+ENGINE_SOURCE = "challenge_engine"
+
+# Actions that count as a day's wellness activity for streak challenges
+ACTIVITY_ACTIONS = ("start_program", "complete_program", "complete_challenge", "chat_interaction", "book_session")
+
+# How long an award record outlives its period (the longest is a month)
+AWARD_RETENTION = timedelta(days=40)
+
+challenges_awarded_total = registry.counter(
+    "challenges_awarded_total", "Challenges completed automatically by the challenge engine", ("challenge_id",)
+)
+
+def period_key(challenge_type: str, at: datetime) -> str:
+    """Period a challenge can be completed once in: the day, ISO week or month of `at`"""
+    if challenge_type == "weekly":
+        return week_key(at)
+    if challenge_type == "monthly":
+        return at.strftime("%Y-%m")
+    return at.date().isoformat()
+
+class ActivityRule:
+    """{"activity_type": ..., "duration": minutes}: one activity of that type, at least that long
+
+    Any event whose details carry the activity type counts, whatever its action.
+    Programs have no activity type, so a completed program of the challenge's
+    category counts too (stretch_mobility for "stretch", and so on).
+    """
+    actions = ("complete_program",)
+    per_period = True
+
+    def __init__(self, activity_type: str, category: Optional[str], duration: float = 0):
+        self.activity_type = activity_type
+        self.category = category
+        self.duration = duration
+
+    def advance(self, state: Dict[str, Any], details: Dict[str, Any], day: date) -> Dict[str, Any]:
+        kind_matches = details.get("activity_type") == self.activity_type or (
+            self.category is not None and details.get("category") == self.category
+        )
+        if kind_matches and (details.get("duration") or 0) >= self.duration:
+            state["done"] = True
+        return state
+
+    def met(self, state: Dict[str, Any]) -> bool:
+        return state.get("done", False)
+
+    def after_completion(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return state
+
+class ConsecutiveDaysRule:
+    """{"consecutive_days": n}: some activity on n days in a row
+
+    Tracks only the last active day and the length of the current run, so
+    each event is O(1). A completed run starts over from the next day.
+    """
+    actions = ACTIVITY_ACTIONS
+    per_period = False
+
+    def __init__(self, days: int):
+        self.days = days
+
+    def advance(self, state: Dict[str, Any], details: Dict[str, Any], day: date) -> Dict[str, Any]:
+        last_day = state.get("last_day")
+        if last_day == day.isoformat():
+            return state
+        consecutive = last_day == (day - timedelta(days=1)).isoformat()
+        return {"last_day": day.isoformat(), "run": state.get("run", 0) + 1 if consecutive else 1}
+
+    def met(self, state: Dict[str, Any]) -> bool:
+        return state.get("run", 0) >= self.days
+
+    def after_completion(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return {"last_day": state["last_day"], "run": 0}
+
+class UniqueCategoriesRule:
+    """{"unique_categories": n}: programs from n different categories within the period"""
+    actions = ("start_program", "complete_program")
+    per_period = True
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def advance(self, state: Dict[str, Any], details: Dict[str, Any], day: date) -> Dict[str, Any]:
+        category = details.get("category")
+        categories = state.setdefault("categories", [])
+        # Stop collecting once met; the list stays at most `count` long
+        if category and category not in categories and len(categories) < self.count:
+            categories.append(category)
+        return state
+
+    def met(self, state: Dict[str, Any]) -> bool:
+        return len(state.get("categories", [])) >= self.count
+
+    def after_completion(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return state
+
+def compile_rule(challenge: Dict[str, Any]):
+    """Rule for a challenge's requirements, None if the engine cannot evaluate them"""
+    requirements = challenge.get("requirements") or {}
+    if "activity_type" in requirements:
+        return ActivityRule(requirements["activity_type"], challenge.get("category"), requirements.get("duration", 0))
+    if "consecutive_days" in requirements:
+        return ConsecutiveDaysRule(int(requirements["consecutive_days"]))
+    if "unique_categories" in requirements:
+        return UniqueCategoriesRule(int(requirements["unique_categories"]))
+    return None
+
+Award = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+class ChallengeEngine:
+    """Completes challenges automatically from the behavior events users generate
+
+    Each (user, challenge) pair is a small state machine stored in the
+    challenge_progress collection: events advance its state, and when the
+    challenge's rule is met it is marked completed for the current period (day,
+    week or month) and awarded. Rules are indexed by the actions they react to,
+    so an event costs one read and one write per challenge it can affect,
+    whatever the user's history. Challenges are recompiled whenever the
+    challenges collection changes.
+
+    Awards are made unique per (user, challenge, period) in storage, by
+    inserting a challenge_awards document with that _id, so workers sharing the
+    database never award the same completion twice.
+    """
+
+    def __init__(self, lock_stripes: int = 64):
+        self._award: Optional[Award] = None
+        self._challenges: Dict[str, Dict[str, Any]] = {}
+        self._rules_by_action: Dict[str, List[Tuple[Dict[str, Any], Any]]] = {}
+        self._rules_by_activity: Dict[str, List[Tuple[Dict[str, Any], Any]]] = {}
+        self._version: Optional[int] = None
+        # Serializes events of the same user within this worker, so their state updates do not interleave
+        self._locks = [asyncio.Lock() for _ in range(lock_stripes)]
+
+    def on_complete(self, award: Award):
+        """Register award(user_id, challenge), called once per completion"""
+        self._award = award
+
+    async def _refresh(self):
+        version = challenges_collection.version
+        if version == self._version:
+            return
+        challenges = {}
+        rules_by_action: Dict[str, List[Tuple[Dict[str, Any], Any]]] = {}
+        rules_by_activity: Dict[str, List[Tuple[Dict[str, Any], Any]]] = {}
+        async for challenge in challenges_collection.find({}):
+            challenges[challenge["id"]] = challenge
+            rule = compile_rule(challenge)
+            if rule is None:
+                continue
+            for action in rule.actions:
+                rules_by_action.setdefault(action, []).append((challenge, rule))
+            if isinstance(rule, ActivityRule):
+                rules_by_activity.setdefault(rule.activity_type, []).append((challenge, rule))
+        self._challenges, self._rules_by_action, self._rules_by_activity = challenges, rules_by_action, rules_by_activity
+        self._version = version
+
+    async def consume(self, event: Dict[str, Any]):
+        """Advance the user's challenges with a tracked behavior event"""
+        details = event.get("details") or {}
+        if details.get("awarded_by") == ENGINE_SOURCE:
+            return
+        try:
+            await self._refresh()
+            user_id = event["user_id"]
+            at = event.get("timestamp") or datetime.utcnow()
+
+            completed = []
+            async with self._locks[hash(user_id) % len(self._locks)]:
+                if event["action"] == "complete_challenge" and details.get("challenge_id") in self._challenges:
+                    # Completed by hand; do not award it again this period
+                    await self._mark_completed(user_id, self._challenges[details["challenge_id"]], at)
+
+                # Rules for the action, and activity rules for the event's activity type, once each
+                rules = {
+                    challenge["id"]: (challenge, rule) for challenge, rule in chain(
+                        self._rules_by_action.get(event["action"], ()),
+                        self._rules_by_activity.get(details.get("activity_type"), ())
+                    )
+                }
+                for challenge, rule in rules.values():
+                    if await self._advance(user_id, challenge, rule, details, at):
+                        completed.append(challenge)
+
+            for challenge in completed:
+                challenges_awarded_total.labels(challenge["id"]).inc()
+                if self._award is not None:
+                    await self._award(user_id, challenge)
+        except Exception as e:
+            print(f"Error evaluating challenges: {e}")
+
+    async def _advance(self, user_id: str, challenge: Dict[str, Any], rule, details: Dict[str, Any], at: datetime) -> bool:
+        """Step one state machine; True if the challenge was just completed"""
+        progress_id = f"{user_id}:{challenge['id']}"
+        period = period_key(challenge.get("type", "daily"), at)
+        progress = await challenge_progress_collection.find_one({"_id": progress_id}) or {}
+
+        state = progress.get("state") or {}
+        if rule.per_period and progress.get("period") != period:
+            state = {}
+        state = rule.advance(state, details, at.date())
+
+        update = {"state": state, "period": period, "updated_at": datetime.utcnow()}
+        just_completed = progress.get("completed_period") != period and rule.met(state)
+        if just_completed:
+            update["state"] = rule.after_completion(state)
+            update["completed_period"] = period
+            update["completed_at"] = at
+            # Another worker may have completed it from a concurrent event; only one award is recorded
+            just_completed = await self._record_award(user_id, challenge, period, at)
+
+        await challenge_progress_collection.update_one(
+            {"_id": progress_id},
+            {"$set": {"user_id": user_id, "challenge_id": challenge["id"], **update}},
+            upsert=True
+        )
+        return just_completed
+
+    async def _record_award(self, user_id: str, challenge: Dict[str, Any], period: str, at: datetime) -> bool:
+        """Record the completion of a challenge for a period; False if it was already recorded"""
+        try:
+            await challenge_awards_collection.insert_one({
+                "_id": f"{user_id}:{challenge['id']}:{period}",
+                "user_id": user_id,
+                "challenge_id": challenge["id"],
+                "period": period,
+                "awarded_at": at,
+                "expires_at": at + AWARD_RETENTION
+            })
+        except ValueError:
+            return False
+        return True
+
+    async def _mark_completed(self, user_id: str, challenge: Dict[str, Any], at: datetime):
+        period = period_key(challenge.get("type", "daily"), at)
+        await self._record_award(user_id, challenge, period, at)
+        await challenge_progress_collection.update_one(
+            {"_id": f"{user_id}:{challenge['id']}"},
+            {"$set": {"user_id": user_id, "challenge_id": challenge["id"], "completed_period": period, "completed_at": at}},
+            upsert=True
+        )
+
+challenge_engine = ChallengeEngine()
@@ -0,0 +1,164 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional, Callable, Awaitable
+from .metrics import cache_requests_total, queue_depth
+from .invalidation import invalidation_bus
+
+# Checkout states that will not change again, so they can be cached for long
+TERMINAL_STATUSES = {"complete", "expired"}
+
+class CheckoutStatusCache:
+    """Short-TTL cache of Stripe checkout status keyed by session_id
+
+    Polls are answered from the cache, concurrent misses for the same session share
+    a single Stripe call, and webhooks populate or invalidate entries. Long-poll
+    clients wait on a per-session event that fires whenever an entry changes.
+    """
+
+    def __init__(self, ttl_seconds: float = 5.0, terminal_ttl_seconds: float = 3600.0, max_entries: int = 10_000):
+        self.ttl_seconds = ttl_seconds
+        self.terminal_ttl_seconds = terminal_ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Cached status for a session, if still fresh"""
+        entry = self._entries.get(session_id)
+        if entry and entry["expires"] > time.monotonic():
+            self.hits += 1
+            cache_requests_total.labels("checkout_status", "hit").inc()
+            return entry["status"]
+
+        if entry:
+            del self._entries[session_id]
+        self.misses += 1
+        cache_requests_total.labels("checkout_status", "miss").inc()
+        return None
+
+    def set(self, session_id: str, status: Dict[str, Any], broadcast: bool = True):
+        """Store a status and wake long-poll waiters if it changed
+
+        Unless `broadcast` is False (the change came from another worker), the
+        status is also published to the other workers' caches.
+        """
+        previous = self._entries.get(session_id)
+        terminal = status.get("status") in TERMINAL_STATUSES
+        ttl = self.terminal_ttl_seconds if terminal else self.ttl_seconds
+
+        if len(self._entries) >= self.max_entries and session_id not in self._entries:
+            self._evict()
+
+        self._entries[session_id] = {"status": status, "expires": time.monotonic() + ttl}
+
+        if previous is None or _state(previous["status"]) != _state(status):
+            self._notify(session_id)
+
+        if broadcast:
+            invalidation_bus.publish("checkout_status", session_id, status)
+
+    def invalidate(self, session_id: str, broadcast: bool = True):
+        """Drop a cached status and wake waiters so they refetch"""
+        self._entries.pop(session_id, None)
+        self._notify(session_id)
+
+        if broadcast:
+            invalidation_bus.publish("checkout_status", session_id)
+
+    async def get_or_fetch(self, session_id: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Cached status, or fetch it once for all concurrent callers"""
+        cached = self.get(session_id)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get(session_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[session_id] = future
+        try:
+            status = await fetch()
+            self.set(session_id, status)
+            future.set_result(status)
+            return status
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a future nobody else awaited does not log a warning
+            future.exception()
+            raise
+        finally:
+            del self._inflight[session_id]
+
+    async def wait_for_change(self, session_id: str, status: Optional[str], payment_status: Optional[str], timeout: float) -> bool:
+        """Wait until the cached state differs from the one the client has seen"""
+        current = self._entries.get(session_id)
+        if current and _state(current["status"]) != (status, payment_status):
+            return True
+
+        waiter = self._waiters.get(session_id)
+        if waiter is None:
+            waiter = self._waiters[session_id] = {"event": asyncio.Event(), "count": 0}
+        waiter["count"] += 1
+
+        try:
+            await asyncio.wait_for(waiter["event"].wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            waiter["count"] -= 1
+            if waiter["count"] == 0 and self._waiters.get(session_id) is waiter:
+                del self._waiters[session_id]
+
+    @property
+    def waiter_count(self) -> int:
+        """Long-poll requests currently waiting"""
+        return sum(waiter["count"] for waiter in self._waiters.values())
+
+    def _notify(self, session_id: str):
+        waiter = self._waiters.pop(session_id, None)
+        if waiter is not None:
+            waiter["event"].set()
+
+    def _evict(self):
+        """Drop expired entries, then the oldest ones if still full"""
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry["expires"] <= now]:
+            del self._entries[key]
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+def _state(status: Dict[str, Any]):
+    return (status.get("status"), status.get("payment_status"))
+
+def status_from_transaction(transaction: Dict[str, Any], status: str, payment_status: str) -> Dict[str, Any]:
+    """Build a checkout status response from our transaction record (used by webhooks)"""
+    amount_total = transaction.get("amount_total")
+    if amount_total is None and transaction.get("amount") is not None:
+        amount_total = int(round(transaction["amount"] * 100))
+
+    return {
+        "session_id": transaction.get("session_id"),
+        "status": status,
+        "payment_status": payment_status,
+        "amount_total": amount_total,
+        "currency": transaction.get("currency", "usd"),
+        "metadata": transaction.get("metadata", {})
+    }
+
+# Shared by the enhanced and legacy payment routers
+checkout_status_cache = CheckoutStatusCache()
+queue_depth.labels("checkout_long_poll").set_function(lambda: checkout_status_cache.waiter_count)
+
+def _on_remote_change(session_id: str, status: Optional[Dict[str, Any]]):
+    """Apply a status change published by another worker"""
+    if status is None:
+        checkout_status_cache.invalidate(session_id, broadcast=False)
+    else:
+        checkout_status_cache.set(session_id, status, broadcast=False)
+
+invalidation_bus.subscribe("checkout_status", _on_remote_change)
@@ -0,0 +1,60 @@
+from typing import Any, Dict, Optional, Set
+from .database import users_collection, companies_collection
+from .invalidation import invalidation_bus
+
+class CompanyDirectory:
+    """Cached user_id -> company_id lookups, for grouping activity by company
+
+    A user's company is read from their user document once and then served from
+    memory. Call forget() after changing a user's company_id so the next lookup
+    rereads it; other workers are told to do the same.
+    """
+
+    def __init__(self):
+        self._companies: Dict[str, Optional[str]] = {}
+        self._members: Dict[str, Set[str]] = {}
+
+    def set(self, user_id: str, company_id: Optional[str]):
+        """Record a user's company (None for individual users)"""
+        previous = self._companies.get(user_id)
+        if previous and previous != company_id:
+            self._members.get(previous, set()).discard(user_id)
+        self._companies[user_id] = company_id
+        if company_id:
+            self._members.setdefault(company_id, set()).add(user_id)
+
+    def cached(self, user_id: str) -> Optional[str]:
+        """Company of a user already looked up, without touching the database"""
+        return self._companies.get(user_id)
+
+    async def company_of(self, user_id: str) -> Optional[str]:
+        """Company a user belongs to, if any"""
+        if user_id in self._companies:
+            return self._companies[user_id]
+        user = await users_collection.find_one({"_id": user_id})
+        company_id = user.get("company_id") if user else None
+        self.set(user_id, company_id)
+        return company_id
+
+    def members(self, company_id: str) -> Set[str]:
+        """Users of a company seen so far (all of them after load())"""
+        return self._members.get(company_id, set())
+
+    def forget(self, user_id: str, broadcast: bool = True):
+        previous = self._companies.pop(user_id, None)
+        if previous:
+            self._members.get(previous, set()).discard(user_id)
+        if broadcast:
+            invalidation_bus.publish("company_directory", user_id)
+
+    async def load(self):
+        """Read every user's company in one pass"""
+        async for user in users_collection.find({}):
+            self.set(user["_id"], user.get("company_id"))
+
+async def company_for_invite_code(invite_code: str) -> Optional[Dict[str, Any]]:
+    """Company whose invite code this is; signup never takes a company ID from the client"""
+    return await companies_collection.find_one({"invite_code": invite_code})
+
+company_directory = CompanyDirectory()
+invalidation_bus.subscribe("company_directory", lambda user_id, _: company_directory.forget(user_id, broadcast=False))
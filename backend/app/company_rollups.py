@@ -0,0 +1,224 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+from .activity_calendar import ActivityCalendar
+from .company_directory import company_directory
+from .database import user_progress_collection, user_behavior_collection
+from .invalidation import invalidation_bus
+
+# Days of activity the rollups cover (active users and category mix)
+ROLLUP_WINDOW_DAYS = 30
+# Actions whose program category counts towards a company's category mix
+CATEGORY_ACTIONS = ("start_program", "complete_program")
+
+# (minimum current streak, bucket label)
+STREAK_BUCKETS = ((30, "30+"), (14, "14-29"), (7, "7-13"), (3, "3-6"), (1, "1-2"), (0, "0"))
+# (minimum engagement score, bucket label)
+ENGAGEMENT_BUCKETS = ((80, "excellent"), (60, "good"), (40, "fair"), (0, "needs_improvement"))
+
+def engagement_score(actions_last_7_days: int) -> float:
+    """Engagement score (0-100) from the number of actions in the last 7 days"""
+    if actions_last_7_days == 0:
+        return 0.0
+    daily_average = actions_last_7_days / 7
+    if daily_average >= 10:
+        return 100.0
+    elif daily_average >= 5:
+        return 80.0
+    elif daily_average >= 3:
+        return 60.0
+    elif daily_average >= 1:
+        return 40.0
+    else:
+        return 20.0
+
+def _bucket(value: float, buckets) -> str:
+    for minimum, label in buckets:
+        if value >= minimum:
+            return label
+    return buckets[-1][1]
+
+class _Member:
+    __slots__ = ("calendar", "actions")
+
+    def __init__(self, calendar: Optional[ActivityCalendar] = None):
+        self.calendar = calendar or ActivityCalendar()
+        # Action counts for the last 7 days, by day
+        self.actions: Dict[date, int] = {}
+
+class CompanyRollup:
+    """Team analytics for one company, kept current event by event
+
+    Histograms (streak and engagement buckets) and per-day counters (users by
+    last active day, category mix) are adjusted as each member's events come
+    in, so reading them costs the same for 10 members or 10,000. Streaks and
+    7-day engagement also change as days pass without events; the first call
+    of each day recounts the histograms once from the members' state.
+    """
+
+    def __init__(self):
+        self.members: Dict[str, _Member] = {}
+        self.users_by_last_active: Dict[date, int] = {}
+        self.categories_by_day: Dict[date, Dict[str, int]] = {}
+        self.streaks: Dict[str, int] = {}
+        self.engagement: Dict[str, int] = {}
+        self.engagement_total = 0.0
+        self.day: Optional[date] = None
+
+    def _scores(self, member: _Member, today: date) -> Tuple[str, float]:
+        return (
+            _bucket(member.calendar.current_streak(today), STREAK_BUCKETS),
+            engagement_score(sum(member.actions.values()))
+        )
+
+    def _count(self, member: _Member, today: date, sign: int):
+        streak, score = self._scores(member, today)
+        self.streaks[streak] = self.streaks.get(streak, 0) + sign
+        label = _bucket(score, ENGAGEMENT_BUCKETS)
+        self.engagement[label] = self.engagement.get(label, 0) + sign
+        self.engagement_total += sign * score
+
+    def roll(self, today: date):
+        """Recount the day-dependent histograms when the day changes"""
+        if self.day == today:
+            return
+        self.day = today
+        oldest = today - timedelta(days=ROLLUP_WINDOW_DAYS - 1)
+        week_start = today - timedelta(days=6)
+        self.users_by_last_active = {day: n for day, n in self.users_by_last_active.items() if day >= oldest}
+        self.categories_by_day = {day: mix for day, mix in self.categories_by_day.items() if day >= oldest}
+        self.streaks, self.engagement, self.engagement_total = {}, {}, 0.0
+        for member in self.members.values():
+            member.actions = {day: n for day, n in member.actions.items() if day >= week_start}
+            self._count(member, today, 1)
+
+    def record(self, user_id: str, action: str, category: Optional[str], at: datetime, today: Optional[date] = None):
+        today = today or datetime.utcnow().date()
+        self.roll(today)
+        day = at.date()
+        age = (today - day).days
+
+        member = self.members.get(user_id)
+        if member is None:
+            member = self.members[user_id] = _Member()
+        else:
+            self._count(member, today, -1)
+
+        previous = member.calendar.last_day
+        member.calendar.record(day)
+        # Only the recent past matters here; keep the bitmap to a machine word
+        member.calendar.bits &= (1 << 64) - 1
+        if member.calendar.last_day != previous:
+            if previous in self.users_by_last_active:
+                self.users_by_last_active[previous] -= 1
+            self.users_by_last_active[day] = self.users_by_last_active.get(day, 0) + 1
+        if 0 <= age < 7:
+            member.actions[day] = member.actions.get(day, 0) + 1
+        self._count(member, today, 1)
+
+        if category and action in CATEGORY_ACTIONS and 0 <= age < ROLLUP_WINDOW_DAYS:
+            mix = self.categories_by_day.setdefault(day, {})
+            mix[category] = mix.get(category, 0) + 1
+
+    def summary(self, member_count: int, today: Optional[date] = None) -> Dict[str, Any]:
+        today = today or datetime.utcnow().date()
+        self.roll(today)
+
+        def active_within(days: int) -> int:
+            return sum(n for day, n in self.users_by_last_active.items() if (today - day).days < days)
+
+        category_mix: Dict[str, int] = {}
+        for mix in self.categories_by_day.values():
+            for category, count in mix.items():
+                category_mix[category] = category_mix.get(category, 0) + count
+
+        # Members with no recent activity have no streak and no engagement
+        member_count = max(member_count, len(self.members))
+        untracked = member_count - len(self.members)
+        streaks = {label: self.streaks.get(label, 0) for _, label in reversed(STREAK_BUCKETS)}
+        streaks["0"] += untracked
+        engagement = {label: self.engagement.get(label, 0) for _, label in reversed(ENGAGEMENT_BUCKETS)}
+        engagement["needs_improvement"] += untracked
+
+        return {
+            "members": member_count,
+            "active_users": {
+                "today": active_within(1),
+                "last_7_days": active_within(7),
+                "last_30_days": active_within(ROLLUP_WINDOW_DAYS)
+            },
+            "engagement": {
+                "average_score": round(self.engagement_total / member_count, 1) if member_count else 0.0,
+                "distribution": engagement
+            },
+            "streak_distribution": streaks,
+            "category_mix": dict(sorted(category_mix.items(), key=lambda item: -item[1])),
+            "window_days": ROLLUP_WINDOW_DAYS
+        }
+
+class CompanyRollups:
+    """Per-company rollups, fed by BehaviorTracker and by other workers' events"""
+
+    def __init__(self):
+        self.companies: Dict[str, CompanyRollup] = {}
+
+    def apply(self, company_id: str, user_id: str, action: str, category: Optional[str], at: datetime):
+        self.companies.setdefault(company_id, CompanyRollup()).record(user_id, action, category, at)
+
+    async def record(self, event: Dict[str, Any]):
+        """Count a tracked behavior event towards the user's company, if they have one"""
+        company_id = await company_directory.company_of(event["user_id"])
+        if not company_id:
+            return
+        category = (event.get("details") or {}).get("category")
+        self.apply(company_id, event["user_id"], event["action"], category, event["timestamp"])
+        invalidation_bus.publish("company_rollups", event["user_id"], {
+            "company_id": company_id, "action": event["action"], "category": category, "at": event["timestamp"]
+        })
+
+    def _received(self, user_id: str, payload: Optional[Dict[str, Any]]):
+        if payload:
+            self.apply(payload["company_id"], user_id, payload["action"], payload.get("category"), payload["at"])
+
+    def summary(self, company_id: str) -> Dict[str, Any]:
+        rollup = self.companies.get(company_id) or CompanyRollup()
+        return {"company_id": company_id, **rollup.summary(len(company_directory.members(company_id)))}
+
+    async def rebuild(self):
+        """Load the rollups from progress calendars and the last 30 days of behavior"""
+        self.companies = {}
+        async for progress in user_progress_collection.find({}):
+            user_id = progress.get("user_id")
+            company_id = await company_directory.company_of(user_id) if user_id else None
+            if company_id:
+                calendar = ActivityCalendar.from_progress(progress)
+                calendar.bits &= (1 << 64) - 1
+                self.companies.setdefault(company_id, CompanyRollup()).members[user_id] = _Member(calendar)
+
+        today = datetime.utcnow().date()
+        since = datetime.combine(today - timedelta(days=ROLLUP_WINDOW_DAYS - 1), datetime.min.time())
+        async for behavior in user_behavior_collection.find({"timestamp": {"$gte": since}}):
+            company_id = company_directory.cached(behavior["user_id"])
+            if not company_id:
+                continue
+            rollup = self.companies.setdefault(company_id, CompanyRollup())
+            member = rollup.members.setdefault(behavior["user_id"], _Member())
+            day = behavior["timestamp"].date()
+            member.calendar.record(day)
+            if (today - day).days < 7:
+                member.actions[day] = member.actions.get(day, 0) + 1
+            category = (behavior.get("details") or {}).get("category")
+            if category and behavior.get("action") in CATEGORY_ACTIONS:
+                mix = rollup.categories_by_day.setdefault(day, {})
+                mix[category] = mix.get(category, 0) + 1
+
+        for rollup in self.companies.values():
+            for member in rollup.members.values():
+                last_day = member.calendar.last_day
+                if last_day is not None:
+                    rollup.users_by_last_active[last_day] = rollup.users_by_last_active.get(last_day, 0) + 1
+            rollup.roll(today)
+
+        print(f"🏢 Company rollups loaded for {len(self.companies)} companies")
+
+company_rollups = CompanyRollups()
+invalidation_bus.subscribe("company_rollups", company_rollups._received)
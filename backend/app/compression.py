@@ -0,0 +1,207 @@
+import gzip
+import os
+import zlib
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+from fastapi.responses import Response
+from .metrics import registry
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent uncompressed; headers would eat most of the saving
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "500"))
+# Per-request levels favour speed; precompressed bodies are compressed once at maximum level
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+# Server-sent events must reach the client as they are produced
+UNBUFFERED_TYPES = ("text/event-stream",)
+
+compressed_bytes_total = registry.counter(
+    "http_compressed_bytes_total", "Response bytes before (identity) and after compression", ("encoding", "stage")
+)
+
+# Encoding negotiated by CompressionMiddleware for the current request
+_accepted_encoding: ContextVar[Optional[str]] = ContextVar("accepted_encoding", default=None)
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Preferred encoding the client accepts: br when available, then gzip"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+def accepted_encoding() -> Optional[str]:
+    """Encoding to use for the current request's response, or None for identity"""
+    return _accepted_encoding.get()
+
+def compress(body: bytes, encoding: str, best: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if best else COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=9 if best else COMPRESSION_GZIP_LEVEL, mtime=0)
+
+class Precompressed:
+    """Immutable response body compressed once per encoding, on first use"""
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        self._variants: Dict[str, bytes] = {}
+
+    def variant(self, encoding: str) -> bytes:
+        if encoding not in self._variants:
+            self._variants[encoding] = compress(self.body, encoding, best=True)
+        return self._variants[encoding]
+
+    def response(self, status_code: int = 200) -> Response:
+        """Response for the current request, compressed if the client accepts it"""
+        encoding = accepted_encoding()
+        if encoding is None or len(self.body) < COMPRESSION_MIN_BYTES:
+            return Response(content=self.body, status_code=status_code, media_type=self.media_type)
+        return Response(
+            content=self.variant(encoding),
+            status_code=status_code,
+            media_type=self.media_type,
+            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+        )
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+def _header(headers: List, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON and text responses with brotli or gzip
+
+    Bodies below COMPRESSION_MIN_BYTES, non-text types, server-sent events and
+    responses that already carry a Content-Encoding (e.g. Precompressed) pass
+    through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate((_header(scope["headers"], b"accept-encoding") or b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state: Dict[str, Any] = {"start": None, "compressor": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+                state["passthrough"] = (
+                    _header(headers, b"content-encoding") is not None
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or content_type.startswith(UNBUFFERED_TYPES)
+                )
+                if state["passthrough"]:
+                    await send(message)
+                else:
+                    # Hold the start message until the first body chunk shows whether to compress
+                    state["start"] = message
+                return
+
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            start = state["start"]
+
+            if start is not None:
+                state["start"] = None
+                headers = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"content-length"]
+                if not more_body and len(body) < self.minimum_size:
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                headers.append((b"content-encoding", encoding.encode()))
+                vary = _header(headers, b"vary")
+                if vary is None:
+                    headers.append((b"vary", b"Accept-Encoding"))
+                elif b"accept-encoding" not in vary.lower():
+                    headers = [(k, v) for k, v in headers if k.lower() != b"vary"]
+                    headers.append((b"vary", vary + b", Accept-Encoding"))
+
+                if not more_body:
+                    compressed = compress(body, encoding)
+                    compressed_bytes_total.labels(encoding, "identity").inc(len(body))
+                    compressed_bytes_total.labels(encoding, "compressed").inc(len(compressed))
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+                state["compressor"] = _StreamCompressor(encoding)
+                await send({**start, "headers": headers})
+
+            compressor = state["compressor"]
+            data = compressor.chunk(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            compressed_bytes_total.labels(encoding, "identity").inc(len(body))
+            compressed_bytes_total.labels(encoding, "compressed").inc(len(data))
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        token = _accepted_encoding.set(encoding)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _accepted_encoding.reset(token)
+
+def install_compression(app):
+    """Compress responses for clients that send Accept-Encoding: br or gzip"""
+    app.add_middleware(CompressionMiddleware)
+    if brotli is None:
+        print("ℹ️  brotli not installed; compressing responses with gzip only")
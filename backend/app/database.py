@@ -1,15 +1,27 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, Callable
 import json
 import os
-from datetime import datetime
+import asyncio
+import heapq
+import itertools
+import operator
+from datetime import datetime, date, timedelta
 import uuid
+import bisect
+import re
+import sqlite3
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from .metrics import registry, db_operations_total, db_scanned_documents
+from .startup import startup_timer
 
 load_dotenv()
 
 # In-memory database for development
 _memory_db = {
     "users": {},
+    "companies": {},
     "sessions": {},
     "programs": {},
     "user_progress": {},
@@ -17,135 +29,469 @@ _memory_db = {
     "payment_transactions": {},
     "user_behavior": {},
     "challenges": {},
+    "challenge_progress": {},
+    "challenge_awards": {},
     "bookings": {},
     "notifications": {},
     "wellness_packages": {}
 }
 
-class MemoryCollection:
-    """In-memory collection that mimics MongoDB collection interface"""
+# Range operators supported in queries, e.g. {"timestamp": {"$gte": since}}
+_COMPARISONS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+def _is_range(value: Any) -> bool:
+    return isinstance(value, dict) and bool(value) and all(op in _COMPARISONS for op in value)
+
+def _in_range(doc_value: Any, bounds) -> bool:
+    """Whether a field value satisfies every (comparison, bound) pair"""
+    if doc_value is None:
+        return False
+    try:
+        for compare, bound in bounds:
+            if not compare(doc_value, bound):
+                return False
+    except TypeError:
+        # e.g. comparing a string field with a datetime bound
+        return False
+    return True
+
+def _compile_query(query: Dict[str, Any]):
+    """Predicate for a query, built once per scan so each document costs only its comparisons"""
+    equalities = []
+    ranges = []
+    for key, value in query.items():
+        if _is_range(value):
+            ranges.append((key, tuple((_COMPARISONS[op], bound) for op, bound in value.items())))
+        else:
+            equalities.append((key, value))
+    
+    def match(doc):
+        for key, value in equalities:
+            if doc.get(key) != value:
+                return False
+        for key, bounds in ranges:
+            if not _in_range(doc.get(key), bounds):
+                return False
+        return True
+    return match
+
+class BaseCollection:
+    """Query matching and update operators shared by the collection engines"""
     
     def __init__(self, name: str):
         self.name = name
+        # TTL indexes: field -> expireAfterSeconds
+        self.ttl_indexes: Dict[str, float] = {}
+    
+    def _record(self, operation: str, scanned: int = 0):
+        """Count an operation and how many documents it had to examine"""
+        db_operations_total.labels(self.name, operation).inc()
+        db_scanned_documents.labels(self.name, operation).observe(scanned)
+    
+    def _expiry(self, doc: Dict[str, Any], field: str) -> Optional[datetime]:
+        """When a document expires under the TTL index on field (MongoDB expireAfterSeconds)"""
+        value = doc.get(field)
+        if not isinstance(value, datetime):
+            return None
+        return value + timedelta(seconds=self.ttl_indexes[field])
+    
+    @staticmethod
+    def _apply_update(doc: Dict[str, Any], update: Dict[str, Any]):
+        """Apply $set/$inc/$addToSet/$pull operators to a document in place"""
+        if "$set" in update:
+            doc.update(update["$set"])
+        if "$inc" in update:
+            for key, value in update["$inc"].items():
+                doc[key] = doc.get(key, 0) + value
+        if "$addToSet" in update:
+            for key, value in update["$addToSet"].items():
+                if key not in doc:
+                    doc[key] = []
+                if value not in doc[key]:
+                    doc[key].append(value)
+        if "$pull" in update:
+            for key, value in update["$pull"].items():
+                if key in doc and isinstance(doc[key], list):
+                    doc[key] = [item for item in doc[key] if item != value]
+    
+    def _upsert_document(self, query: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        """New document for an upsert that matched nothing"""
+        # Like MongoDB, seed the new document with the query's equality fields
+        new_doc = {key: value for key, value in query.items() if not isinstance(value, dict)}
+        self._apply_update(new_doc, update)
+        
+        # Use the query _id if provided, otherwise generate one
+        new_doc["_id"] = query.get("_id", str(uuid.uuid4()))
+        return new_doc
+    
+    def _match_query(self, doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+        """Match equality conditions and $gt/$gte/$lt/$lte ranges on top-level fields"""
+        for key, value in query.items():
+            if _is_range(value):
+                if not _in_range(doc.get(key), ((_COMPARISONS[op], bound) for op, bound in value.items())):
+                    return False
+            elif doc.get(key) != value:
+                return False
+        return True
+    
+    def _matcher(self, query: Dict[str, Any], candidates: int):
+        """Predicate for checking `candidates` documents against a query
+
+        Scans compile the query once; a point lookup checks its one document directly.
+        """
+        if candidates > 1:
+            return _compile_query(query)
+        return lambda doc: self._match_query(doc, query)
+
+class MemoryCollection(BaseCollection):
+    """In-memory collection that mimics MongoDB collection interface"""
+    
+    def __init__(self, name: str):
+        super().__init__(name)
         self.data = _memory_db[name]
+        # field -> value -> ordered set (dict keys) of _ids
+        self.indexes: Dict[str, Dict[Any, Dict[str, None]]] = {}
+        # (field, sort_field) -> value -> [(sort_key, _id)] kept sorted by sort_key
+        self.sorted_indexes: Dict[tuple, Dict[Any, List[tuple]]] = {}
+        # Heap of (expires, seq, _id, field) for the TTL indexes
+        self._ttl_heap: List[tuple] = []
+        self._ttl_seq = itertools.count()
+        # Bumped on every write so callers can cache data derived from the collection
+        self.version = 0
+    
+    def document_count(self) -> int:
+        return len(self.data)
     
     async def insert_one(self, document: Dict[str, Any]):
         """Insert a single document"""
-        doc_id = str(uuid.uuid4())
+        doc_id = document.get("_id") or str(uuid.uuid4())
+        if doc_id in self.data:
+            raise ValueError(f"Duplicate _id {doc_id!r} in collection {self.name}")
         document["_id"] = doc_id
+        self._record("insert_one")
+        self.version += 1
         self.data[doc_id] = document
+        self._index_doc(document)
+        self._schedule_expiry(document)
         return type('Result', (), {'inserted_id': doc_id})()
     
+    async def insert_many(self, documents: List[Dict[str, Any]]):
+        """Insert several documents"""
+        inserted_ids = []
+        for document in documents:
+            doc_id = document.get("_id") or str(uuid.uuid4())
+            if doc_id in self.data:
+                raise ValueError(f"Duplicate _id {doc_id!r} in collection {self.name}")
+            document["_id"] = doc_id
+            self.data[doc_id] = document
+            self._index_doc(document)
+            self._schedule_expiry(document)
+            inserted_ids.append(doc_id)
+        self.version += 1
+        self._record("insert_many")
+        return type('Result', (), {'inserted_ids': inserted_ids})()
+    
     async def find_one(self, query: Dict[str, Any] = None):
         """Find a single document"""
         if not query:
-            return list(self.data.values())[0] if self.data else None
+            self._record("find_one", 1 if self.data else 0)
+            return next(iter(self.data.values()), None)
         
-        for doc in self.data.values():
-            if self._match_query(doc, query):
+        scanned = 0
+        candidates = self._candidates(query)[0]
+        match = self._matcher(query, len(candidates))
+        for doc in candidates:
+            scanned += 1
+            if match(doc):
+                self._record("find_one", scanned)
                 return doc
+        self._record("find_one", scanned)
         return None
     
     def find(self, query: Dict[str, Any] = None):
         """Find multiple documents"""
         if not query:
+            self._record("find", len(self.data))
             return MemoryQuery(list(self.data.values()))
         
-        matching_docs = []
-        for doc in self.data.values():
-            if self._match_query(doc, query):
-                matching_docs.append(doc)
+        candidates, presorted_by = self._candidates(query)
+        self._record("find", len(candidates))
+        match = _compile_query(query)
+        matching_docs = [doc for doc in candidates if match(doc)]
         
-        return MemoryQuery(matching_docs)
+        return MemoryQuery(matching_docs, presorted_by=presorted_by)
     
     async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
         """Update a single document"""
-        for doc_id, doc in self.data.items():
-            if self._match_query(doc, query):
-                if "$set" in update:
-                    doc.update(update["$set"])
-                if "$inc" in update:
-                    for key, value in update["$inc"].items():
-                        doc[key] = doc.get(key, 0) + value
-                if "$addToSet" in update:
-                    for key, value in update["$addToSet"].items():
-                        if key not in doc:
-                            doc[key] = []
-                        if value not in doc[key]:
-                            doc[key].append(value)
-                if "$pull" in update:
-                    for key, value in update["$pull"].items():
-                        if key in doc and isinstance(doc[key], list):
-                            doc[key] = [item for item in doc[key] if item != value]
+        scanned = 0
+        candidates = self._candidates(query)[0]
+        match = self._matcher(query, len(candidates))
+        for doc in candidates:
+            scanned += 1
+            if match(doc):
+                self._record("update_one", scanned)
+                self.version += 1
+                before = self._indexed_values(doc)
+                self._apply_update(doc, update)
+                self._reindex_doc(doc, before)
+                self._reschedule_expiry(doc, before)
                 return
         
+        self._record("update_one", scanned)
         if upsert:
-            new_doc = {}
-            if "$set" in update:
-                new_doc.update(update["$set"])
-            if "$inc" in update:
-                for key, value in update["$inc"].items():
-                    new_doc[key] = value
-            
-            # Use the query _id if provided, otherwise generate one
-            doc_id = query.get("_id", str(uuid.uuid4()))
-            new_doc["_id"] = doc_id
+            new_doc = self._upsert_document(query, update)
+            doc_id = new_doc["_id"]
+            self.version += 1
             self.data[doc_id] = new_doc
+            self._index_doc(new_doc)
+            self._schedule_expiry(new_doc)
     
-    async def create_index(self, index_spec, unique: bool = False, sparse: bool = False):
-        """Create index (no-op for memory database)"""
-        pass
+    async def update_one_with(self, query: Dict[str, Any], build_update: Callable[[Optional[Dict[str, Any]]], Dict[str, Any]], upsert: bool = False):
+        """Update a single document with build_update(current document or None), as one atomic step
+
+        For read-modify-write updates: no other update of the document can land
+        between the read and the write. build_update must not modify its argument.
+        """
+        # Neither call awaits anything, so no other task runs in between
+        update = build_update(await self.find_one(query))
+        if update:
+            await self.update_one(query, update, upsert=upsert)
     
-    def _match_query(self, doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
-        """Simple query matching"""
-        for key, value in query.items():
-            if key == "_id":
-                if doc.get("_id") != value:
-                    return False
-            elif key == "expires_at" and isinstance(value, dict):
-                # Handle datetime comparisons
-                doc_value = doc.get("expires_at")
-                if not doc_value:
-                    return False
-                
-                if "$gt" in value:
-                    if doc_value <= value["$gt"]:
-                        return False
-                if "$gte" in value:
-                    if doc_value < value["$gte"]:
-                        return False
-                if "$lt" in value:
-                    if doc_value >= value["$lt"]:
-                        return False
-                if "$lte" in value:
-                    if doc_value > value["$lte"]:
-                        return False
-            elif key == "timestamp" and isinstance(value, dict):
-                # Handle timestamp range queries
-                doc_timestamp = doc.get("timestamp")
-                if not doc_timestamp:
-                    return False
-                
-                if "$gte" in value:
-                    if doc_timestamp < value["$gte"]:
-                        return False
-                if "$lte" in value:
-                    if doc_timestamp > value["$lte"]:
-                        return False
-            elif doc.get(key) != value:
-                return False
+    async def delete_one(self, query: Dict[str, Any]):
+        """Delete the first matching document"""
+        scanned = 0
+        candidates = self._candidates(query)[0]
+        match = self._matcher(query, len(candidates))
+        for doc in candidates:
+            scanned += 1
+            if match(doc):
+                self._record("delete_one", scanned)
+                self._remove(doc["_id"])
+                return type('Result', (), {'deleted_count': 1})()
+        self._record("delete_one", scanned)
+        return type('Result', (), {'deleted_count': 0})()
+    
+    async def delete_many(self, query: Dict[str, Any]):
+        """Delete all matching documents"""
+        candidates = self._candidates(query)[0] if query else list(self.data.values())
+        self._record("delete_many", len(candidates))
+        match = _compile_query(query) if query else None
+        doomed = [doc["_id"] for doc in candidates if match is None or match(doc)]
+        for doc_id in doomed:
+            self._remove(doc_id)
+        return type('Result', (), {'deleted_count': len(doomed)})()
+    
+    def _remove(self, doc_id: str):
+        doc = self.data.pop(doc_id, None)
+        if doc is not None:
+            self.version += 1
+            self._unindex_doc(doc)
+    
+    async def sweep_expired(self, now: Optional[datetime] = None, batch_size: int = 500) -> int:
+        """Delete up to batch_size documents whose TTL has passed; returns how many"""
+        now = now or datetime.utcnow()
+        removed = 0
+        
+        while self._ttl_heap and removed < batch_size and self._ttl_heap[0][0] <= now:
+            expires, _, doc_id, field = heapq.heappop(self._ttl_heap)
+            doc = self.data.get(doc_id)
+            # Skip stale heap entries for deleted documents or changed expiry values
+            if doc is None or self._expiry(doc, field) != expires:
+                continue
+            self._remove(doc_id)
+            removed += 1
+        
+        return removed
+    
+    def _schedule_expiry(self, doc: Dict[str, Any]):
+        for field in self.ttl_indexes:
+            expires = self._expiry(doc, field)
+            if expires is not None:
+                heapq.heappush(self._ttl_heap, (expires, next(self._ttl_seq), doc["_id"], field))
+    
+    def _reschedule_expiry(self, doc: Dict[str, Any], before: Dict[str, Any]):
+        """Push a new heap entry when a TTL field changed; the old one is skipped lazily"""
+        for field in self.ttl_indexes:
+            if before.get(field) != doc.get(field):
+                expires = self._expiry(doc, field)
+                if expires is not None:
+                    heapq.heappush(self._ttl_heap, (expires, next(self._ttl_seq), doc["_id"], field))
+    
+    async def create_index(
+        self,
+        index_spec,
+        unique: bool = False,
+        sparse: bool = False,
+        expireAfterSeconds: Optional[float] = None
+    ):
+        """Create an equality index on a field, or a sorted index for [(field, 1), (sort_field, ±1)]
+        
+        With expireAfterSeconds this is a TTL index: documents are removed by
+        sweep_expired once the datetime in the field plus that many seconds has
+        passed. Uniqueness is not enforced by the memory database.
+        """
+        if isinstance(index_spec, str):
+            index_spec = [(index_spec, 1)]
+        
+        field = index_spec[0][0]
+        
+        if expireAfterSeconds is not None:
+            if field not in self.ttl_indexes:
+                self.ttl_indexes[field] = expireAfterSeconds
+                for doc in self.data.values():
+                    expires = self._expiry(doc, field)
+                    if expires is not None:
+                        self._ttl_heap.append((expires, next(self._ttl_seq), doc["_id"], field))
+                heapq.heapify(self._ttl_heap)
+            return
+        
+        if field not in self.indexes:
+            self.indexes[field] = {}
+            for doc in self.data.values():
+                self._add_to_index(field, doc)
+        
+        if len(index_spec) > 1:
+            key = (field, index_spec[1][0])
+            if key not in self.sorted_indexes:
+                self.sorted_indexes[key] = {}
+                for doc in self.data.values():
+                    self._add_to_sorted_index(key, doc)
+    
+    def _candidates(self, query: Dict[str, Any]):
+        """Documents that may match the query, using the most selective index
+        
+        Returns (documents, sort_field) where sort_field names the field the
+        documents are already in ascending order of, if any.
+        """
+        if "_id" in query and not isinstance(query["_id"], dict):
+            doc = self.data.get(query["_id"]) if _hashable(query["_id"]) else None
+            return ([doc] if doc is not None else []), None
+        
+        best = None
+        for field, value in query.items():
+            if field in self.indexes and not isinstance(value, dict) and _hashable(value):
+                bucket = self.indexes[field].get(value, {})
+                if best is None or len(bucket) < len(best[2]):
+                    best = (field, value, bucket)
+        
+        if best is None:
+            return list(self.data.values()), None
+        
+        field, value, bucket = best
+        unhashable = self._unhashable_docs(field)
+        
+        # Prefer a sorted index on the same field so .sort() is a no-op
+        if not unhashable:
+            for (indexed_field, sort_field), sorted_buckets in self.sorted_indexes.items():
+                if indexed_field == field:
+                    entries = sorted_buckets.get(value, [])
+                    return [self.data[doc_id] for _, doc_id in entries], sort_field
+        
+        return [self.data[doc_id] for doc_id in bucket] + unhashable, None
+    
+    def _unhashable_docs(self, field: str) -> List[Dict[str, Any]]:
+        """Documents whose value for an indexed field cannot be used as a key"""
+        return [self.data[doc_id] for doc_id in self.indexes[field].get(_UNHASHABLE, {})]
+    
+    def _indexed_values(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Snapshot of indexed field values, taken before an update"""
+        fields = set(self.indexes)
+        fields.update(sort_field for _, sort_field in self.sorted_indexes)
+        fields.update(self.ttl_indexes)
+        return {field: _index_key(doc.get(field)) for field in fields}
+    
+    def _index_doc(self, doc: Dict[str, Any]):
+        for field in self.indexes:
+            self._add_to_index(field, doc)
+        for key in self.sorted_indexes:
+            self._add_to_sorted_index(key, doc)
+    
+    def _unindex_doc(self, doc: Dict[str, Any], values: Dict[str, Any] = None):
+        """Remove a document from all indexes (using previous values if given)"""
+        values = values if values is not None else self._indexed_values(doc)
+        for field, buckets in self.indexes.items():
+            bucket = buckets.get(values[field])
+            if bucket is not None:
+                bucket.pop(doc["_id"], None)
+                if not bucket:
+                    del buckets[values[field]]
+        for (field, sort_field), buckets in self.sorted_indexes.items():
+            value = values[field]
+            entries = buckets.get(value)
+            if entries is not None:
+                entry = (_sort_key(values[sort_field]), doc["_id"])
+                position = bisect.bisect_left(entries, entry)
+                if position < len(entries) and entries[position] == entry:
+                    del entries[position]
+                if not entries:
+                    del buckets[value]
+    
+    def _reindex_doc(self, doc: Dict[str, Any], before: Dict[str, Any]):
+        """Move a document between index buckets if indexed fields changed"""
+        if before and before != self._indexed_values(doc):
+            self._unindex_doc(doc, before)
+            self._index_doc(doc)
+    
+    def _add_to_index(self, field: str, doc: Dict[str, Any]):
+        self.indexes[field].setdefault(_index_key(doc.get(field)), {})[doc["_id"]] = None
+    
+    def _add_to_sorted_index(self, key: tuple, doc: Dict[str, Any]):
+        field, sort_field = key
+        entries = self.sorted_indexes[key].setdefault(_index_key(doc.get(field)), [])
+        bisect.insort(entries, (_sort_key(_index_key(doc.get(sort_field))), doc["_id"]))
+    
+# Index bucket for values that cannot be dict keys (lists, dicts)
+_UNHASHABLE = object()
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
         return True
+    except TypeError:
+        return False
+
+def _index_key(value: Any) -> Any:
+    return value if _hashable(value) else _UNHASHABLE
+
+def _sort_key(value: Any) -> tuple:
+    """Sort key for sorted indexes, ordering values of different types by type first
+
+    Like MongoDB: missing and unhashable values, then numbers, strings,
+    booleans, datetimes and dates. Other types sort last by their repr, so
+    any two keys compare and an insert can never fail halfway through indexing.
+    """
+    if value is None or value is _UNHASHABLE:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (3, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (4, value)
+    if isinstance(value, date):
+        return (5, value)
+    return (6, type(value).__name__, repr(value))
 
 class MemoryQuery:
     """Memory query result that mimics MongoDB cursor"""
     
-    def __init__(self, documents: List[Dict[str, Any]]):
+    def __init__(self, documents: List[Dict[str, Any]], presorted_by: Optional[str] = None):
         self.documents = documents
+        self.presorted_by = presorted_by
     
     def sort(self, key: str, direction: int = 1):
         """Sort documents"""
         reverse = direction == -1
-        self.documents.sort(key=lambda x: x.get(key, ""), reverse=reverse)
+        if key == self.presorted_by:
+            # Already in ascending order from a sorted index
+            if reverse:
+                self.documents.reverse()
+        else:
+            # Type-ranked like the sorted indexes, so mixed and missing values still compare
+            self.documents.sort(key=lambda x: _sort_key(_index_key(x.get(key))), reverse=reverse)
+        self.presorted_by = None
         return self
     
     def limit(self, count: int):
@@ -175,39 +521,657 @@ class MemoryQuery:
         self._index += 1
         return doc
 
+# Shared SQLite engine (DATABASE_ENGINE=sqlite), used when several worker processes serve the app
+DATABASE_ENGINE = os.getenv("DATABASE_ENGINE", "memory").lower()
+SQLITE_PATH = os.getenv(
+    "SQLITE_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "teamwelly.db")
+)
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", "5"))
+# NORMAL in WAL mode: a commit survives a process crash, and only the last few
+# commits can be lost on power failure. FULL syncs the WAL on every commit.
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+# Rows fetched at a time by cursors, so large results are never loaded at once
+SQLITE_CURSOR_BATCH_SIZE = int(os.getenv("SQLITE_CURSOR_BATCH_SIZE", "500"))
+_sqlite: Optional[sqlite3.Connection] = None
+
+# Field names that can be embedded in a JSON path (and so in a generated column)
+_JSON_FIELD = re.compile(r"^[A-Za-z0-9_]+$")
+
+def _open_sqlite() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(SQLITE_PATH) or ".", exist_ok=True)
+    # isolation_level=None: autocommit, with explicit BEGIN IMMEDIATE for writes
+    connection = sqlite3.connect(
+        SQLITE_PATH, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, isolation_level=None, check_same_thread=False
+    )
+    # WAL lets readers in every worker proceed while one process writes
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    return connection
+
+def sqlite_connection() -> Optional[sqlite3.Connection]:
+    """This process's connection to the shared SQLite database, or None with the memory engine
+
+    Used on the event loop for short reads, which WAL never makes wait
+    (invalidation polling, version reads). Every write, and collection queries
+    that can scan, can wait up to SQLITE_BUSY_TIMEOUT_SECONDS for the write lock;
+    they run on the SQLite thread with its own connection (see run_in_sqlite_thread).
+    """
+    global _sqlite
+    if DATABASE_ENGINE != "sqlite":
+        return None
+    if _sqlite is None:
+        _sqlite = _open_sqlite()
+        _sqlite.execute("CREATE TABLE IF NOT EXISTS collection_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+    return _sqlite
+
+# One thread runs every collection operation, so the event loop never waits on
+# SQLite and the thread's connection never has two transactions open at once
+_sqlite_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+_sqlite_thread_connection: Optional[sqlite3.Connection] = None
+
+def sqlite_thread_connection() -> sqlite3.Connection:
+    """The SQLite thread's connection (only call from that thread)"""
+    global _sqlite_thread_connection
+    if _sqlite_thread_connection is None:
+        _sqlite_thread_connection = _open_sqlite()
+    return _sqlite_thread_connection
+
+async def run_in_sqlite_thread(function, *args):
+    """Run a blocking SQLite call on the SQLite thread and await its result"""
+    return await asyncio.get_running_loop().run_in_executor(_sqlite_executor, function, *args)
+
+def submit_to_sqlite_thread(function, *args) -> Future:
+    """Queue a blocking SQLite call on the SQLite thread without waiting for it"""
+    return _sqlite_executor.submit(function, *args)
+
+def checkpoint_sqlite(mode: str = "PASSIVE") -> bool:
+    """Copy committed WAL pages into the database file and record the flush for /ready
+
+    PASSIVE never blocks readers or writers; TRUNCATE (used on shutdown) also
+    empties the WAL file. Returns False with the memory engine.
+    """
+    connection = sqlite_connection()
+    if connection is None:
+        return False
+    busy, _, _ = connection.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    if busy:
+        return False
+    from .health import mark_flush
+    mark_flush()
+    return True
+
+@contextmanager
+def sqlite_transaction(connection: sqlite3.Connection):
+    """Write transaction that takes the database lock up front, so read-modify-write
+    sequences cannot interleave with another process"""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+def _iso(value: Any) -> str:
+    # Fixed-width timestamps, so stored strings sort like the datetimes they encode
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="microseconds")
+    return value.isoformat()
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": _iso(value)}
+    if isinstance(value, date):
+        return {"$day": _iso(value)}
+    raise TypeError(f"Cannot store {type(value).__name__} in a document")
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        if "$date" in obj:
+            return datetime.fromisoformat(obj["$date"])
+        if "$day" in obj:
+            return date.fromisoformat(obj["$day"])
+    return obj
+
+def encode_document(document: Dict[str, Any]) -> str:
+    """JSON text for a document, with datetimes as {"$date": iso}"""
+    return json.dumps(document, default=_encode_value, separators=(",", ":"))
+
+def decode_document(text: str) -> Dict[str, Any]:
+    return json.loads(text, object_hook=_decode_object)
+
+def _sql_value(value: Any) -> Any:
+    """Query value as SQL compares it with a field's column (see SQLiteCollection._value_sql)"""
+    if isinstance(value, (datetime, date)):
+        return _iso(value)
+    return value
+
+# Values whose SQL equality agrees with Python's. Strings are not among them:
+# a stored datetime is ISO text to SQL, which an equal string would match.
+_EXACT_TYPES = (int, float, type(None))
+_SQL_COMPARISONS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+class SQLiteQuery:
+    """Lazy cursor over a SQLiteCollection query, mimicking a MongoDB cursor
+
+    Nothing is read until to_list() or async iteration. sort() and limit()
+    become ORDER BY and LIMIT, and rows are streamed in batches on the SQLite
+    thread, so a query only holds the documents it returns.
+    """
+    
+    def __init__(self, collection: "SQLiteCollection", query: Optional[Dict[str, Any]]):
+        self.collection = collection
+        self.query = query
+        self._order: List[Tuple[str, int]] = []
+        self._limit: Optional[int] = None
+        self._iterator = None
+        self._batch: List[Dict[str, Any]] = []
+    
+    def sort(self, key: str, direction: int = 1):
+        """Sort documents; the latest sort key takes precedence, like repeated stable sorts"""
+        self._order.insert(0, (key, direction))
+        return self
+    
+    def limit(self, count: int):
+        """Limit number of documents"""
+        self._limit = count if self._limit is None else min(self._limit, count)
+        return self
+    
+    async def to_list(self, length: int = None):
+        """Convert to list"""
+        limit = self._limit
+        if length:
+            limit = length if limit is None else min(limit, length)
+        matching = self.collection._matching(self.query, "find", self._order, limit)
+        return await run_in_sqlite_thread(list, matching)
+    
+    def __aiter__(self):
+        """Make async iterable"""
+        self._iterator = self.collection._matching(self.query, "find", self._order, self._limit)
+        self._batch = []
+        return self
+    
+    async def __anext__(self):
+        """Async iterator"""
+        if not self._batch:
+            batch = await run_in_sqlite_thread(list, itertools.islice(self._iterator, SQLITE_CURSOR_BATCH_SIZE))
+            if not batch:
+                raise StopAsyncIteration
+            # Reversed, so each document is popped off the end
+            self._batch = batch[::-1]
+        return self._batch.pop()
+
+class SQLiteCollection(BaseCollection):
+    """Collection stored in a SQLite database shared by every worker process
+
+    Documents are JSON rows keyed by _id. create_index adds a generated column
+    per indexed field (the field's JSON value, with datetimes as their ISO
+    text) and a B-tree index over those columns. Equality and $gt/$gte/$lt/$lte
+    conditions, sorts and limits are translated to SQL on those columns, and
+    rows are still checked by the matcher MemoryCollection uses, so both engines
+    return the same documents. Every write bumps a shared version counter, so
+    caches keyed on `version` see writes made by other processes.
+
+    Queries and writes run on the SQLite thread (run_in_sqlite_thread) with its
+    connection; `connection` is only used for the table setup, `version` and
+    `document_count`.
+    """
+    
+    def __init__(self, name: str, connection: sqlite3.Connection):
+        super().__init__(name)
+        self.connection = connection
+        self.table = f'"{name}"'
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (_id TEXT PRIMARY KEY, doc TEXT NOT NULL)")
+        # Generated columns already present, by field name (another worker may have added them)
+        self._columns = {
+            row[1][2:] for row in connection.execute(f"PRAGMA table_xinfo({self.table})") if row[1].startswith("f_")
+        }
+    
+    @property
+    def version(self) -> int:
+        row = self.connection.execute("SELECT version FROM collection_versions WHERE name = ?", (self.name,)).fetchone()
+        return row[0] if row else 0
+    
+    def _bump_version(self, connection: sqlite3.Connection):
+        connection.execute(
+            "INSERT INTO collection_versions (name, version) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+            (self.name,)
+        )
+    
+    def document_count(self) -> int:
+        return self.connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+    
+    @staticmethod
+    def _field_expression(field: str) -> str:
+        """A field's value as SQL compares it: datetimes and dates as ISO text, other JSON values as-is"""
+        return (
+            f"COALESCE(json_extract(doc, '$.\"{field}\".\"$date\"'), "
+            f"json_extract(doc, '$.\"{field}\".\"$day\"'), json_extract(doc, '$.\"{field}\"'))"
+        )
+    
+    def _value_sql(self, field: str) -> Optional[str]:
+        """SQL for a field's value: _id, its generated column, or the JSON expression"""
+        if field == "_id":
+            return "_id"
+        if field in self._columns:
+            return f'"f_{field}"'
+        if _JSON_FIELD.match(field):
+            return self._field_expression(field)
+        return None
+    
+    def _where(self, query: Optional[Dict[str, Any]]):
+        """SQL WHERE clause for the query's equality and range conditions
+
+        Returns (sql, params, exact) where exact is True when SQL alone decides
+        which documents match, so a LIMIT can be applied in SQL.
+        """
+        clauses, params, exact = [], [], True
+        for key, value in (query or {}).items():
+            column = self._value_sql(key)
+            if column is None:
+                exact = False
+            elif isinstance(value, (str, int, float, datetime, date)) or value is None:
+                if value is None:
+                    clauses.append(f"{column} IS NULL")
+                else:
+                    clauses.append(f"{column} = ?")
+                    params.append(_sql_value(value))
+                exact = exact and isinstance(value, _EXACT_TYPES) and not isinstance(value, bool)
+            elif _is_range(value):
+                for op, bound in value.items():
+                    clauses.append(f"{column} {_SQL_COMPARISONS[op]} ?")
+                    params.append(_sql_value(bound))
+                # Python refuses to order mixed types, SQL does not
+                exact = False
+            else:
+                exact = False
+        sql = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return sql, params, exact
+    
+    def _matching(
+        self,
+        query: Optional[Dict[str, Any]],
+        operation: str,
+        order: Optional[List[Tuple[str, int]]] = None,
+        limit: Optional[int] = None
+    ):
+        """Yield documents matching the query, streamed from SQLite in batches"""
+        if order and any(self._value_sql(field) is None for field, _ in order):
+            # Not expressible in SQL; sort the matches in Python like MemoryQuery
+            documents = list(self._matching(query, operation))
+            for field, direction in reversed(order):
+                documents.sort(key=lambda x: _sort_key(_index_key(x.get(field))), reverse=direction == -1)
+            yield from documents[:limit] if limit is not None else documents
+            return
+        
+        where, params, exact = self._where(query)
+        order_sql = ""
+        if order:
+            # rowid breaks ties in insertion order, as Python's stable sort does
+            terms = [f"{self._value_sql(field)} {'DESC' if direction == -1 else 'ASC'}" for field, direction in order]
+            order_sql = f" ORDER BY {', '.join(terms)}, rowid"
+        limit_sql = ""
+        if limit is not None and exact:
+            limit_sql = " LIMIT ?"
+            params = params + [limit]
+        batch_size = min(limit, SQLITE_CURSOR_BATCH_SIZE) if limit else SQLITE_CURSOR_BATCH_SIZE
+        
+        match = _compile_query(query) if query else None
+        cursor = sqlite_thread_connection().execute(f"SELECT doc FROM {self.table}{where}{order_sql}{limit_sql}", params)
+        scanned = returned = 0
+        try:
+            while limit is None or returned < limit:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for (text,) in rows:
+                    scanned += 1
+                    doc = decode_document(text)
+                    if match is None or match(doc):
+                        returned += 1
+                        yield doc
+                        if limit is not None and returned >= limit:
+                            break
+        finally:
+            cursor.close()
+            self._record(operation, scanned)
+    
+    def _first(self, query: Optional[Dict[str, Any]], operation: str) -> Optional[Dict[str, Any]]:
+        for doc in self._matching(query, operation, limit=1):
+            return doc
+        return None
+    
+    async def insert_one(self, document: Dict[str, Any]):
+        """Insert a single document"""
+        doc_id = document.get("_id") or str(uuid.uuid4())
+        document["_id"] = doc_id
+        self._record("insert_one")
+        text = encode_document(document)
+        
+        def insert():
+            with sqlite_transaction(sqlite_thread_connection()) as connection:
+                connection.execute(f"INSERT INTO {self.table} (_id, doc) VALUES (?, ?)", (doc_id, text))
+                self._bump_version(connection)
+        
+        try:
+            await run_in_sqlite_thread(insert)
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Duplicate _id {doc_id!r} in collection {self.name}")
+        return type('Result', (), {'inserted_id': doc_id})()
+    
+    async def insert_many(self, documents: List[Dict[str, Any]]):
+        """Insert several documents"""
+        for document in documents:
+            document["_id"] = document.get("_id") or str(uuid.uuid4())
+        self._record("insert_many")
+        rows = [(document["_id"], encode_document(document)) for document in documents]
+        
+        def insert():
+            with sqlite_transaction(sqlite_thread_connection()) as connection:
+                connection.executemany(f"INSERT INTO {self.table} (_id, doc) VALUES (?, ?)", rows)
+                self._bump_version(connection)
+        
+        try:
+            await run_in_sqlite_thread(insert)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Duplicate _id in collection {self.name}: {e}")
+        return type('Result', (), {'inserted_ids': [document["_id"] for document in documents]})()
+    
+    async def find_one(self, query: Dict[str, Any] = None):
+        """Find a single document"""
+        return await run_in_sqlite_thread(self._first, query, "find_one")
+    
+    def find(self, query: Dict[str, Any] = None):
+        """Find multiple documents"""
+        return SQLiteQuery(self, query)
+    
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        """Update a single document"""
+        await self.update_one_with(query, lambda _: update, upsert=upsert)
+    
+    async def update_one_with(self, query: Dict[str, Any], build_update: Callable[[Optional[Dict[str, Any]]], Dict[str, Any]], upsert: bool = False):
+        """Update a single document with build_update(current document or None), as one atomic step
+
+        The read and the write share one BEGIN IMMEDIATE transaction, so no
+        other worker can update the document in between.
+        """
+        def update_document():
+            with sqlite_transaction(sqlite_thread_connection()) as connection:
+                doc = self._first(query, "update_one")
+                update = build_update(doc)
+                if not update:
+                    return
+                if doc is not None:
+                    self._apply_update(doc, update)
+                    connection.execute(f"UPDATE {self.table} SET doc = ? WHERE _id = ?", (encode_document(doc), doc["_id"]))
+                    self._bump_version(connection)
+                elif upsert:
+                    new_doc = self._upsert_document(query, update)
+                    connection.execute(f"INSERT INTO {self.table} (_id, doc) VALUES (?, ?)", (new_doc["_id"], encode_document(new_doc)))
+                    self._bump_version(connection)
+        
+        await run_in_sqlite_thread(update_document)
+    
+    async def delete_one(self, query: Dict[str, Any]):
+        """Delete the first matching document"""
+        def delete():
+            with sqlite_transaction(sqlite_thread_connection()) as connection:
+                doc = self._first(query, "delete_one")
+                if doc is None:
+                    return 0
+                connection.execute(f"DELETE FROM {self.table} WHERE _id = ?", (doc["_id"],))
+                self._bump_version(connection)
+            return 1
+        
+        return type('Result', (), {'deleted_count': await run_in_sqlite_thread(delete)})()
+    
+    async def delete_many(self, query: Dict[str, Any]):
+        """Delete all matching documents"""
+        def delete():
+            with sqlite_transaction(sqlite_thread_connection()) as connection:
+                doomed = [(doc["_id"],) for doc in self._matching(query, "delete_many")]
+                if doomed:
+                    connection.executemany(f"DELETE FROM {self.table} WHERE _id = ?", doomed)
+                    self._bump_version(connection)
+            return len(doomed)
+        
+        return type('Result', (), {'deleted_count': await run_in_sqlite_thread(delete)})()
+    
+    async def sweep_expired(self, now: Optional[datetime] = None, batch_size: int = 500) -> int:
+        """Delete up to batch_size documents whose TTL has passed; returns how many"""
+        now = now or datetime.utcnow()
+        return await run_in_sqlite_thread(self._sweep_expired, now, batch_size)
+    
+    def _sweep_expired(self, now: datetime, batch_size: int) -> int:
+        removed = 0
+        
+        with sqlite_transaction(sqlite_thread_connection()) as connection:
+            for field, seconds in self.ttl_indexes.items():
+                cutoff = _iso(now - timedelta(seconds=seconds))
+                column = self._value_sql(field)
+                rows = connection.execute(
+                    f"SELECT doc FROM {self.table} WHERE {column} <= ? LIMIT ?",
+                    (cutoff, batch_size - removed)
+                ).fetchall()
+                # Only datetime values expire; recheck in Python to skip anything else
+                doomed = []
+                for (text,) in rows:
+                    doc = decode_document(text)
+                    expires = self._expiry(doc, field)
+                    if expires is not None and expires <= now:
+                        doomed.append((doc["_id"],))
+                if doomed:
+                    connection.executemany(f"DELETE FROM {self.table} WHERE _id = ?", doomed)
+                    removed += len(doomed)
+                if removed >= batch_size:
+                    break
+            if removed:
+                self._bump_version(connection)
+        
+        return removed
+    
+    def _add_column(self, field: str):
+        """Add a generated column holding the field's value; VIRTUAL, so it costs no storage"""
+        if field in self._columns:
+            return
+        try:
+            sqlite_thread_connection().execute(
+                f'ALTER TABLE {self.table} ADD COLUMN "f_{field}" '
+                f"GENERATED ALWAYS AS ({self._field_expression(field)}) VIRTUAL"
+            )
+        except sqlite3.OperationalError as e:
+            # Another worker added it first
+            if "duplicate column" not in str(e):
+                raise
+        self._columns.add(field)
+    
+    async def create_index(
+        self,
+        index_spec,
+        unique: bool = False,
+        sparse: bool = False,
+        expireAfterSeconds: Optional[float] = None
+    ):
+        """Index generated columns for the given fields, or register a TTL index
+
+        The TTL field is indexed too, so sweeps do not scan the table. As with
+        the memory engine, uniqueness is not enforced.
+        """
+        if isinstance(index_spec, str):
+            index_spec = [(index_spec, 1)]
+        
+        fields = [field for field, _ in index_spec]
+        
+        if expireAfterSeconds is not None:
+            self.ttl_indexes[fields[0]] = expireAfterSeconds
+            fields = fields[:1]
+        
+        if "_id" in fields or not all(_JSON_FIELD.match(field) for field in fields):
+            return
+        await run_in_sqlite_thread(self._create_index, fields)
+    
+    def _create_index(self, fields: List[str]):
+        for field in fields:
+            self._add_column(field)
+        columns = ", ".join(f'"f_{field}"' for field in fields)
+        connection = sqlite_thread_connection()
+        connection.execute(
+            f'CREATE INDEX IF NOT EXISTS "idx_{self.name}_{"_".join(fields)}" ON {self.table} ({columns})'
+        )
+        # Expression indexes created before generated columns were used
+        for field in fields:
+            connection.execute(f'DROP INDEX IF EXISTS "ix_{self.name}_{field}"')
+
+def _new_collection(name: str) -> BaseCollection:
+    """Collection for the configured DATABASE_ENGINE"""
+    connection = sqlite_connection()
+    if connection is not None:
+        return SQLiteCollection(name, connection)
+    return MemoryCollection(name)
+
+if DATABASE_ENGINE == "memory" and int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+    print("⚠️  WEB_CONCURRENCY > 1 with the memory database engine: every worker has its own data. "
+          "Set DATABASE_ENGINE=sqlite or start the app with serve.py")
+
 # Database configuration
 USE_MEMORY_DB = os.getenv("USE_MEMORY_DB", "false").lower() == "true"
 DATABASE_NAME = os.getenv("DATABASE_NAME", "teamwelly")
 
 # Use in-memory database for development
 database = None
-users_collection = MemoryCollection("users")
-user_sessions_collection = MemoryCollection("sessions")
-programs_collection = MemoryCollection("programs")
-user_progress_collection = MemoryCollection("user_progress")
-chat_history_collection = MemoryCollection("chat_history")
-payment_transactions_collection = MemoryCollection("payment_transactions")
-user_behavior_collection = MemoryCollection("user_behavior")
-challenges_collection = MemoryCollection("challenges")
-bookings_collection = MemoryCollection("bookings")
-notifications_collection = MemoryCollection("notifications")
-wellness_packages_collection = MemoryCollection("wellness_packages")
+# Set once init_database has created indexes and seed data (used by readiness checks)
+database_ready = False
+users_collection = _new_collection("users")
+# Companies with corporate plans; employees join with the company's invite_code
+companies_collection = _new_collection("companies")
+user_sessions_collection = _new_collection("sessions")
+programs_collection = _new_collection("programs")
+user_progress_collection = _new_collection("user_progress")
+chat_history_collection = _new_collection("chat_history")
+payment_transactions_collection = _new_collection("payment_transactions")
+user_behavior_collection = _new_collection("user_behavior")
+challenges_collection = _new_collection("challenges")
+challenge_progress_collection = _new_collection("challenge_progress")
+# One document per (user, challenge, period) awarded; its _id makes a second award fail
+challenge_awards_collection = _new_collection("challenge_awards")
+bookings_collection = _new_collection("bookings")
+notifications_collection = _new_collection("notifications")
+wellness_packages_collection = _new_collection("wellness_packages")
+
+ALL_COLLECTIONS = [
+    users_collection,
+    companies_collection,
+    user_sessions_collection,
+    programs_collection,
+    user_progress_collection,
+    chat_history_collection,
+    payment_transactions_collection,
+    user_behavior_collection,
+    challenges_collection,
+    challenge_progress_collection,
+    challenge_awards_collection,
+    bookings_collection,
+    notifications_collection,
+    wellness_packages_collection
+]
+
+db_documents = registry.gauge("db_documents", "Documents stored per collection", ("collection",))
+for _collection in ALL_COLLECTIONS:
+    db_documents.labels(_collection.name).set_function(_collection.document_count)
+
+# Background TTL sweeper (started from the app lifespan)
+TTL_SWEEP_INTERVAL_SECONDS = float(os.getenv("TTL_SWEEP_INTERVAL_SECONDS", "60"))
+TTL_SWEEP_BATCH_SIZE = int(os.getenv("TTL_SWEEP_BATCH_SIZE", "500"))
+_ttl_sweeper_task: Optional[asyncio.Task] = None
+
+async def sweep_expired_documents(batch_size: int = TTL_SWEEP_BATCH_SIZE) -> int:
+    """Evict expired documents from every collection with a TTL index, batch by batch"""
+    total = 0
+    for collection in ALL_COLLECTIONS:
+        if not collection.ttl_indexes:
+            continue
+        while True:
+            removed = await collection.sweep_expired(batch_size=batch_size)
+            total += removed
+            if removed < batch_size:
+                break
+            # Yield between batches so request handlers are not starved
+            await asyncio.sleep(0)
+    return total
+
+async def _ttl_sweeper_loop(interval: float):
+    while True:
+        try:
+            removed = await sweep_expired_documents()
+            if removed:
+                print(f"🧹 TTL sweeper removed {removed} expired documents")
+        except Exception as e:
+            print(f"Error sweeping expired documents: {e}")
+        try:
+            checkpoint_sqlite()
+        except Exception as e:
+            print(f"Error checkpointing SQLite WAL: {e}")
+        await asyncio.sleep(interval)
+
+def start_ttl_sweeper(interval: float = TTL_SWEEP_INTERVAL_SECONDS):
+    """Start the background TTL sweeper task"""
+    global _ttl_sweeper_task
+    if _ttl_sweeper_task is None or _ttl_sweeper_task.done():
+        _ttl_sweeper_task = asyncio.create_task(_ttl_sweeper_loop(interval))
+
+async def stop_ttl_sweeper():
+    """Stop the background TTL sweeper task"""
+    global _ttl_sweeper_task
+    if _ttl_sweeper_task is not None:
+        _ttl_sweeper_task.cancel()
+        try:
+            await _ttl_sweeper_task
+        except asyncio.CancelledError:
+            pass
+        _ttl_sweeper_task = None
+    # Leave a self-contained database file behind
+    try:
+        checkpoint_sqlite("TRUNCATE")
+    except Exception as e:
+        print(f"Error checkpointing SQLite WAL: {e}")
 
 async def init_database():
     """Initialize database with indexes and default data"""
+    global database_ready
     try:
         # Create indexes
-        await users_collection.create_index("email", unique=True)
-        await users_collection.create_index("google_id", unique=True, sparse=True)
-        await user_sessions_collection.create_index("session_id", unique=True)
-        await chat_history_collection.create_index("user_id")
-        await user_behavior_collection.create_index("user_id")
-        await payment_transactions_collection.create_index("session_id", unique=True)
+        with startup_timer.phase("database.indexes"):
+            await asyncio.gather(
+                users_collection.create_index("email", unique=True),
+                users_collection.create_index("google_id", unique=True, sparse=True),
+                companies_collection.create_index("invite_code", unique=True),
+                user_sessions_collection.create_index("session_id", unique=True),
+                user_sessions_collection.create_index("session_token", unique=True),
+                user_sessions_collection.create_index("expires_at", expireAfterSeconds=0),
+                chat_history_collection.create_index("user_id"),
+                chat_history_collection.create_index([("user_id", 1), ("timestamp", -1)]),
+                user_behavior_collection.create_index("user_id"),
+                user_behavior_collection.create_index([("user_id", 1), ("timestamp", -1)]),
+                payment_transactions_collection.create_index("session_id", unique=True),
+                payment_transactions_collection.create_index("payment_id", unique=True),
+                payment_transactions_collection.create_index([("user_id", 1), ("created_at", -1)]),
+                user_progress_collection.create_index("user_id", unique=True),
+                # Seeds upsert (and routers look up) programs and challenges by their slug id
+                programs_collection.create_index("id", unique=True),
+                challenges_collection.create_index("id", unique=True),
+                challenge_progress_collection.create_index("user_id"),
+                challenge_awards_collection.create_index("expires_at", expireAfterSeconds=0),
+                bookings_collection.create_index("date"),
+                notifications_collection.create_index([("user_id", 1), ("created_at", -1)])
+            )
         
         # Initialize default programs
-        await init_default_programs()
-        await init_default_challenges()
+        with startup_timer.phase("database.seed"):
+            await asyncio.gather(init_default_programs(), init_default_challenges(), init_default_companies())
+        checkpoint_sqlite()
         
+        database_ready = True
         print("Database initialized successfully")
     except Exception as e:
         print(f"Error initializing database: {e}")
@@ -322,12 +1286,10 @@ async def init_default_programs():
         }
     ]
     
-    for program in default_programs:
-        await programs_collection.update_one(
-            {"id": program["id"]}, 
-            {"$set": program}, 
-            upsert=True
-        )
+    await asyncio.gather(*(
+        programs_collection.update_one({"id": program["id"]}, {"$set": program}, upsert=True)
+        for program in default_programs
+    ))
 
 async def init_default_challenges():
     """Initialize default wellness challenges"""
@@ -379,12 +1341,28 @@ async def init_default_challenges():
         }
     ]
     
-    for challenge in default_challenges:
-        await challenges_collection.update_one(
-            {"id": challenge["id"]}, 
-            {"$set": challenge}, 
-            upsert=True
-        )
+    await asyncio.gather(*(
+        challenges_collection.update_one({"id": challenge["id"]}, {"$set": challenge}, upsert=True)
+        for challenge in default_challenges
+    ))
+
+# Companies to register at startup, as "Name:invite-code" pairs separated by commas
+SEED_COMPANIES = os.getenv("SEED_COMPANIES", "")
+
+async def init_default_companies():
+    """Register the companies listed in SEED_COMPANIES (more are added through /api/companies)"""
+    companies = []
+    for entry in filter(None, (part.strip() for part in SEED_COMPANIES.split(","))):
+        name, _, invite_code = entry.rpartition(":")
+        if not name or not invite_code:
+            print(f"⚠️  Ignoring SEED_COMPANIES entry {entry!r}; expected Name:invite-code")
+            continue
+        companies.append({"name": name, "invite_code": invite_code})
+    
+    await asyncio.gather(*(
+        companies_collection.update_one({"invite_code": company["invite_code"]}, {"$set": company}, upsert=True)
+        for company in companies
+    ))
 
 def get_database():
     """Get database instance"""
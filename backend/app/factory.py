@@ -0,0 +1,469 @@
+"""
+FastAPI app factory
+
+    create_app("full")        # server.py, deployed on Railway
+    create_app("extended")    # "full" plus payments and AI chat (APP_PROFILE=extended)
+    create_app("minimal")     # main.py: authentication, OAuth and payments
+    create_app("oauth-only")  # sign-in service: email and OAuth authentication
+
+Every profile gets the same middleware, health and metrics endpoints, caches
+and background workers; profiles only differ in the routers they mount.
+"""
+# Imported first, so its clock covers the rest of startup
+from .startup import startup_timer
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables from .env.local first, then .env
+load_dotenv('.env.local')
+load_dotenv('.env')
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from starlette.middleware.sessions import SessionMiddleware
+from .company_directory import company_directory
+from .company_rollups import company_rollups
+from .compression import install_compression
+from .database import init_database, start_ttl_sweeper, stop_ttl_sweeper
+from .health import install_health, loop_lag_probe
+from .insights_worker import insights_worker
+from .invalidation import invalidation_bus
+from .leaderboard import leaderboards
+from .lazy_routers import include_lazy_router, start_router_preload
+from .loop_monitor import install_loop_monitor, loop_monitor
+from .metrics import install_metrics
+from .notification_scheduler import notification_scheduler
+from .profiler import install_profiler
+from .rate_limit import install_rate_limiting
+from .responses import FastJSONResponse, static_json
+from .webhook_queue import webhook_queue
+
+APP_VERSION = "2.1.0"
+
+# Every mountable router: where it is served and how /, /api/info and /health describe it.
+# Routers that declare their own /api/... prefix are included without another one.
+ROUTERS: Dict[str, Dict[str, Any]] = {
+    "enhanced_auth": {
+        "module": "app.routers.enhanced_auth",
+        "paths": ["/api/auth"],
+        "include": {"prefix": "/api/auth", "tags": ["Enhanced Authentication"]},
+        "feature": "✅ Enhanced Authentication with Emergent Auth",
+        "service": ("auth", "✅ Emergent Auth Ready"),
+        "endpoint": ("auth", "/api/auth/*"),
+        "info": ("authentication", {
+            "emergent_auth": "✅ Hassle-free email authentication",
+            "session_management": "✅ 7-day session tokens",
+            "user_profiles": "✅ Complete user management"
+        })
+    },
+    "oauth": {
+        "module": "app.routers.oauth",
+        "paths": ["/api/auth/google", "/api/auth/apple", "/api/auth/twitter", "/api/auth/oauth"],
+        "include": {"prefix": "/api", "tags": ["OAuth Authentication"]},
+        "feature": "✅ OAuth Authentication (Google, Apple, Twitter/X)",
+        "service": ("oauth", "✅ OAuth Ready"),
+        "endpoint": ("oauth", "/api/auth/google, /api/auth/apple, /api/auth/twitter"),
+        "info": ("oauth_authentication", {
+            "google_oauth": "✅ Working with rotated credentials",
+            "apple_oauth": "✅ Working with real credentials",
+            "twitter_oauth": "OAuth 2.0",
+            "session_management": "✅ 7-day session tokens"
+        })
+    },
+    "enhanced_payments": {
+        "module": "app.routers.enhanced_payments",
+        "paths": ["/api/payments"],
+        "include": {"prefix": "/api/payments", "tags": ["Enhanced Payments"]},
+        "feature": "✅ Stripe Payment Integration",
+        "service": ("payments", "✅ Stripe Configured"),
+        "endpoint": ("payments", "/api/payments/*"),
+        "info": ("payments", {
+            "stripe_integration": "✅ Secure payment processing",
+            "wellness_packages": "✅ Predefined wellness plans",
+            "payment_history": "✅ Transaction tracking",
+            "webhooks": "✅ Real-time payment updates"
+        })
+    },
+    "auth_legacy": {
+        "module": "app.routers.auth",
+        "paths": ["/api/auth-legacy"],
+        "include": {"prefix": "/api/auth-legacy", "tags": ["Legacy Authentication"]}
+    },
+    "payments_legacy": {
+        "module": "app.routers.payments",
+        "paths": ["/api/payments-legacy"],
+        "include": {"prefix": "/api/payments-legacy", "tags": ["Legacy Payments"]}
+    },
+    "ai_chat": {
+        "module": "app.routers.ai_chat",
+        "paths": ["/api/ai"],
+        "include": {"tags": ["AI Chat"]},
+        "feature": "✅ AI-powered Wellness Coaching",
+        "service": ("ai_chat", "✅ AI Chat Ready"),
+        "endpoint": ("ai_chat", "/api/ai/*"),
+        "info": ("ai_coaching", {
+            "gemini_integration": "⚠️ Requires API key",
+            "behavioral_analysis": "✅ User behavior tracking",
+            "personalized_recommendations": "✅ AI-driven suggestions"
+        })
+    },
+    "programs": {
+        "module": "app.routers.programs",
+        "paths": ["/api/programs"],
+        "include": {"tags": ["Programs"]},
+        "feature": "✅ Comprehensive Program Management",
+        "endpoint": ("programs", "/api/programs/*"),
+        "info": ("programs", {
+            "comprehensive_library": "✅ 6 program categories",
+            "progress_tracking": "✅ User progress analytics",
+            "bookmarking": "✅ Save favorite programs"
+        })
+    },
+    "analytics": {
+        "module": "app.routers.analytics",
+        "paths": ["/api/analytics"],
+        "include": {"tags": ["Analytics"]},
+        "feature": "✅ Real-time Analytics",
+        "endpoint": ("analytics", "/api/analytics/*")
+    },
+    "leaderboard": {
+        "module": "app.routers.leaderboard",
+        "paths": ["/api/leaderboard"],
+        "include": {"tags": ["Leaderboard"]},
+        "feature": "✅ WellyPoints Leaderboards",
+        "endpoint": ("leaderboard", "/api/leaderboard")
+    },
+    "companies": {
+        "module": "app.routers.companies",
+        "paths": ["/api/companies"],
+        "include": {"tags": ["Companies"]},
+        "endpoint": ("companies", "/api/companies")
+    },
+}
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    # The payment and AI chat routers need emergentintegrations, which the
+    # Railway deployment does not install; they are only mounted by "extended"
+    "full": {
+        "title": "Team Welly API",
+        "description": "Health and wellness platform with AI-powered coaching",
+        "routers": ["enhanced_auth", "oauth", "auth_legacy", "programs", "analytics", "leaderboard", "companies"]
+    },
+    "extended": {
+        "title": "Team Welly API",
+        "description": "Health and wellness platform with AI-powered coaching",
+        "routers": [
+            "enhanced_auth", "enhanced_payments", "oauth", "auth_legacy", "payments_legacy",
+            "ai_chat", "programs", "analytics", "leaderboard", "companies"
+        ]
+    },
+    "minimal": {
+        "title": "Team Welly API v2.1 - OAuth Ready",
+        "description": "Health and wellness platform with OAuth authentication",
+        "routers": ["enhanced_auth", "enhanced_payments", "oauth"]
+    },
+    "oauth-only": {
+        "title": "Team Welly API v2.1 - Sign-in",
+        "description": "Email and OAuth sign-in for the Team Welly platform",
+        "routers": ["enhanced_auth", "oauth"]
+    },
+}
+
+_TEST_PAGE = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Team Welly API v2.1 - Test Page</title>
+        <style>
+            body {
+                font-family: Arial, sans-serif;
+                max-width: 800px;
+                margin: 0 auto;
+                padding: 20px;
+                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                color: white;
+            }
+            .container {
+                background: rgba(255,255,255,0.1);
+                padding: 40px;
+                border-radius: 10px;
+                backdrop-filter: blur(10px);
+            }
+            h1 { color: #fff; text-align: center; }
+            .feature {
+                background: rgba(255,255,255,0.1);
+                padding: 15px;
+                margin: 10px 0;
+                border-radius: 5px;
+            }
+            .oauth-button {
+                display: inline-block;
+                margin: 10px;
+                padding: 15px 30px;
+                background: #fff;
+                color: #333;
+                text-decoration: none;
+                border-radius: 5px;
+                font-weight: bold;
+                transition: transform 0.2s;
+            }
+            .oauth-button:hover {
+                transform: translateY(-2px);
+            }
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h1>🏥 Team Welly API v2.1</h1>
+
+            <div class="feature">
+                <h3>✅ OAuth Providers</h3>
+                <a href="/api/auth/google" class="oauth-button">🔍 Google OAuth</a>
+                <a href="/api/auth/apple" class="oauth-button">🍎 Apple OAuth</a>
+                <a href="/api/auth/twitter" class="oauth-button">🐦 Twitter OAuth</a>
+            </div>
+
+            <div class="feature">
+                <h3>🔧 Debug & Info</h3>
+                <a href="/debug/env" class="oauth-button">🔍 Environment Variables</a>
+                <a href="/api/info" class="oauth-button">ℹ️ API Information</a>
+            </div>
+
+            <div class="feature">
+                <h3>🏥 Health Check</h3>
+                <a href="/health" class="oauth-button">💚 Health Status</a>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup
+    print(f"🚀 Starting {app.title}...")
+    startup_timer.mark("imports")
+    await init_database()
+    print("✅ Database initialized")
+    invalidation_bus.connect()
+    with startup_timer.phase("rollups"):
+        await company_directory.load()
+        await leaderboards.rebuild()
+        await company_rollups.rebuild()
+    with startup_timer.phase("notifications"):
+        await notification_scheduler.load()
+    start_ttl_sweeper()
+    loop_lag_probe.start()
+    loop_monitor.start()
+    invalidation_bus.start()
+    startup_timer.ready()
+    start_router_preload(app)
+    yield
+    # Shutdown
+    print(f"🔄 Shutting down {app.title}...")
+    await invalidation_bus.stop()
+    await loop_monitor.stop()
+    await loop_lag_probe.stop()
+    await stop_ttl_sweeper()
+    await webhook_queue.stop()
+    await insights_worker.stop()
+    await notification_scheduler.stop()
+
+def create_app(profile: Optional[str] = None) -> FastAPI:
+    """Build the API for a profile (default: $APP_PROFILE or "full")"""
+    profile = profile or os.getenv("APP_PROFILE", "full")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown app profile {profile!r}; expected one of {', '.join(PROFILES)}")
+    settings = PROFILES[profile]
+    routers: List[Dict[str, Any]] = [ROUTERS[name] for name in settings["routers"]]
+
+    app = FastAPI(
+        title=settings["title"],
+        description=settings["description"],
+        version=APP_VERSION,
+        lifespan=lifespan,
+        default_response_class=FastJSONResponse
+    )
+    app.state.profile = profile
+
+    # Add session middleware for OAuth
+    app.add_middleware(SessionMiddleware, secret_key=os.getenv("JWT_SECRET_KEY", "your-secret-key-here"))
+
+    # Per-client rate limits and load shedding (inside CORS, so refusals carry CORS headers)
+    install_rate_limiting(app)
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # In production, specify actual origins
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # gzip/brotli response compression
+    install_compression(app)
+
+    # Request metrics and Prometheus /metrics endpoint
+    install_metrics(app)
+
+    # Opt-in event-loop stall detector (LOOP_MONITOR_ENABLED=true)
+    install_loop_monitor(app)
+
+    # Per-route sampling profiler (enabled by PROFILER_TOKEN)
+    install_profiler(app)
+
+    @app.get("/")
+    @static_json
+    async def root():
+        return {
+            "message": "🏥 Team Welly API is running!",
+            "version": APP_VERSION,
+            "profile": profile,
+            "features": [router["feature"] for router in routers if "feature" in router] + [
+                "✅ Progressive Web App Support"
+            ],
+            "status": "healthy"
+        }
+
+    # Liveness (/health) and readiness (/ready) probes
+    install_health(app, version=APP_VERSION, services=dict(router["service"] for router in routers if "service" in router))
+
+    # Routers are imported on the first request under their paths (or by the preload after startup)
+    for router in routers:
+        include_lazy_router(app, router["module"], router["paths"], **router["include"])
+
+    @app.get("/api/info")
+    @static_json
+    async def api_info():
+        features = dict(router["info"] for router in routers if "info" in router)
+        info = {
+            "title": app.title,
+            "description": app.description,
+            "profile": profile,
+            "features": features,
+            "endpoints": dict(router["endpoint"] for router in routers if "endpoint" in router)
+        }
+        if "oauth_authentication" in features:
+            # Check if Twitter OAuth credentials are loaded
+            twitter_client_id = os.getenv('TWITTER_CLIENT_ID')
+            twitter_configured = "✅ Configured" if twitter_client_id else "❌ Not Configured"
+            features["oauth_authentication"] = {
+                **features["oauth_authentication"], "twitter_oauth": f"{twitter_configured} - OAuth 2.0"
+            }
+            info["debug"] = {
+                "twitter_client_id_present": bool(twitter_client_id),
+                "twitter_client_id_length": len(twitter_client_id) if twitter_client_id else 0
+            }
+        return info
+
+    if ROUTERS["oauth"] in routers:
+        _add_apple_endpoints(app)
+
+    # Debug endpoint to check environment variables
+    @app.get("/debug/env")
+    async def debug_env():
+        return {
+            "twitter_client_id": os.getenv('TWITTER_CLIENT_ID', 'NOT_SET'),
+            "google_client_id": os.getenv('GOOGLE_CLIENT_ID', 'NOT_SET'),
+            "apple_service_id": os.getenv('APPLE_SERVICE_ID', 'NOT_SET'),
+            "env_vars_loaded": {
+                "twitter": bool(os.getenv('TWITTER_CLIENT_ID')),
+                "google": bool(os.getenv('GOOGLE_CLIENT_ID')),
+                "apple": bool(os.getenv('APPLE_SERVICE_ID'))
+            }
+        }
+
+    # Test endpoint
+    @app.get("/test")
+    async def test_page():
+        return HTMLResponse(_TEST_PAGE)
+
+    # Enhanced error handling
+    available_endpoints = [f"{path} - {name}" for name, path in (router["endpoint"] for router in routers if "endpoint" in router)]
+
+    @app.exception_handler(404)
+    async def not_found_handler(request, exc):
+        return JSONResponse(status_code=404, content={
+            "detail": getattr(exc, "detail", "Not Found"),
+            "error": "Not Found",
+            "message": "The requested resource was not found",
+            "available_endpoints": available_endpoints
+        })
+
+    @app.exception_handler(500)
+    async def internal_error_handler(request, exc):
+        return JSONResponse(status_code=500, content={
+            "error": "Internal Server Error",
+            "message": "Something went wrong on our end",
+            "support": "Please check the logs or contact support"
+        })
+
+    return app
+
+def _add_apple_endpoints(app: FastAPI):
+    """Domain association files and diagnostics for Sign in with Apple"""
+
+    # Apple domain verification endpoint
+    @app.get("/.well-known/apple-developer-domain-association.txt")
+    async def apple_domain_verification():
+        """Apple domain verification file"""
+        return PlainTextResponse("apple-domain-verification=30afIBcvoegSIX")
+
+    @app.get("/apple-app-site-association")
+    @static_json
+    async def apple_app_site_association():
+        """Apple App Site Association file"""
+        return {
+            "applinks": {
+                "apps": [],
+                "details": [
+                    {
+                        "appID": "R7C8RHPVHC.com.teamwellnesscompany.web",
+                        "paths": ["*"]
+                    }
+                ]
+            }
+        }
+
+    # Apple OAuth diagnostic endpoint
+    @app.get("/debug/apple-oauth")
+    async def debug_apple_oauth():
+        """Comprehensive Apple OAuth configuration diagnostics"""
+
+        # Check environment variables
+        service_id = os.getenv('APPLE_SERVICE_ID')
+        team_id = os.getenv('APPLE_TEAM_ID')
+        key_id = os.getenv('APPLE_KEY_ID')
+        private_key = os.getenv('APPLE_PRIVATE_KEY')
+
+        # Environment check
+        env_status = {
+            "APPLE_SERVICE_ID": service_id or "NOT_SET",
+            "APPLE_TEAM_ID": team_id or "NOT_SET",
+            "APPLE_KEY_ID": key_id or "NOT_SET",
+            "APPLE_PRIVATE_KEY": "SET" if private_key else "NOT_SET"
+        }
+
+        # Expected configuration
+        expected_config = {
+            "service_id": service_id or "com.teamwellnesscompany.web",
+            "redirect_uri": "https://teamwellnesscompanysite-production.up.railway.app/api/auth/apple/callback",
+            "domain": "teamwellnesscompanysite-production.up.railway.app"
+        }
+
+        return {
+            "environment_variables": env_status,
+            "expected_apple_configuration": expected_config,
+            "domain_verification_url": "/.well-known/apple-developer-domain-association.txt",
+            "instructions": [
+                "1. Check if Service ID is enabled for 'Sign in with Apple'",
+                "2. Verify Primary App ID is set in Service ID configuration",
+                "3. Confirm domain verification status is 'Verified'",
+                "4. Double-check Return URLs exactly match expected redirect_uri",
+                "5. Ensure email sources are configured and verified"
+            ]
+        }
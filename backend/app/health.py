@@ -0,0 +1,176 @@
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+from datetime import datetime
+from . import database
+from .metrics import registry
+from .webhook_queue import webhook_queue
+from .insights_worker import insights_worker
+from .checkout_status import checkout_status_cache
+from .startup import startup_timer
+
+# Readiness thresholds; a replica over either one should stop receiving traffic
+READINESS_MAX_LOOP_LAG_MS = float(os.getenv("READINESS_MAX_LOOP_LAG_MS", "500"))
+READINESS_MAX_QUEUE_DEPTH = int(os.getenv("READINESS_MAX_QUEUE_DEPTH", "1000"))
+LOOP_LAG_PROBE_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_PROBE_INTERVAL_SECONDS", "0.5"))
+
+class LoopLagProbe:
+    """Measure event-loop lag by timing how late a periodic sleep wakes up
+
+    A handler that blocks the loop delays every wakeup, so the overshoot of
+    `asyncio.sleep(interval)` is the time queued callbacks waited to run. The
+    last `window` samples are kept so readiness reacts to sustained lag rather
+    than one stale reading.
+    """
+
+    def __init__(self, interval: float = 0.5, window: int = 20):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self.last_lag_ms = 0.0
+        self.last_probe_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def max_lag_ms(self) -> float:
+        """Worst lag over the recent window"""
+        return max(self.samples, default=0.0)
+
+    def start(self):
+        """Start the probe task (idempotent)"""
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - start - self.interval) * 1000)
+            self.last_lag_ms = lag_ms
+            self.last_probe_at = time.monotonic()
+            self.samples.append(lag_ms)
+            loop_lag_seconds.observe(lag_ms / 1000)
+
+loop_lag_seconds = registry.histogram(
+    "event_loop_lag_seconds", "Event-loop lag measured by the health probe",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+loop_lag_probe = LoopLagProbe(interval=LOOP_LAG_PROBE_INTERVAL_SECONDS)
+registry.gauge("event_loop_lag_max_ms", "Worst event-loop lag over the probe window").set_function(
+    lambda: loop_lag_probe.max_lag_ms
+)
+
+# Last successful durable write of the database (None for the in-memory engine)
+_last_flush_at: Optional[datetime] = None
+
+def mark_flush(at: Optional[datetime] = None):
+    """Record a successful WAL flush/checkpoint; called by persistent storage engines"""
+    global _last_flush_at
+    _last_flush_at = at or datetime.utcnow()
+
+def queue_depths() -> Dict[str, int]:
+    return {
+        "webhooks": webhook_queue.depth,
+        "webhook_dead_letters": len(webhook_queue.dead_letters),
+        "insights": insights_worker.pending_count,
+        "checkout_long_poll": checkout_status_cache.waiter_count
+    }
+
+def llm_backend_status() -> Dict[str, Any]:
+    """LLM backend used by this process; the AI service is only inspected if the app loaded it"""
+    ai_service_module = sys.modules.get("app.ai_service")
+    if ai_service_module is None:
+        return {"backend": None, "available": None}
+
+    backend = ai_service_module.ai_service.llm_backend
+    try:
+        available = backend.is_available()
+    except Exception:
+        available = False
+    return {"backend": backend.name, "available": available}
+
+def liveness_report() -> Dict[str, Any]:
+    """Current process state for /health; never fails while the loop is responsive"""
+    return {
+        "database": {
+            "engine": database.DATABASE_ENGINE,
+            "initialized": database.database_ready,
+            "collections": {collection.name: collection.document_count() for collection in database.ALL_COLLECTIONS},
+            "last_flush_at": _last_flush_at
+        },
+        "event_loop": {
+            "probe_running": loop_lag_probe.running,
+            "lag_ms": round(loop_lag_probe.last_lag_ms, 2),
+            "max_lag_ms": round(loop_lag_probe.max_lag_ms, 2)
+        },
+        "queues": queue_depths(),
+        "llm": llm_backend_status(),
+        "startup": startup_timer.report()
+    }
+
+def readiness_report() -> Tuple[bool, Dict[str, Any]]:
+    """Whether this replica should receive traffic, with the reasons if not"""
+    reasons = []
+
+    if not database.database_ready:
+        reasons.append("database not initialized")
+
+    max_lag_ms = loop_lag_probe.max_lag_ms
+    if max_lag_ms > READINESS_MAX_LOOP_LAG_MS:
+        reasons.append(f"event loop lag {max_lag_ms:.0f}ms exceeds {READINESS_MAX_LOOP_LAG_MS:.0f}ms")
+
+    depth = webhook_queue.depth + insights_worker.pending_count
+    if depth > READINESS_MAX_QUEUE_DEPTH:
+        reasons.append(f"queue depth {depth} exceeds {READINESS_MAX_QUEUE_DEPTH}")
+
+    return not reasons, {
+        "ready": not reasons,
+        "reasons": reasons,
+        "max_lag_ms": round(max_lag_ms, 2),
+        "queue_depth": depth,
+        "timestamp": datetime.utcnow()
+    }
+
+def install_health(app, version: str, services: Dict[str, str]):
+    """Add /health (liveness) and /ready (readiness) endpoints to a FastAPI app
+
+    `services` lists the feature status strings the app advertises; the database
+    entry is replaced with its real state.
+    """
+    from fastapi.responses import JSONResponse
+    from fastapi.encoders import jsonable_encoder
+
+    @app.get("/health")
+    async def health_check():
+        report = liveness_report()
+        return {
+            "status": "healthy",
+            "timestamp": datetime.utcnow(),
+            "version": version,
+            "services": {
+                **services,
+                "database": "✅ Connected" if report["database"]["initialized"] else "⏳ Initializing"
+            },
+            "checks": report
+        }
+
+    @app.get("/ready")
+    async def readiness_check():
+        ready, report = readiness_report()
+        return JSONResponse(status_code=200 if ready else 503, content=jsonable_encoder(report))
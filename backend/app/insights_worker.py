@@ -0,0 +1,154 @@
+import asyncio
+import heapq
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+from datetime import datetime
+from .metrics import cache_requests_total, queue_depth
+from .invalidation import invalidation_bus
+
+class InsightsWorker:
+    """Precompute user insights in the background when new behavior arrives
+
+    Behavior events only mark a user as dirty. A single background task recomputes
+    dirty users once they have been quiet for `debounce_seconds` (or after
+    `max_delay_seconds` of continuous activity) and stores a versioned snapshot
+    that the AI endpoints can return without touching the request path.
+    """
+
+    def __init__(self, debounce_seconds: float = 2.0, max_delay_seconds: float = 10.0, batch_size: int = 100):
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.batch_size = batch_size
+        self._compute: Optional[Callable[[str], Awaitable[Dict[str, Any]]]] = None
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[str, Tuple[float, float]] = {}  # user_id -> (first_seen, due)
+        self._heap: List[Tuple[float, str]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def set_compute(self, compute: Callable[[str], Awaitable[Dict[str, Any]]]):
+        """Register the coroutine that builds {"user_insights", "recommendations"} for a user"""
+        self._compute = compute
+
+    @property
+    def pending_count(self) -> int:
+        """Number of users waiting for a recompute"""
+        return len(self._pending)
+
+    def notify(self, user_id: str):
+        """Mark a user's insights as stale (debounced)"""
+        if self._compute is None or not user_id:
+            return
+
+        # Other workers drop their copy and recompute on next use
+        invalidation_bus.publish("insights", user_id)
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        now = loop.time()
+        first_seen = self._pending.get(user_id, (now, now))[0]
+        due = min(now + self.debounce_seconds, first_seen + self.max_delay_seconds)
+        self._pending[user_id] = (first_seen, due)
+        heapq.heappush(self._heap, (due, user_id))
+
+        self._ensure_started()
+        self._wakeup.set()
+
+    def discard(self, user_id: str):
+        """Forget a user's snapshot (it changed in another worker)"""
+        self._snapshots.pop(user_id, None)
+
+    def get_snapshot(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Latest precomputed snapshot for a user, if any"""
+        return self._snapshots.get(user_id)
+
+    def store(self, user_id: str, insights: Dict[str, Any], recommendations: List[str]) -> Dict[str, Any]:
+        """Store a new snapshot version for a user"""
+        previous = self._snapshots.get(user_id)
+        snapshot = {
+            "version": (previous["version"] + 1) if previous else 1,
+            "user_insights": insights,
+            "recommendations": recommendations,
+            "generated_at": datetime.utcnow()
+        }
+        self._snapshots[user_id] = snapshot
+        return snapshot
+
+    async def recompute(self, user_id: str) -> Dict[str, Any]:
+        """Recompute and store a user's snapshot immediately"""
+        result = await self._compute(user_id)
+        return self.store(user_id, result["user_insights"], result["recommendations"])
+
+    async def get_or_compute(self, user_id: str) -> Dict[str, Any]:
+        """Latest snapshot, computing it inline only if none exists yet"""
+        snapshot = self._snapshots.get(user_id)
+        if snapshot is None:
+            cache_requests_total.labels("insights_snapshot", "miss").inc()
+            snapshot = await self.recompute(user_id)
+        else:
+            cache_requests_total.labels("insights_snapshot", "hit").inc()
+        return snapshot
+
+    def _ensure_started(self):
+        """Start the background task on first use"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def _pop_due(self, now: float) -> List[str]:
+        """Pop users whose debounce window has elapsed"""
+        due_users = []
+        while self._heap and len(due_users) < self.batch_size:
+            due, user_id = self._heap[0]
+            pending = self._pending.get(user_id)
+            if pending is None or pending[1] != due:
+                # Superseded by a later notify or already processed
+                heapq.heappop(self._heap)
+                continue
+            if due > now:
+                break
+            heapq.heappop(self._heap)
+            del self._pending[user_id]
+            due_users.append(user_id)
+        return due_users
+
+    async def _run(self):
+        """Background loop recomputing dirty users"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            self._wakeup.clear()
+
+            for user_id in self._pop_due(loop.time()):
+                try:
+                    await self.recompute(user_id)
+                except Exception as e:
+                    print(f"Error precomputing insights for {user_id}: {e}")
+                # Let request handlers run between users
+                await asyncio.sleep(0)
+
+            if self._heap and self._heap[0][0] <= loop.time():
+                continue
+
+            timeout = max(0.0, self._heap[0][0] - loop.time()) if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        """Cancel the background task"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+# Shared worker instance; ai_service registers the compute function
+insights_worker = InsightsWorker()
+queue_depth.labels("insights").set_function(lambda: insights_worker.pending_count)
+invalidation_bus.subscribe("insights", lambda user_id, _: insights_worker.discard(user_id))
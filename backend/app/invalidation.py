@@ -0,0 +1,170 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from typing import Dict, Any, List, Optional, Callable
+from .database import (
+    sqlite_connection, sqlite_thread_connection, sqlite_transaction, submit_to_sqlite_thread,
+    run_in_sqlite_thread, encode_document, decode_document
+)
+from .metrics import registry
+
+# How often each worker checks for invalidations published by the others
+INVALIDATION_POLL_SECONDS = float(os.getenv("INVALIDATION_POLL_SECONDS", "0.05"))
+# Events older than this are deleted; a worker that was stalled longer simply refetches
+INVALIDATION_RETENTION_SECONDS = float(os.getenv("INVALIDATION_RETENTION_SECONDS", "300"))
+
+invalidations_total = registry.counter(
+    "invalidations_total", "Cross-worker cache invalidations by channel and direction (sent or received)",
+    ("channel", "direction")
+)
+
+Handler = Callable[[str, Optional[Dict[str, Any]]], None]
+
+class InvalidationBus:
+    """Broadcast cache invalidations between worker processes
+
+    A process applies a change to its own caches and then publishes it. Every
+    other process polls the shared SQLite events table and hands new events to
+    the handlers subscribed to that channel. With the memory database engine
+    there is only one process, so publishing does nothing.
+
+    publish() never touches the database on the event loop: events go into an
+    outbox that the SQLite thread writes in one transaction, so everything
+    published while a write waits for the lock is written together.
+    """
+
+    def __init__(self, poll_interval: float = INVALIDATION_POLL_SECONDS, retention_seconds: float = INVALIDATION_RETENTION_SECONDS):
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._connection = None
+        self._last_id = 0
+        self._task: Optional[asyncio.Task] = None
+        self._outbox: deque = deque()
+        self._flush_queued = False
+
+    def subscribe(self, channel: str, handler: Handler):
+        """Call handler(key, payload) for events other processes publish on a channel"""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite_connection()
+            if connection is None:
+                return None
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS invalidation_events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, channel TEXT NOT NULL, "
+                "key TEXT NOT NULL, payload TEXT, created_at REAL NOT NULL)"
+            )
+            # Only events published from now on concern this process
+            self._last_id = connection.execute("SELECT COALESCE(MAX(id), 0) FROM invalidation_events").fetchone()[0]
+            self._connection = connection
+        return self._connection
+
+    def connect(self):
+        """Mark the current end of the event log; start() delivers every event published after it
+
+        Call before rebuilding caches from the database, so events other workers
+        publish during the rebuild are replayed instead of lost.
+        """
+        self._connect()
+
+    def publish(self, channel: str, key: str, payload: Optional[Dict[str, Any]] = None):
+        """Tell the other processes that `key` changed (to `payload`, if given)"""
+        if self._connect() is None:
+            return
+        self._outbox.append(
+            (self.origin, channel, key, encode_document(payload) if payload is not None else None, time.time())
+        )
+        invalidations_total.labels(channel, "sent").inc()
+        if not self._flush_queued:
+            self._flush_queued = True
+            submit_to_sqlite_thread(self._flush)
+
+    def _flush(self):
+        """Write every queued event in one transaction (on the SQLite thread)"""
+        self._flush_queued = False
+        events = []
+        while self._outbox:
+            events.append(self._outbox.popleft())
+        if not events:
+            return
+        try:
+            with sqlite_transaction(sqlite_thread_connection()) as connection:
+                connection.executemany(
+                    "INSERT INTO invalidation_events (origin, channel, key, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                    events
+                )
+        except Exception as e:
+            print(f"Error publishing {len(events)} invalidation events: {e}")
+
+    def poll(self) -> int:
+        """Dispatch events other processes published since the last poll; returns how many"""
+        connection = self._connect()
+        if connection is None:
+            return 0
+
+        rows = connection.execute(
+            "SELECT id, origin, channel, key, payload FROM invalidation_events WHERE id > ? ORDER BY id",
+            (self._last_id,)
+        ).fetchall()
+
+        received = 0
+        for event_id, origin, channel, key, payload in rows:
+            self._last_id = event_id
+            if origin == self.origin:
+                continue
+            received += 1
+            invalidations_total.labels(channel, "received").inc()
+            for handler in self._handlers.get(channel, []):
+                try:
+                    handler(key, decode_document(payload) if payload is not None else None)
+                except Exception as e:
+                    print(f"Error handling {channel} invalidation for {key}: {e}")
+        return received
+
+    def _prune(self) -> int:
+        return sqlite_thread_connection().execute(
+            "DELETE FROM invalidation_events WHERE created_at < ?", (time.time() - self.retention_seconds,)
+        ).rowcount
+
+    async def prune(self) -> int:
+        """Delete events older than the retention period"""
+        if self._connect() is None:
+            return 0
+        return await run_in_sqlite_thread(self._prune)
+
+    async def _run(self):
+        last_prune = time.monotonic()
+        while True:
+            try:
+                self.poll()
+                if time.monotonic() - last_prune >= 60:
+                    await self.prune()
+                    last_prune = time.monotonic()
+            except Exception as e:
+                print(f"Error polling invalidation events: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        """Start polling (no-op with the memory engine)"""
+        if self._connect() is None:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop polling"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+invalidation_bus = InvalidationBus()
@@ -0,0 +1,114 @@
+import asyncio
+import importlib
+import os
+import time
+from typing import List, Optional, Sequence
+from starlette.routing import BaseRoute, Match, NoMatchFound, get_route_path
+from .startup import startup_timer
+
+# Import lazily mounted routers in a worker thread once the app is ready, so
+# the first request to each does not pay for it
+LAZY_ROUTERS_PRELOAD = os.getenv("LAZY_ROUTERS_PRELOAD", "true").lower() == "true"
+
+class LazyRouter(BaseRoute):
+    """Placeholder for a router whose module is imported on the first request under its paths
+
+    `paths` are the path prefixes the router serves, given up front so the
+    module (and authlib, jose, emergentintegrations...) need not be imported to
+    know them. On the first matching request the router is included where the
+    placeholder stood, keeping route order, and the request is routed again.
+    """
+
+    def __init__(self, app, module: str, paths: Sequence[str], attribute: str = "router", **include_kwargs):
+        self.app = app
+        self.module = module
+        self.paths = tuple(path.rstrip("/") for path in paths)
+        self.attribute = attribute
+        self.include_kwargs = include_kwargs
+        self.loaded = False
+        self.error: Optional[str] = None
+
+    def matches(self, scope):
+        if scope["type"] in ("http", "websocket"):
+            path = get_route_path(scope)
+            for prefix in self.paths:
+                if path == prefix or path.startswith(prefix + "/"):
+                    return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params):
+        # Not mounted yet, so it has no named routes; NoMatchFound lets the router try the others
+        raise NoMatchFound(name, path_params)
+
+    def load(self) -> bool:
+        """Import the module and include its router in place of this placeholder"""
+        if self.loaded or self.error is not None:
+            return self.loaded
+
+        start = time.perf_counter()
+        routes = self.app.router.routes
+        try:
+            module = importlib.import_module(self.module)
+        except ImportError as e:
+            # Stop claiming these paths; they 404 like any unmounted route
+            self.error = str(e)
+            routes.remove(self)
+            print(f"⚠️  Router {self.module} unavailable: {e}")
+            return False
+
+        # include_router appends every route of the router; move them all to where the placeholder stood
+        appended_from = len(routes)
+        self.app.include_router(getattr(module, self.attribute), **self.include_kwargs)
+        appended = routes[appended_from:]
+        del routes[appended_from:]
+        position = routes.index(self)
+        routes[position:position + 1] = appended
+        self.loaded = True
+        # Regenerate the OpenAPI schema with the new routes
+        self.app.openapi_schema = None
+        print(f"📦 Mounted {self.module} in {(time.perf_counter() - start) * 1000:.0f}ms")
+        return True
+
+    async def handle(self, scope, receive, send):
+        self.load()
+        await self.app.router(scope, receive, send)
+
+def include_lazy_router(app, module: str, paths: Sequence[str], attribute: str = "router", **include_kwargs):
+    """app.include_router(module.router, **include_kwargs), deferred until a request under `paths`"""
+    if not hasattr(app.state, "lazy_routers"):
+        app.state.lazy_routers = []
+        openapi = app.openapi
+
+        def openapi_with_lazy_routers():
+            # The schema must list every route, mounted or not
+            for route in list(app.state.lazy_routers):
+                route.load()
+            return openapi()
+
+        app.openapi = openapi_with_lazy_routers
+
+    route = LazyRouter(app, module, paths, attribute, **include_kwargs)
+    app.router.routes.append(route)
+    app.state.lazy_routers.append(route)
+    return route
+
+def pending_routers(app) -> List[LazyRouter]:
+    return [route for route in getattr(app.state, "lazy_routers", []) if not route.loaded and route.error is None]
+
+async def preload_lazy_routers(app):
+    """Import pending router modules in a worker thread, then mount them on the event loop"""
+    with startup_timer.phase("routers.preload"):
+        for route in pending_routers(app):
+            try:
+                await asyncio.to_thread(importlib.import_module, route.module)
+            except ImportError:
+                pass  # load() records and reports it
+            except Exception as e:
+                print(f"Error preloading router {route.module}: {e}")
+                continue
+            route.load()
+
+def start_router_preload(app):
+    """Schedule preload_lazy_routers (LAZY_ROUTERS_PRELOAD) without delaying startup"""
+    if LAZY_ROUTERS_PRELOAD and pending_routers(app):
+        app.state.router_preload = asyncio.create_task(preload_lazy_routers(app))
@@ -0,0 +1,259 @@
+import random
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from .company_directory import company_directory
+from .database import user_progress_collection, user_behavior_collection
+from .invalidation import invalidation_bus
+from .metrics import registry
+
+# Weekly boards kept in memory: this week and the previous ones
+LEADERBOARD_WEEKS_KEPT = 2
+
+_MAX_LEVEL = 32
+
+class _Node:
+    __slots__ = ("key", "forward", "width")
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.forward: List[Optional["_Node"]] = [None] * level
+        # Positions skipped by each forward link
+        self.width: List[int] = [1] * level
+
+class IndexableSkipList:
+    """Sorted keys with O(log n) insert, remove, rank and positional lookup
+
+    Every forward link records how many positions it skips, so the position of
+    a key is the sum of the widths crossed while searching for it. Links past
+    the last node point at a virtual tail one position after it.
+    """
+
+    def __init__(self):
+        self._head = _Node(None, _MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < _MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        return level
+
+    def _predecessors(self, key) -> Tuple[List[_Node], List[int]]:
+        """Last node before `key` on every level, and its position"""
+        update = [self._head] * _MAX_LEVEL
+        positions = [0] * _MAX_LEVEL
+        node, position = self._head, 0
+        for i in reversed(range(self._level)):
+            while node.forward[i] is not None and node.forward[i].key < key:
+                position += node.width[i]
+                node = node.forward[i]
+            update[i] = node
+            positions[i] = position
+        return update, positions
+
+    def insert(self, key):
+        update, positions = self._predecessors(key)
+        level = self._random_level()
+        self._level = max(self._level, level)
+        node = _Node(key, level)
+        position = positions[0] + 1
+        for i in range(_MAX_LEVEL):
+            previous = update[i]
+            if i < level:
+                skipped = position - positions[i]
+                node.forward[i] = previous.forward[i]
+                node.width[i] = previous.width[i] - skipped + 1
+                previous.forward[i] = node
+                previous.width[i] = skipped
+            else:
+                previous.width[i] += 1
+        self._size += 1
+
+    def remove(self, key):
+        update, _ = self._predecessors(key)
+        node = update[0].forward[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for i in range(_MAX_LEVEL):
+            previous = update[i]
+            if previous.forward[i] is node:
+                previous.width[i] += node.width[i] - 1
+                previous.forward[i] = node.forward[i]
+            else:
+                previous.width[i] -= 1
+        self._size -= 1
+
+    def count_less(self, key) -> int:
+        """Number of keys strictly less than `key`"""
+        _, positions = self._predecessors(key)
+        return positions[0]
+
+    def slice(self, start: int, count: int) -> List[Any]:
+        """Up to `count` keys from 0-based position `start`"""
+        node, position = self._head, 0
+        for i in reversed(range(self._level)):
+            while node.forward[i] is not None and position + node.width[i] <= start:
+                position += node.width[i]
+                node = node.forward[i]
+        keys = []
+        node = node.forward[0]
+        while node is not None and len(keys) < count:
+            keys.append(node.key)
+            node = node.forward[0]
+        return keys
+
+class Leaderboard:
+    """Users ranked by points, highest first
+
+    Users with equal points share a rank (1, 2, 2, 4); within it they are
+    listed by user ID so pages are stable.
+    """
+
+    def __init__(self):
+        self._scores: Dict[str, int] = {}
+        self._order = IndexableSkipList()
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def score(self, user_id: str) -> Optional[int]:
+        return self._scores.get(user_id)
+
+    def set(self, user_id: str, points: int):
+        previous = self._scores.get(user_id)
+        if previous == points:
+            return
+        if previous is not None:
+            self._order.remove((-previous, user_id))
+        self._scores[user_id] = points
+        self._order.insert((-points, user_id))
+
+    def add(self, user_id: str, delta: int):
+        self.set(user_id, self._scores.get(user_id, 0) + delta)
+
+    def remove(self, user_id: str):
+        points = self._scores.pop(user_id, None)
+        if points is not None:
+            self._order.remove((-points, user_id))
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """1-based rank of a user, None if they have no points here"""
+        points = self._scores.get(user_id)
+        if points is None:
+            return None
+        return self._rank_of(points)
+
+    def _rank_of(self, points: int) -> int:
+        # Users with more points sort before (-points, "")
+        return self._order.count_less((-points, "")) + 1
+
+    def top(self, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        """Entries ranked offset+1 to offset+limit"""
+        entries = []
+        rank, last_points = 0, None
+        for position, (negated, user_id) in enumerate(self._order.slice(offset, limit), start=offset + 1):
+            points = -negated
+            if points != last_points:
+                rank = position if last_points is not None else self._rank_of(points)
+                last_points = points
+            entries.append({"rank": rank, "user_id": user_id, "points": points})
+        return entries
+
+def week_key(at: Optional[datetime] = None) -> str:
+    """ISO week a timestamp falls in, e.g. "2026-W42" """
+    year, week, _ = (at or datetime.utcnow()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+class Leaderboards:
+    """Global, per-company and weekly welly_points leaderboards
+
+    Kept up to date by record(), which BehaviorTracker calls whenever it awards
+    points, and by the same changes published from other workers. rebuild()
+    loads them from user_progress and this week's behavior at startup, so
+    ranking never scans the collections afterwards.
+    """
+
+    def __init__(self, weeks_kept: int = LEADERBOARD_WEEKS_KEPT):
+        self.weeks_kept = weeks_kept
+        self.global_board = Leaderboard()
+        self.companies: Dict[str, Leaderboard] = {}
+        self.weeks: "OrderedDict[str, Leaderboard]" = OrderedDict()
+
+    def company(self, company_id: str) -> Leaderboard:
+        return self.companies.get(company_id) or Leaderboard()
+
+    def week(self, key: Optional[str] = None) -> Leaderboard:
+        return self.weeks.get(key or week_key()) or Leaderboard()
+
+    def _week_board(self, key: str) -> Leaderboard:
+        board = self.weeks.get(key)
+        if board is None:
+            board = self.weeks[key] = Leaderboard()
+            # Weeks arrive in order; drop the ones that fell out of the window
+            while len(self.weeks) > self.weeks_kept:
+                self.weeks.popitem(last=False)
+        return board
+
+    def apply(self, user_id: str, delta: int, company_id: Optional[str], week: str):
+        """Add points a user earned to every board they appear on"""
+        self.global_board.add(user_id, delta)
+        if company_id:
+            self.companies.setdefault(company_id, Leaderboard()).add(user_id, delta)
+        if week in self.weeks or week >= max(self.weeks, default=""):
+            self._week_board(week).add(user_id, delta)
+
+    async def record(self, user_id: str, delta: int, at: Optional[datetime] = None):
+        """Points were awarded to a user; update the boards here and in other workers"""
+        company_id = await company_directory.company_of(user_id)
+        week = week_key(at)
+        self.apply(user_id, delta, company_id, week)
+        invalidation_bus.publish("leaderboard", user_id, {"delta": delta, "company_id": company_id, "week": week})
+
+    def _received(self, user_id: str, payload: Optional[Dict[str, Any]]):
+        if payload:
+            self.apply(user_id, payload["delta"], payload.get("company_id"), payload["week"])
+
+    async def rebuild(self):
+        """Load every board from the database"""
+        # Imported here: behavior_tracker records into these boards
+        from .behavior_tracker import points_for
+
+        self.global_board = Leaderboard()
+        self.companies = {}
+        self.weeks = OrderedDict()
+
+        async for progress in user_progress_collection.find({}):
+            points = progress.get("welly_points", 0)
+            user_id = progress.get("user_id")
+            if not user_id or not points:
+                continue
+            self.global_board.set(user_id, points)
+            company_id = await company_directory.company_of(user_id)
+            if company_id:
+                self.companies.setdefault(company_id, Leaderboard()).set(user_id, points)
+
+        today = datetime.utcnow()
+        since = datetime(today.year, today.month, today.day) - timedelta(days=today.weekday() + 7 * (self.weeks_kept - 1))
+        week_points: Dict[str, Dict[str, int]] = {}
+        async for behavior in user_behavior_collection.find({"timestamp": {"$gte": since}}):
+            points = points_for(behavior.get("action"), behavior.get("details") or {})
+            if points > 0:
+                totals = week_points.setdefault(week_key(behavior["timestamp"]), {})
+                totals[behavior["user_id"]] = totals.get(behavior["user_id"], 0) + points
+        for week in sorted(week_points):
+            board = self._week_board(week)
+            for user_id, points in week_points[week].items():
+                board.set(user_id, points)
+
+        print(f"🏆 Leaderboards loaded: {len(self.global_board)} users, {len(self.companies)} companies")
+
+leaderboards = Leaderboards()
+registry.gauge("leaderboard_users", "Users ranked on the global leaderboard").set_function(
+    lambda: len(leaderboards.global_board)
+)
+invalidation_bus.subscribe("leaderboard", leaderboards._received)
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+from .metrics import registry
+from .stack_sampler import thread_frame, extract_stack, collapse, request_route
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "false").lower() == "true"
+LOOP_MONITOR_THRESHOLD_MS = float(os.getenv("LOOP_MONITOR_THRESHOLD_MS", "100"))
+LOOP_MONITOR_SAMPLE_MS = float(os.getenv("LOOP_MONITOR_SAMPLE_MS", "10"))
+
+loop_stalls_total = registry.counter("event_loop_stalls_total", "Event-loop stalls over the monitor threshold by route", ("route",))
+loop_stall_seconds = registry.histogram(
+    "event_loop_stall_seconds", "Duration of detected event-loop stalls",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+class LoopMonitor:
+    """Opt-in detector for code that blocks the event loop
+
+    A heartbeat task on the loop records when it last ran. A watchdog thread
+    checks the heartbeat every `sample_ms`; once it is more than `threshold_ms`
+    late the loop is stalled, and the watchdog samples the loop thread's stack
+    until the heartbeat resumes. Each stall is attributed to the route whose
+    request was on the stack, logged as a JSON line and aggregated per
+    (route, innermost stack) for the top-N report.
+    """
+
+    def __init__(self, enabled: bool = False, threshold_ms: float = 100.0, sample_ms: float = 10.0, max_entries: int = 500):
+        self.enabled = enabled
+        self.threshold = threshold_ms / 1000
+        self.sample_interval = sample_ms / 1000
+        self.heartbeat_interval = max(self.threshold / 4, 0.005)
+        self.max_entries = max_entries
+        self.stall_count = 0
+        self._stats: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._last_beat = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start the heartbeat and watchdog (no-op unless enabled)"""
+        if not self.enabled or (self._watchdog and self._watchdog.is_alive()):
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopping.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        print(f"🩺 Loop monitor enabled (threshold {self.threshold * 1000:.0f}ms, sampling every {self.sample_interval * 1000:.0f}ms)")
+
+    async def stop(self):
+        self._stopping.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def _watch(self):
+        stall = None
+        while not self._stopping.wait(self.sample_interval):
+            beat = self._last_beat
+            late = time.monotonic() - beat - self.heartbeat_interval
+
+            if stall is not None and beat != stall["beat"]:
+                # Heartbeat ran again: the stall is over
+                self._record(stall, beat - stall["beat"] - self.heartbeat_interval)
+                stall = None
+
+            if late < self.threshold:
+                continue
+
+            frame = thread_frame(self._loop_thread_id)
+            if frame is None:
+                continue
+            if stall is None:
+                stall = {"beat": beat, "route": request_route(frame), "stacks": Counter(), "started_at": datetime.utcnow()}
+            stall["stacks"][collapse(extract_stack(frame))] += 1
+
+    def _record(self, stall: Dict[str, Any], duration: float):
+        """Aggregate a finished stall and emit a structured log line"""
+        stack, samples = stall["stacks"].most_common(1)[0]
+        route = stall["route"]
+        duration_ms = round(max(duration, self.threshold) * 1000, 1)
+        # The innermost frames identify the blocking call; keep the key short and stable
+        leaf = ";".join(stack.split(";")[-3:])
+
+        self.stall_count += 1
+        loop_stalls_total.labels(route).inc()
+        loop_stall_seconds.observe(duration_ms / 1000)
+
+        with self._lock:
+            key = (route, leaf)
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_entries:
+                    del self._stats[min(self._stats, key=lambda k: self._stats[k]["total_ms"])]
+                entry = self._stats[key] = {"route": route, "leaf": leaf, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "stack": stack}
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            if duration_ms >= entry["max_ms"]:
+                entry["max_ms"] = duration_ms
+                entry["stack"] = stack
+            entry["last_seen"] = stall["started_at"].isoformat()
+
+        print(json.dumps({
+            "event": "loop_stall",
+            "route": route,
+            "duration_ms": duration_ms,
+            "samples": samples,
+            "stack": stack,
+            "started_at": stall["started_at"].isoformat()
+        }))
+
+    def report(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Worst stall sites by total blocked time"""
+        with self._lock:
+            entries = [dict(entry) for entry in self._stats.values()]
+        entries.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        for entry in entries:
+            entry["total_ms"] = round(entry["total_ms"], 1)
+            entry["avg_ms"] = round(entry["total_ms"] / entry["count"], 1)
+        return entries[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+        self.stall_count = 0
+
+loop_monitor = LoopMonitor(
+    enabled=LOOP_MONITOR_ENABLED,
+    threshold_ms=LOOP_MONITOR_THRESHOLD_MS,
+    sample_ms=LOOP_MONITOR_SAMPLE_MS
+)
+
+def install_loop_monitor(app):
+    """Add the stall report endpoint when the loop monitor is enabled"""
+    if not loop_monitor.enabled:
+        return
+
+    @app.get("/debug/loop-stalls", include_in_schema=False)
+    async def loop_stalls(limit: int = 10, reset: bool = False):
+        report = {
+            "threshold_ms": loop_monitor.threshold * 1000,
+            "stall_count": loop_monitor.stall_count,
+            "top": loop_monitor.report(limit)
+        }
+        if reset:
+            loop_monitor.reset()
+        return report
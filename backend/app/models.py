@@ -6,6 +6,8 @@ from enum import Enum
 class UserRole(str, Enum):
     INDIVIDUAL = "individual"
     CORPORATE = "corporate"
+    # Manages a company's account: billing and per-employee payment history
+    CORPORATE_ADMIN = "corporate_admin"
     ADMIN = "admin"
 
 class UserPlan(str, Enum):
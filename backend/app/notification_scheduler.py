@@ -0,0 +1,348 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from .activity_calendar import ActivityCalendar
+from .database import (
+    bookings_collection, notifications_collection, user_progress_collection,
+    sqlite_connection, sqlite_thread_connection, sqlite_transaction, run_in_sqlite_thread
+)
+from .insights_worker import insights_worker
+from .invalidation import invalidation_bus
+from .metrics import registry, queue_depth
+
+# Where due notifications go: "collection" (the in-app notifications collection) or "log"
+NOTIFICATION_SINK = os.getenv("NOTIFICATION_SINK", "collection")
+# Most notifications handed to the sink at once
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "500"))
+# UTC hours (start-end) when users without a known time preference are not disturbed
+NOTIFICATION_QUIET_HOURS = os.getenv("NOTIFICATION_QUIET_HOURS", "22-7")
+# How long before a booked session its reminder goes out
+BOOKING_REMINDER_MINUTES = int(os.getenv("BOOKING_REMINDER_MINUTES", "60"))
+# Shortest streak worth a streak-at-risk reminder
+STREAK_REMINDER_MIN_DAYS = int(os.getenv("STREAK_REMINDER_MIN_DAYS", "2"))
+# Delivery attempts per notification, and the delay before the first retry (doubled each time)
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+NOTIFICATION_RETRY_SECONDS = float(os.getenv("NOTIFICATION_RETRY_SECONDS", "30"))
+
+def _hours(spec: str) -> Tuple[int, int]:
+    start, _, end = spec.partition("-")
+    return int(start), int(end)
+
+# Quiet hours and the hour for daily nudges, by the time of day a user is usually
+# active (AIService._get_time_preferences, via the insights snapshot)
+QUIET_HOURS = {
+    "morning": (21, 6),
+    "afternoon": (22, 8),
+    "evening": (23, 9),
+    "unknown": _hours(NOTIFICATION_QUIET_HOURS)
+}
+REMINDER_HOUR = {"morning": 8, "afternoon": 13, "evening": 19, "unknown": 18}
+
+notifications_sent_total = registry.counter(
+    "notifications_sent_total", "Notifications delivered by the scheduler, by kind and sink", ("kind", "sink")
+)
+
+def time_preference(user_id: str) -> str:
+    """morning, afternoon, evening or unknown, from the user's precomputed insights"""
+    snapshot = insights_worker.get_snapshot(user_id)
+    if snapshot:
+        preference = snapshot["user_insights"].get("time_of_day_preference")
+        if preference in QUIET_HOURS:
+            return preference
+    return "unknown"
+
+def _is_quiet(hour: int, quiet: Tuple[int, int]) -> bool:
+    start, end = quiet
+    return hour >= start or hour < end if start > end else start <= hour < end
+
+def outside_quiet_hours(when: datetime, preference: str, earlier: bool = False) -> datetime:
+    """`when`, or the end of the quiet hours it falls in (their start, if `earlier`)"""
+    quiet = QUIET_HOURS[preference]
+    if not _is_quiet(when.hour, quiet):
+        return when
+    if earlier:
+        start = when.replace(hour=quiet[0], minute=0, second=0, microsecond=0)
+        if start > when:
+            start -= timedelta(days=1)
+        return start - timedelta(minutes=1)
+    end = when.replace(hour=quiet[1], minute=0, second=0, microsecond=0)
+    if end <= when:
+        end += timedelta(days=1)
+    return end
+
+def _epoch(when: datetime) -> float:
+    return when.replace(tzinfo=timezone.utc).timestamp()
+
+class LogSink:
+    """Prints notifications; a stand-in for push or email delivery"""
+    name = "log"
+
+    async def deliver(self, notifications: List[Dict[str, Any]]):
+        for notification in notifications:
+            print(f"🔔 {notification['user_id']}: {notification['title']} - {notification['body']}")
+
+class CollectionSink:
+    """Stores notifications in the notifications collection for the app to show"""
+    name = "collection"
+
+    async def deliver(self, notifications: List[Dict[str, Any]]):
+        now = datetime.utcnow()
+        await notifications_collection.insert_many([
+            {
+                "user_id": notification["user_id"],
+                "kind": notification["kind"],
+                "title": notification["title"],
+                "body": notification["body"],
+                "data": notification.get("data") or {},
+                "read": False,
+                "created_at": now
+            }
+            for notification in notifications
+        ])
+
+SINKS = {"log": LogSink, "collection": CollectionSink}
+
+class NotificationScheduler:
+    """Deliver reminders at their due time from a single heap and background task
+
+    Each scheduled notification has a key (one streak reminder per user, one
+    reminder per booking); scheduling a key again replaces it and cancelling
+    drops it. Replaced and cancelled entries stay in the heap until they reach
+    the top and are skipped, so scheduling is O(log n) and no per-item task or
+    timer exists. Due notifications are handed to the sink in batches.
+
+    Every worker schedules the reminders for the activity it sees and passes
+    the change to the others, so all workers hold the same schedule. With the
+    SQLite engine a worker claims each delivery in the shared database first,
+    so a notification is delivered once however many workers hold it.
+
+    If the sink fails, the batch's claims are released and its notifications go
+    back on the heap with exponential backoff, up to `max_attempts` deliveries.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = NOTIFICATION_BATCH_SIZE,
+        sink=None,
+        max_attempts: int = NOTIFICATION_MAX_ATTEMPTS,
+        retry_seconds: float = NOTIFICATION_RETRY_SECONDS
+    ):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.sink = sink or SINKS.get(NOTIFICATION_SINK, CollectionSink)()
+        self._pending: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._claims_ready = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def set_sink(self, sink):
+        """Deliver through `sink`, any object with `name` and async deliver(notifications)"""
+        self.sink = sink
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def schedule(self, key: str, notification: Dict[str, Any], broadcast: bool = True):
+        """Deliver `notification` (user_id, kind, title, body, due, data) at its due time"""
+        due = _epoch(notification["due"])
+        self._pending[key] = (due, notification)
+        heapq.heappush(self._heap, (due, next(self._seq), key))
+        if broadcast:
+            invalidation_bus.publish("notifications", key, notification)
+        self._poke()
+
+    def cancel(self, key: str, broadcast: bool = True):
+        if self._pending.pop(key, None) is not None and broadcast:
+            invalidation_bus.publish("notifications", key)
+
+    def _received(self, key: str, notification: Optional[Dict[str, Any]]):
+        if notification is None:
+            self.cancel(key, broadcast=False)
+        else:
+            self.schedule(key, notification, broadcast=False)
+
+    def _poke(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    def remind_streak(self, user_id: str, streak: int, active_day: date):
+        """Nudge a user the day after `active_day` unless they are active again first"""
+        key = f"streak_at_risk:{user_id}"
+        if streak < STREAK_REMINDER_MIN_DAYS:
+            if key in self._pending:
+                self.cancel(key)
+            return
+        preference = time_preference(user_id)
+        due = datetime.combine(active_day + timedelta(days=1), datetime.min.time()).replace(hour=REMINDER_HOUR[preference])
+        self.schedule(key, {
+            "user_id": user_id,
+            "kind": "streak_at_risk",
+            "title": "Keep your streak going",
+            "body": f"You're on a {streak}-day streak. A quick session today keeps it alive.",
+            "due": outside_quiet_hours(due, preference),
+            "data": {"streak": streak}
+        })
+
+    def remind_booking(self, booking: Dict[str, Any]):
+        """Remind a user of a scheduled session BOOKING_REMINDER_MINUTES before it starts"""
+        key = f"booking_upcoming:{booking['_id']}"
+        starts_at = booking["date"]
+        if booking.get("status", "scheduled") != "scheduled" or starts_at <= datetime.utcnow():
+            self.cancel(key)
+            return
+        due = outside_quiet_hours(
+            starts_at - timedelta(minutes=BOOKING_REMINDER_MINUTES), time_preference(booking["user_id"]), earlier=True
+        )
+        self.schedule(key, {
+            "user_id": booking["user_id"],
+            "kind": "booking_upcoming",
+            "title": "Your session is coming up",
+            "body": f"Your {booking.get('session_type', 'coaching')} session starts at {starts_at.strftime('%H:%M')} UTC.",
+            "due": due,
+            "data": {"booking_id": booking["_id"], "starts_at": starts_at}
+        })
+
+    async def load(self):
+        """Schedule reminders for upcoming bookings and streaks that could lapse"""
+        now = datetime.utcnow()
+        async for booking in bookings_collection.find({"date": {"$gt": now}}):
+            self.remind_booking(booking)
+
+        yesterday = (now.date() - timedelta(days=1)).isoformat()
+        async for progress in user_progress_collection.find({"activity_last_day": {"$gte": yesterday}}):
+            calendar = ActivityCalendar.from_progress(progress)
+            self.remind_streak(progress["user_id"], calendar.current_streak(now.date()), calendar.last_day)
+
+        print(f"🔔 Notification scheduler loaded {self.pending_count} reminders")
+
+    def _pop_due(self, now: float) -> List[Dict[str, Any]]:
+        """Pop up to batch_size notifications whose time has come"""
+        due_notifications = []
+        while self._heap and len(due_notifications) < self.batch_size:
+            due, _, key = self._heap[0]
+            pending = self._pending.get(key)
+            if pending is None or pending[0] != due:
+                # Cancelled, or rescheduled to another time
+                heapq.heappop(self._heap)
+                continue
+            if due > now:
+                break
+            heapq.heappop(self._heap)
+            del self._pending[key]
+            due_notifications.append({**pending[1], "key": key})
+        return due_notifications
+
+    @staticmethod
+    def _claim_id(notification: Dict[str, Any]) -> str:
+        # The original due time, so a retried notification keeps its claim ID
+        return f"{notification['key']}@{_epoch(notification['due'])}"
+
+    def _claim(self, notifications: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The notifications this worker is first to deliver (on the SQLite thread)"""
+        connection = sqlite_thread_connection()
+        if not self._claims_ready:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS notification_claims (id TEXT PRIMARY KEY, claimed_at REAL NOT NULL)"
+            )
+            self._claims_ready = True
+
+        now = time.time()
+        ids = {self._claim_id(n): n for n in notifications}
+        placeholders = ", ".join("(?, ?)" for _ in ids)
+        params = [value for claim_id in ids for value in (claim_id, now)]
+        with sqlite_transaction(connection):
+            claimed = connection.execute(
+                f"INSERT OR IGNORE INTO notification_claims (id, claimed_at) VALUES {placeholders} RETURNING id", params
+            ).fetchall()
+            connection.execute("DELETE FROM notification_claims WHERE claimed_at < ?", (now - 86400,))
+        return [ids[claim_id] for (claim_id,) in claimed]
+
+    def _release(self, notifications: List[Dict[str, Any]]):
+        """Drop this worker's claims on notifications it failed to deliver (on the SQLite thread)"""
+        with sqlite_transaction(sqlite_thread_connection()) as connection:
+            connection.executemany(
+                "DELETE FROM notification_claims WHERE id = ?", [(self._claim_id(n),) for n in notifications]
+            )
+
+    def _retry(self, notifications: List[Dict[str, Any]], now: float):
+        """Put undelivered notifications back on the heap with exponential backoff"""
+        for notification in notifications:
+            notification = dict(notification)
+            key = notification.pop("key")
+            attempts = notification["attempts"] = notification.get("attempts", 0) + 1
+            if attempts >= self.max_attempts:
+                print(f"❌ Dropping notification {key} after {attempts} failed deliveries")
+                continue
+            if key in self._pending:
+                # Rescheduled while it was being delivered; the new one wins
+                continue
+            retry_at = now + self.retry_seconds * 2 ** (attempts - 1)
+            self._pending[key] = (retry_at, notification)
+            heapq.heappush(self._heap, (retry_at, next(self._seq), key))
+
+    async def _deliver(self, notifications: List[Dict[str, Any]]):
+        # Claims are only needed when several workers share the schedule
+        shared = sqlite_connection() is not None
+        if shared:
+            notifications = await run_in_sqlite_thread(self._claim, notifications)
+        if not notifications:
+            return
+        try:
+            await self.sink.deliver(notifications)
+        except Exception:
+            # Let this worker (or another) deliver them later
+            if shared:
+                await run_in_sqlite_thread(self._release, notifications)
+            raise
+        for notification in notifications:
+            notifications_sent_total.labels(notification["kind"], self.sink.name).inc()
+
+    async def _run(self):
+        """Background loop delivering due notifications batch by batch"""
+        while True:
+            self._wakeup.clear()
+
+            batch = self._pop_due(time.time())
+            if batch:
+                try:
+                    await self._deliver(batch)
+                except Exception as e:
+                    print(f"Error delivering {len(batch)} notifications, will retry: {e}")
+                    self._retry(batch, time.time())
+                # Let request handlers run between batches
+                await asyncio.sleep(0)
+                continue
+
+            timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        """Cancel the background task"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+notification_scheduler = NotificationScheduler()
+queue_depth.labels("notifications").set_function(lambda: notification_scheduler.pending_count)
+invalidation_bus.subscribe("notifications", notification_scheduler._received)
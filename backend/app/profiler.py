@@ -0,0 +1,202 @@
+import fnmatch
+import hmac
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from .metrics import route_template
+from .stack_sampler import register_request_frame, thread_frame, request_stack
+
+# Shared secret for the X-Profile header and the /debug/profiler endpoints; profiling is off without it
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+PROFILER_SAMPLE_MS = float(os.getenv("PROFILER_SAMPLE_MS", "5"))
+
+# Scope key marking a request that should be sampled
+PROFILE_SCOPE_KEY = "teamwelly.profile"
+
+class RequestProfiler:
+    """Sampling profiler for selected requests on the event-loop thread
+
+    Requests are selected by path pattern (admin toggle) or per request with the
+    X-Profile header. While at least one selected request is in flight, a sampler
+    thread reads the loop thread's stack every `sample_ms`; a sample counts only
+    if a selected request is the one running, so concurrent requests don't
+    pollute each other's profile. Stacks are aggregated per route template as
+    collapsed-stack counts ready for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, sample_ms: float = 5.0, max_stacks_per_route: int = 5000):
+        self.sample_interval = sample_ms / 1000
+        self.max_stacks_per_route = max_stacks_per_route
+        self.patterns: List[str] = []
+        self.enabled_until: Optional[float] = None
+        self.samples_dropped = 0
+        self._stacks: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+        self._active = 0
+        self._wakeup = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def enable(self, patterns: List[str], duration_seconds: Optional[float] = None):
+        """Profile requests whose path matches any fnmatch pattern (e.g. /api/analytics/*)"""
+        self.patterns = list(patterns)
+        self.enabled_until = time.monotonic() + duration_seconds if duration_seconds else None
+
+    def disable(self):
+        self.patterns = []
+        self.enabled_until = None
+
+    def selects(self, path: str) -> bool:
+        """Whether the admin toggle selects this request path"""
+        if not self.patterns:
+            return False
+        if self.enabled_until is not None and time.monotonic() > self.enabled_until:
+            self.disable()
+            return False
+        return any(fnmatch.fnmatchcase(path, pattern) for pattern in self.patterns)
+
+    def begin(self):
+        """A selected request started; make sure the sampler thread is running"""
+        self._active += 1
+        if self._thread is None or not self._thread.is_alive():
+            self._loop_thread_id = threading.get_ident()
+            self._thread = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def end(self):
+        self._active -= 1
+        if self._active == 0:
+            self._wakeup.clear()
+
+    def _sample_loop(self):
+        while True:
+            # Sleep without polling while nothing is being profiled
+            self._wakeup.wait()
+            time.sleep(self.sample_interval)
+            scope, labels = request_stack(thread_frame(self._loop_thread_id))
+            if scope is None or PROFILE_SCOPE_KEY not in scope:
+                continue
+            self._add(route_template(scope), ";".join(label.replace(";", ":") for label in labels))
+            scope[PROFILE_SCOPE_KEY]["samples"] += 1
+
+    def _add(self, route: str, stack: str):
+        with self._lock:
+            stacks = self._stacks.setdefault(route, Counter())
+            if stack not in stacks and len(stacks) >= self.max_stacks_per_route:
+                self.samples_dropped += 1
+                return
+            stacks[stack] += 1
+
+    def routes(self) -> Dict[str, int]:
+        """Sample counts per profiled route"""
+        with self._lock:
+            return {route: sum(stacks.values()) for route, stacks in self._stacks.items()}
+
+    def collapsed(self, route: Optional[str] = None) -> str:
+        """Collapsed stacks ("frame;frame;frame count" per line), for one route or all of them"""
+        with self._lock:
+            items = [(r, dict(stacks)) for r, stacks in self._stacks.items() if route is None or r == route]
+        lines = []
+        for r, stacks in items:
+            for stack, count in sorted(stacks.items(), key=lambda item: item[1], reverse=True):
+                lines.append(f"{r};{stack} {count}" if stack else f"{r} {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+        self.samples_dropped = 0
+
+request_profiler = RequestProfiler(sample_ms=PROFILER_SAMPLE_MS)
+
+class ProfilerMiddleware:
+    """ASGI middleware marking requests for sampling; costs one header scan otherwise"""
+
+    def __init__(self, app, profiler: RequestProfiler = request_profiler, token: str = PROFILER_TOKEN):
+        self.app = app
+        self.profiler = profiler
+        self.token = token.encode()
+
+    @register_request_frame
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = scope[PROFILE_SCOPE_KEY] = {"samples": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-samples", str(profile["samples"]).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        self.profiler.begin()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.profiler.end()
+
+    def _selected(self, scope) -> bool:
+        if self.profiler.selects(scope["path"]):
+            return True
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return hmac.compare_digest(value, self.token)
+        return False
+
+def install_profiler(app):
+    """Add the profiling middleware and /debug/profiler endpoints when PROFILER_TOKEN is set"""
+    if not PROFILER_TOKEN:
+        return
+
+    from fastapi import Header, HTTPException
+    from fastapi.responses import PlainTextResponse
+    from pydantic import BaseModel
+
+    class ProfilerToggle(BaseModel):
+        patterns: List[str]
+        duration_seconds: Optional[float] = 300
+
+    def check_token(token: Optional[str]):
+        if not token or not hmac.compare_digest(token.encode(), PROFILER_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="Invalid profiler token")
+
+    app.add_middleware(ProfilerMiddleware)
+
+    @app.get("/debug/profiler", include_in_schema=False)
+    async def profiler_status(x_profiler_token: Optional[str] = Header(None)):
+        check_token(x_profiler_token)
+        return {
+            "patterns": request_profiler.patterns,
+            "expires_in_seconds": (
+                round(request_profiler.enabled_until - time.monotonic(), 1)
+                if request_profiler.enabled_until else None
+            ),
+            "sample_ms": request_profiler.sample_interval * 1000,
+            "routes": request_profiler.routes(),
+            "samples_dropped": request_profiler.samples_dropped
+        }
+
+    @app.post("/debug/profiler", include_in_schema=False)
+    async def enable_profiler(toggle: ProfilerToggle, x_profiler_token: Optional[str] = Header(None)):
+        check_token(x_profiler_token)
+        request_profiler.enable(toggle.patterns, toggle.duration_seconds)
+        return {"patterns": request_profiler.patterns, "duration_seconds": toggle.duration_seconds}
+
+    @app.delete("/debug/profiler", include_in_schema=False)
+    async def disable_profiler(reset: bool = True, x_profiler_token: Optional[str] = Header(None)):
+        check_token(x_profiler_token)
+        request_profiler.disable()
+        if reset:
+            request_profiler.reset()
+        return {"patterns": []}
+
+    @app.get("/debug/profiler/flamegraph", include_in_schema=False)
+    async def profiler_flamegraph(route: Optional[str] = None, x_profiler_token: Optional[str] = Header(None)):
+        check_token(x_profiler_token)
+        return PlainTextResponse(request_profiler.collapsed(route))
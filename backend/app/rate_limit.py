@@ -0,0 +1,210 @@
+import hashlib
+import math
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+from .auth import SECRET_KEY, ALGORITHM
+from .health import loop_lag_probe
+from .insights_worker import insights_worker
+from .metrics import registry
+from .webhook_queue import webhook_queue
+
+class RateLimit:
+    """`requests` per `seconds`, allowing bursts of up to `requests` at once"""
+
+    def __init__(self, requests: int, seconds: float):
+        self.burst = requests
+        self.rate = requests / seconds
+
+    @classmethod
+    def parse(cls, spec: str) -> "RateLimit":
+        """Parse "<requests>/<seconds>", e.g. "10/60" for ten requests a minute"""
+        requests, _, seconds = spec.partition("/")
+        return cls(int(requests), float(seconds or 60))
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Limits are per worker process, per client and per route class
+RATE_LIMITS: Dict[str, RateLimit] = {
+    "auth": RateLimit.parse(os.getenv("RATE_LIMIT_AUTH", "10/60")),
+    "ai": RateLimit.parse(os.getenv("RATE_LIMIT_AI", "30/60")),
+    "default": RateLimit.parse(os.getenv("RATE_LIMIT_DEFAULT", "300/60")),
+}
+# Clients tracked at once; the least recently seen are forgotten first
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Proxies in front of the app (Railway adds one); the client is the address they appended
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "1"))
+
+LOAD_SHEDDING_ENABLED = os.getenv("LOAD_SHEDDING_ENABLED", "true").lower() == "true"
+# Load 1.0 means the event-loop lag or the background queue depth reached its limit
+SHED_MAX_LOOP_LAG_MS = float(os.getenv("SHED_MAX_LOOP_LAG_MS", "200"))
+SHED_MAX_QUEUE_DEPTH = int(os.getenv("SHED_MAX_QUEUE_DEPTH", "500"))
+SHED_RETRY_AFTER_SECONDS = int(os.getenv("SHED_RETRY_AFTER_SECONDS", "5"))
+# Load above 1.0 at which each route class starts being shed; each then ramps
+# to 100% over another 0.5, so AI calls go first and sign-ins last
+SHED_STARTS_AT = {"ai": 1.0, "default": 1.5, "auth": 2.0}
+
+# Sign-in endpoints, whatever prefix the app mounts the auth routers under
+_CREDENTIAL_ENDPOINTS = ("login", "signup", "demo-login", "callback", "verify", "mobile")
+
+requests_rejected_total = registry.counter(
+    "http_requests_rejected_total", "Requests refused before routing, by route class and reason (rate_limit or shed)",
+    ("route_class", "reason")
+)
+
+def route_class(path: str) -> Optional[str]:
+    """Rate-limit class for a request path; None for health, metrics and other non-API paths"""
+    if not path.startswith("/api/"):
+        return None
+    if path.startswith("/api/ai/"):
+        return "ai"
+    if path.startswith("/api/auth") and path.rstrip("/").rsplit("/", 1)[-1] in _CREDENTIAL_ENDPOINTS:
+        return "auth"
+    return "default"
+
+class TokenBucketStore:
+    """Token buckets keyed by (route class, client), bounded to max_keys
+
+    Buckets refill continuously from their last update, so a check is O(1) and
+    needs no timers; this gives the smoothing of a sliding window without
+    storing request timestamps. When the store is full the least recently used
+    bucket is dropped. An idle bucket would have refilled by then, so this only
+    forgives clients that went quiet.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Tuple[str, str], Tuple[float, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: Tuple[str, str], limit: RateLimit, now: Optional[float] = None) -> float:
+        """Spend a token; returns 0 if the request may proceed, else seconds until it could"""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(limit.burst)
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            tokens = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+            self._buckets.move_to_end(key)
+
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (1 - tokens) / limit.rate
+
+    def clear(self):
+        self._buckets.clear()
+
+rate_limit_store = TokenBucketStore()
+registry.gauge("rate_limit_tracked_clients", "Client buckets held by the rate limiter").set_function(
+    lambda: len(rate_limit_store)
+)
+
+def current_load() -> float:
+    """Worst of event-loop lag and background queue depth, relative to their shedding limits"""
+    lag = loop_lag_probe.last_lag_ms / SHED_MAX_LOOP_LAG_MS if loop_lag_probe.running else 0.0
+    depth = (webhook_queue.depth + insights_worker.pending_count) / SHED_MAX_QUEUE_DEPTH
+    return max(lag, depth)
+
+registry.gauge("load_shedding_load", "Current load relative to the shedding limits (shedding starts above 1)").set_function(
+    current_load
+)
+
+def shed_probability(cls: str, load: float) -> float:
+    """Share of a route class's requests to refuse at the given load"""
+    return min(1.0, max(0.0, (load - SHED_STARTS_AT[cls]) * 2))
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def client_address(scope) -> str:
+    forwarded = _header(scope, b"x-forwarded-for")
+    if forwarded and RATE_LIMIT_PROXY_HOPS > 0:
+        # Earlier entries are whatever the client sent; trust only those our proxies appended
+        hops = [hop.strip() for hop in forwarded.split(",")]
+        return hops[max(0, len(hops) - RATE_LIMIT_PROXY_HOPS)]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def client_identity(scope, cls: str) -> str:
+    """Who a request counts against: the signed-in user, or the client address
+
+    Sign-in endpoints always count per address. JWTs are verified so a client
+    cannot pick its own bucket; opaque session tokens are keyed by digest.
+    """
+    authorization = _header(scope, b"authorization")
+    if cls != "auth" and authorization and authorization.startswith("Bearer "):
+        token = authorization[7:]
+        try:
+            user_id = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+            if user_id:
+                return f"user:{user_id}"
+        except JWTError:
+            return f"token:{hashlib.sha1(token.encode()).hexdigest()[:16]}"
+    return f"ip:{client_address(scope)}"
+
+class RateLimitMiddleware:
+    """ASGI middleware refusing requests over their token bucket (429) or while overloaded (503)
+
+    Both responses carry Retry-After. Paths outside /api are never refused, so
+    health checks and metrics keep working under load.
+    """
+
+    def __init__(self, app, store: TokenBucketStore = rate_limit_store):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        cls = route_class(scope["path"])
+        if cls is None:
+            await self.app(scope, receive, send)
+            return
+
+        if LOAD_SHEDDING_ENABLED:
+            probability = shed_probability(cls, current_load())
+            if probability > 0 and random.random() < probability:
+                requests_rejected_total.labels(cls, "shed").inc()
+                response = JSONResponse(
+                    status_code=503,
+                    content={"detail": "Server is overloaded, please retry shortly"},
+                    headers={"Retry-After": str(SHED_RETRY_AFTER_SECONDS)}
+                )
+                await response(scope, receive, send)
+                return
+
+        if RATE_LIMIT_ENABLED:
+            wait = self.store.take((cls, client_identity(scope, cls)), RATE_LIMITS[cls])
+            if wait > 0:
+                requests_rejected_total.labels(cls, "rate_limit").inc()
+                response = JSONResponse(
+                    status_code=429,
+                    content={"detail": "Too many requests"},
+                    headers={"Retry-After": str(math.ceil(wait))}
+                )
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
+
+def install_rate_limiting(app):
+    """Rate-limit and load-shed /api requests (RATE_LIMIT_ENABLED, LOAD_SHEDDING_ENABLED)
+
+    Install it before CORSMiddleware, so refusals still carry CORS headers and
+    browsers can read the 429/503 instead of reporting a CORS error.
+    """
+    app.add_middleware(RateLimitMiddleware)
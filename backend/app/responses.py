@@ -0,0 +1,77 @@
+import functools
+import json
+from typing import Dict, Any, Optional, Hashable, Tuple
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from .compression import Precompressed
+from .metrics import cache_requests_total
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON bytes, matching FastAPI's encoding of datetimes, UUIDs and models
+
+    orjson handles dicts, lists, datetimes, UUIDs and enums natively; anything
+    else (pydantic models, sets, Decimals) goes through jsonable_encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson
+
+    Used as the app-wide default response class. Handlers that return large lists
+    of documents should return it directly, which also skips FastAPI's
+    jsonable_encoder pass over the payload.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def static_json(endpoint):
+    """Serve an endpoint's constant payload from bytes serialized (and compressed) on the first call"""
+    body: Optional[Precompressed] = None
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        nonlocal body
+        if body is None:
+            body = Precompressed(dumps(await endpoint(*args, **kwargs)))
+        return body.response()
+
+    return wrapper
+
+class VersionedCache:
+    """Values (usually serialized response bodies) keyed by request parameters
+
+    Each entry remembers the version it was built from, e.g. a collection's
+    write counter, and is treated as a miss once that version has moved on.
+    """
+
+    def __init__(self, name: str, max_entries: int = 256):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[int, Any]] = {}
+
+    def get(self, key: Hashable, version: int) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            cache_requests_total.labels(self.name, "hit").inc()
+            return entry[1]
+        cache_requests_total.labels(self.name, "miss").inc()
+        return None
+
+    def set(self, key: Hashable, version: int, value: Any):
+        if len(self._entries) >= self.max_entries and key not in self._entries:
+            # Drop the oldest entry; dicts keep insertion order
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (version, value)
+
+    def clear(self):
+        self._entries.clear()
@@ -1,11 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any
 from datetime import datetime
+import json
 import uuid
 from ..models import User, ChatMessage, ChatResponse
 from ..auth import get_current_user
 from ..ai_service import ai_service
+from ..insights_worker import insights_worker
 from ..behavior_tracker import BehaviorTracker
+from ..responses import FastJSONResponse
 
 router = APIRouter(prefix="/api/ai", tags=["ai_chat"])
 
@@ -50,23 +54,56 @@ async def chat_with_ai(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI chat failed: {str(e)}")
 
+@router.post("/chat/stream")
+async def stream_chat_with_ai(
+    message: ChatMessage,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream Welly AI response as server-sent events"""
+    if not message.session_id:
+        message.session_id = str(uuid.uuid4())
+    
+    async def event_stream():
+        try:
+            async for chunk in ai_service.stream_chat_response(
+                user_id=current_user.id,
+                message=message.message,
+                session_id=message.session_id
+            ):
+                yield f"data: {json.dumps({'token': chunk})}\n\n"
+            
+            await BehaviorTracker.track_action(
+                user_id=current_user.id,
+                action="chat_interaction",
+                page="ai_chat",
+                details={
+                    "message_length": len(message.message),
+                    "session_id": message.session_id,
+                    "response_generated": True,
+                    "streamed": True
+                },
+                session_id=message.session_id
+            )
+            
+            yield f"data: {json.dumps({'done': True, 'session_id': message.session_id})}\n\n"
+        except Exception as e:
+            print(f"Error streaming AI response: {e}")
+            yield f"data: {json.dumps({'error': 'AI chat failed'})}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @router.get("/insights")
 async def get_user_insights(current_user: User = Depends(get_current_user)):
     """Get AI-generated user insights"""
     try:
-        # Get user context for insights
-        user_context = await ai_service._get_user_context(current_user.id)
-        
-        # Generate insights
-        insights = await ai_service._generate_user_insights(current_user.id, user_context)
-        
-        # Generate recommendations
-        recommendations = await ai_service._generate_recommendations(current_user.id, user_context)
+        # Latest background snapshot (computed inline only the first time)
+        snapshot = await insights_worker.get_or_compute(current_user.id)
         
         return {
-            "user_insights": insights,
-            "recommendations": recommendations,
-            "generated_at": datetime.utcnow()
+            "user_insights": snapshot["user_insights"],
+            "recommendations": snapshot["recommendations"],
+            "generated_at": snapshot["generated_at"],
+            "version": snapshot["version"]
         }
         
     except Exception as e:
@@ -91,7 +128,7 @@ async def get_chat_history(
         chat_query = chat_history_collection.find(query).sort("timestamp", -1).limit(limit)
         chat_history = await chat_query.to_list(length=limit)
         
-        return {"chat_history": chat_history}
+        return FastJSONResponse({"chat_history": chat_history})
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get chat history: {str(e)}")
@@ -126,7 +163,7 @@ async def get_wellness_tips(current_user: User = Depends(get_current_user)):
         # Generate personalized tips using AI
         tips_prompt = f"""Based on the user's wellness goals and current progress, provide 5 personalized wellness tips. 
         Goals: {', '.join(user_context.get('goals', []))}
-        Current streak: {user_context.get('progress', {}).get('current_streak', 0)} days
+        Current streak: {user_context.get('current_streak', 0)} days
         
         Make the tips specific, actionable, and encouraging."""
         
@@ -159,7 +196,7 @@ async def get_motivation(current_user: User = Depends(get_current_user)):
         
         # Generate motivational message
         motivation_prompt = f"""Create a motivational message for a user with:
-        - Current streak: {progress.get('current_streak', 0)} days
+        - Current streak: {user_context.get('current_streak', 0)} days
         - WellyPoints: {progress.get('welly_points', 0)}
         - Goals: {', '.join(goals)}
         
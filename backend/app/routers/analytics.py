@@ -1,10 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
-from ..models import User
+from ..models import User, UserRole
 from ..auth import get_current_user
 from ..behavior_tracker import BehaviorTracker
+from ..activity_calendar import ActivityCalendar
+from ..company_rollups import company_rollups, engagement_score
 from ..database import user_behavior_collection, user_progress_collection
+from ..responses import FastJSONResponse
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
@@ -48,7 +51,7 @@ async def get_behavior_analytics(
             "engagement_trend": _analyze_engagement_trend(behaviors, days)
         }
         
-        return analytics
+        return FastJSONResponse(analytics)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get behavior analytics: {str(e)}")
@@ -63,22 +66,27 @@ async def get_progress_analytics(current_user: User = Depends(get_current_user))
         if not progress:
             return {"message": "No progress data found"}
         
+        # Streaks and completion rates as of today, not as of the last activity
+        calendar = ActivityCalendar.from_progress(progress)
+        
         # Calculate analytics
         analytics = {
             "current_metrics": {
                 "welly_points": progress.get("welly_points", 0),
-                "current_streak": progress.get("current_streak", 0),
+                "current_streak": calendar.current_streak(),
+                "longest_streak": calendar.longest_streak,
+                "active_days": calendar.active_days(),
                 "completed_programs": len(progress.get("completed_programs", [])),
                 "completed_challenges": len(progress.get("completed_challenges", [])),
                 "bookmarked_programs": len(progress.get("bookmarked_programs", []))
             },
             "completion_rates": {
-                "daily": progress.get("daily_completion", 0),
-                "weekly": progress.get("weekly_completion", 0),
-                "monthly": progress.get("monthly_completion", 0)
+                "daily": calendar.completion(1),
+                "weekly": calendar.completion(7),
+                "monthly": calendar.completion(30)
             },
             "last_activity": progress.get("last_activity"),
-            "progress_trend": _calculate_progress_trend(progress)
+            "progress_trend": _calculate_progress_trend(progress, calendar.current_streak())
         }
         
         return analytics
@@ -86,6 +94,28 @@ async def get_progress_analytics(current_user: User = Depends(get_current_user))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get progress analytics: {str(e)}")
 
+@router.get("/company")
+async def get_company_analytics(
+    company_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Team analytics for your company; admins may ask for any company_id"""
+    if current_user.role == UserRole.ADMIN:
+        company_id = company_id or current_user.company_id
+    elif current_user.role in (UserRole.CORPORATE, UserRole.CORPORATE_ADMIN) and current_user.company_id and company_id in (None, current_user.company_id):
+        company_id = current_user.company_id
+    else:
+        raise HTTPException(status_code=403, detail="Team analytics are only available to corporate accounts for their own company")
+    
+    if not company_id:
+        raise HTTPException(status_code=400, detail="company_id is required")
+    
+    try:
+        return FastJSONResponse(company_rollups.summary(company_id))
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get company analytics: {str(e)}")
+
 @router.get("/wellness-score")
 async def get_wellness_score(current_user: User = Depends(get_current_user)):
     """Calculate and return user's wellness score"""
@@ -104,7 +134,7 @@ async def get_wellness_score(current_user: User = Depends(get_current_user)):
         
         # Calculate wellness score components
         score_components = {
-            "consistency": _calculate_consistency_score(progress),
+            "consistency": _calculate_consistency_score(ActivityCalendar.from_progress(progress).current_streak()),
             "engagement": _calculate_engagement_score(recent_behaviors),
             "progress": _calculate_progress_score(progress),
             "variety": _calculate_variety_score(recent_behaviors)
@@ -187,10 +217,9 @@ def _analyze_engagement_trend(behaviors: List[Dict[str, Any]], days: int) -> Dic
         "second_period_avg": round(second_half_avg, 1)
     }
 
-def _calculate_progress_trend(progress: Dict[str, Any]) -> str:
+def _calculate_progress_trend(progress: Dict[str, Any], current_streak: int) -> str:
     """Calculate progress trend"""
     welly_points = progress.get("welly_points", 0)
-    current_streak = progress.get("current_streak", 0)
     completed_programs = len(progress.get("completed_programs", []))
     
     if welly_points > 1000 and current_streak > 7:
@@ -202,13 +231,8 @@ def _calculate_progress_trend(progress: Dict[str, Any]) -> str:
     else:
         return "starting"
 
-def _calculate_consistency_score(progress: Dict[str, Any]) -> float:
-    """Calculate consistency score (0-100)"""
-    if not progress:
-        return 0.0
-    
-    current_streak = progress.get("current_streak", 0)
-    
+def _calculate_consistency_score(current_streak: int) -> float:
+    """Calculate consistency score (0-100) from the user's current streak"""
     # Score based on streak length
     if current_streak >= 30:
         return 100.0
@@ -228,23 +252,8 @@ def _calculate_engagement_score(behaviors: List[Dict[str, Any]]) -> float:
     if not behaviors:
         return 0.0
     
-    # Score based on activity volume in last 7 days
-    action_count = len(behaviors)
-    unique_days = len(set(b.get("timestamp", datetime.utcnow()).date() for b in behaviors))
-    
-    # Base score on actions per day
-    daily_average = action_count / 7
-    
-    if daily_average >= 10:
-        return 100.0
-    elif daily_average >= 5:
-        return 80.0
-    elif daily_average >= 3:
-        return 60.0
-    elif daily_average >= 1:
-        return 40.0
-    else:
-        return 20.0
+    # Score based on activity volume in last 7 days (same scale as the company rollups)
+    return engagement_score(len(behaviors))
 
 def _calculate_progress_score(progress: Dict[str, Any]) -> float:
     """Calculate progress score (0-100)"""
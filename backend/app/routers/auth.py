@@ -10,6 +10,7 @@ from typing import Dict, Any
 from ..models import User, UserLogin, UserSignup, GoogleAuthRequest, UserRole, UserPlan
 from ..database import users_collection, user_progress_collection
 from ..auth import create_access_token, get_current_user
+from ..company_directory import company_for_invite_code
 from ..behavior_tracker import BehaviorTracker
 from dotenv import load_dotenv
 
@@ -40,12 +41,20 @@ async def signup(user_data: UserSignup):
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         
+        # A company code is the invite code of a registered company, never a company ID
+        company = None
+        if user_data.company_code:
+            company = await company_for_invite_code(user_data.company_code)
+            if not company:
+                raise HTTPException(status_code=400, detail="Invalid company code")
+        
         # Create new user
         new_user = User(
             email=user_data.email,
             name=user_data.name,
             plan=user_data.plan,
-            role=UserRole.CORPORATE if user_data.company_code else UserRole.INDIVIDUAL,
+            role=UserRole.CORPORATE if company else UserRole.INDIVIDUAL,
+            company_id=company["_id"] if company else None,
             created_at=datetime.utcnow()
         )
         
@@ -92,6 +101,8 @@ async def signup(user_data: UserSignup):
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
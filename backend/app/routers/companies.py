@@ -0,0 +1,62 @@
+import secrets
+import uuid
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel
+from typing import Optional
+from ..models import User, UserRole
+from ..auth import get_current_user
+from ..company_directory import company_directory
+from ..database import companies_collection, users_collection
+
+router = APIRouter(prefix="/api/companies", tags=["companies"])
+
+class CompanyCreate(BaseModel):
+    name: str
+    # Generated when not given
+    invite_code: Optional[str] = None
+
+class CompanyAdminRequest(BaseModel):
+    user_id: str
+
+def _require_admin(user: User):
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only administrators can manage companies")
+
+@router.post("")
+async def create_company(request: CompanyCreate, current_user: User = Depends(get_current_user)):
+    """Register a company; its employees join by signing up with the invite code"""
+    _require_admin(current_user)
+    invite_code = request.invite_code or secrets.token_urlsafe(8)
+    if await companies_collection.find_one({"invite_code": invite_code}):
+        raise HTTPException(status_code=400, detail="Invite code already in use")
+
+    company = {
+        "_id": str(uuid.uuid4()),
+        "name": request.name,
+        "invite_code": invite_code,
+        "created_at": datetime.utcnow()
+    }
+    await companies_collection.insert_one(company)
+    return company
+
+@router.get("")
+async def list_companies(current_user: User = Depends(get_current_user)):
+    """Every registered company with its invite code"""
+    _require_admin(current_user)
+    return {"companies": await companies_collection.find({}).sort("name", 1).to_list(length=None)}
+
+@router.post("/{company_id}/admins")
+async def add_company_admin(company_id: str, request: CompanyAdminRequest, current_user: User = Depends(get_current_user)):
+    """Make a user an administrator of a company (and a member, if they were not)"""
+    _require_admin(current_user)
+    if not await companies_collection.find_one({"_id": company_id}):
+        raise HTTPException(status_code=404, detail="Company not found")
+    if not await users_collection.find_one({"_id": request.user_id}):
+        raise HTTPException(status_code=404, detail="User not found")
+    await users_collection.update_one(
+        {"_id": request.user_id},
+        {"$set": {"role": UserRole.CORPORATE_ADMIN.value, "company_id": company_id, "updated_at": datetime.utcnow()}}
+    )
+    company_directory.forget(request.user_id)
+    return {"user_id": request.user_id, "company_id": company_id, "role": UserRole.CORPORATE_ADMIN.value}
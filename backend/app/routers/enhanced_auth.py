@@ -7,6 +7,7 @@ import uuid
 from datetime import datetime, timedelta
 import requests
 from ..database import get_database, users_collection, user_sessions_collection
+from ..company_directory import company_for_invite_code
 
 router = APIRouter()
 
@@ -15,6 +16,8 @@ class SignUpRequest(BaseModel):
     email: str
     name: str
     plan: str = "basic"
+    # Invite code of the employee's company, if they sign up through one
+    company_code: Optional[str] = None
 
 class LoginRequest(BaseModel):
     email: str
@@ -57,6 +60,12 @@ async def signup(request: SignUpRequest):
         if existing_user:
             raise HTTPException(status_code=400, detail="User already exists")
         
+        company = None
+        if request.company_code:
+            company = await company_for_invite_code(request.company_code)
+            if not company:
+                raise HTTPException(status_code=400, detail="Invalid company code")
+        
         # Create new user
         user_id = str(uuid.uuid4())
         user_data = {
@@ -65,6 +74,8 @@ async def signup(request: SignUpRequest):
             "email": request.email,
             "name": request.name,
             "plan": request.plan,
+            "role": "corporate" if company else "individual",
+            "company_id": company["_id"] if company else None,
             "created_at": datetime.utcnow(),
             "last_login": datetime.utcnow(),
             "active": True,
@@ -86,6 +97,8 @@ async def signup(request: SignUpRequest):
             user=user_data
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Signup failed: {str(e)}")
 
@@ -248,10 +261,10 @@ async def logout(request: Request):
         
         session_token = auth_header.split(" ")[1]
         
-        # Deactivate session
+        # Deactivate session and let the TTL sweeper evict it
         await user_sessions_collection.update_one(
             {"session_token": session_token},
-            {"$set": {"active": False}}
+            {"$set": {"active": False, "expires_at": datetime.utcnow()}}
         )
         
         return {"message": "Logged out successfully"}
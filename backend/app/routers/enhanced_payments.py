@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import os
 import uuid
 from datetime import datetime
@@ -10,7 +10,13 @@ from emergentintegrations.payments.stripe.checkout import (
     CheckoutStatusResponse, 
     CheckoutSessionRequest
 )
+from ..auth import get_current_user
+from ..company_directory import company_directory
 from ..database import get_database, payment_transactions_collection, users_collection
+from ..models import User, UserRole
+from ..webhook_queue import idempotency_store, webhook_queue
+from ..checkout_status import checkout_status_cache, status_from_transaction
+from ..responses import FastJSONResponse, static_json
 import json
 
 router = APIRouter()
@@ -39,6 +45,13 @@ class PaymentResponse(BaseModel):
     session_id: str
     payment_id: str
 
+class BatchHistoryRequest(BaseModel):
+    user_ids: List[str]
+    limit: int = 50
+
+# Upper bound on users per batched history request
+MAX_BATCH_HISTORY_USERS = 1000
+
 # Fixed wellness packages (security best practice)
 WELLNESS_PACKAGES = {
     "basic": {
@@ -105,6 +118,7 @@ async def create_payment_transaction(
     return payment_id
 
 @router.get("/packages")
+@static_json
 async def get_wellness_packages():
     """Get available wellness packages"""
     return {
@@ -224,6 +238,48 @@ async def create_custom_checkout_session(request: CustomPaymentRequest, http_req
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Custom checkout session creation failed: {str(e)}")
 
+async def _fetch_checkout_status(session_id: str, webhook_url: str) -> Dict[str, Any]:
+    """Get checkout status from Stripe and update the payment transaction"""
+    # Initialize Stripe checkout
+    stripe_checkout = get_stripe_checkout(webhook_url)
+    
+    # Get status from Stripe
+    checkout_status: CheckoutStatusResponse = await stripe_checkout.get_checkout_status(session_id)
+    
+    # Find payment transaction
+    transaction = await payment_transactions_collection.find_one({"session_id": session_id})
+    
+    if transaction:
+        # Update transaction status if it has changed
+        if (transaction["payment_status"] != checkout_status.payment_status or 
+            transaction["status"] != checkout_status.status):
+            
+            await payment_transactions_collection.update_one(
+                {"session_id": session_id},
+                {
+                    "$set": {
+                        "payment_status": checkout_status.payment_status,
+                        "status": checkout_status.status,
+                        "amount_total": checkout_status.amount_total,
+                        "currency": checkout_status.currency,
+                        "updated_at": datetime.utcnow()
+                    }
+                }
+            )
+            
+            # If payment successful, perform post-payment actions
+            if checkout_status.payment_status == "paid" and transaction["payment_status"] != "paid":
+                await process_successful_payment(transaction)
+    
+    return {
+        "session_id": session_id,
+        "status": checkout_status.status,
+        "payment_status": checkout_status.payment_status,
+        "amount_total": checkout_status.amount_total,
+        "currency": checkout_status.currency,
+        "metadata": checkout_status.metadata
+    }
+
 @router.get("/checkout/status/{session_id}")
 async def get_checkout_status(session_id: str, http_request: Request):
     """Get checkout session status and update payment transaction"""
@@ -232,51 +288,47 @@ async def get_checkout_status(session_id: str, http_request: Request):
         host_url = str(http_request.base_url).rstrip('/')
         webhook_url = f"{host_url}/api/payments/webhook/stripe"
         
-        # Initialize Stripe checkout
-        stripe_checkout = get_stripe_checkout(webhook_url)
+        # Served from the status cache; Stripe is called at most once per TTL per session
+        return await checkout_status_cache.get_or_fetch(
+            session_id,
+            lambda: _fetch_checkout_status(session_id, webhook_url)
+        )
         
-        # Get status from Stripe
-        checkout_status: CheckoutStatusResponse = await stripe_checkout.get_checkout_status(session_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Status check failed: {str(e)}")
+
+@router.get("/checkout/status/{session_id}/wait")
+async def wait_for_checkout_status(
+    session_id: str,
+    http_request: Request,
+    status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    timeout: float = 25.0
+):
+    """Long-poll checkout status: respond once it differs from the status/payment_status the client has"""
+    try:
+        host_url = str(http_request.base_url).rstrip('/')
+        webhook_url = f"{host_url}/api/payments/webhook/stripe"
+        fetch = lambda: _fetch_checkout_status(session_id, webhook_url)
         
-        # Find payment transaction
-        transaction = await payment_transactions_collection.find_one({"session_id": session_id})
+        current = await checkout_status_cache.get_or_fetch(session_id, fetch)
+        if (current["status"], current["payment_status"]) != (status, payment_status):
+            return current
         
-        if transaction:
-            # Update transaction status if it has changed
-            if (transaction["payment_status"] != checkout_status.payment_status or 
-                transaction["status"] != checkout_status.status):
-                
-                await payment_transactions_collection.update_one(
-                    {"session_id": session_id},
-                    {
-                        "$set": {
-                            "payment_status": checkout_status.payment_status,
-                            "status": checkout_status.status,
-                            "amount_total": checkout_status.amount_total,
-                            "currency": checkout_status.currency,
-                            "updated_at": datetime.utcnow()
-                        }
-                    }
-                )
-                
-                # If payment successful, perform post-payment actions
-                if checkout_status.payment_status == "paid" and transaction["payment_status"] != "paid":
-                    await process_successful_payment(transaction)
-        
-        return {
-            "session_id": session_id,
-            "status": checkout_status.status,
-            "payment_status": checkout_status.payment_status,
-            "amount_total": checkout_status.amount_total,
-            "currency": checkout_status.currency,
-            "metadata": checkout_status.metadata
-        }
+        # Webhooks update the cache and wake us; on timeout fall back to one refresh
+        await checkout_status_cache.wait_for_change(session_id, status, payment_status, min(max(timeout, 0.0), 30.0))
+        return await checkout_status_cache.get_or_fetch(session_id, fetch)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Status check failed: {str(e)}")
 
-async def process_successful_payment(transaction: dict):
-    """Process successful payment (upgrade user plan, etc.)"""
+async def apply_plan_upgrade(transaction: dict):
+    """Upgrade the user's plan for a paid transaction, at most once per checkout session"""
+    key = f"upgrade:{transaction.get('session_id')}"
+    # Raises ClaimInProgress while another worker applies it, so a queued webhook retries
+    if transaction.get("plan_applied_at") or not idempotency_store.claim_or_skip(key):
+        return
+    
     try:
         user_id = transaction.get("user_id")
         package_id = transaction.get("package_id")
@@ -296,9 +348,55 @@ async def process_successful_payment(transaction: dict):
             
             print(f"✅ User {user_id} upgraded to {package_id} plan")
         
+        await payment_transactions_collection.update_one(
+            {"session_id": transaction.get("session_id")},
+            {"$set": {"plan_applied_at": datetime.utcnow()}}
+        )
+        idempotency_store.complete(key)
+    except Exception:
+        idempotency_store.fail(key)
+        raise
+
+async def process_successful_payment(transaction: dict):
+    """Process successful payment (upgrade user plan, etc.)"""
+    try:
+        await apply_plan_upgrade(transaction)
     except Exception as e:
         print(f"❌ Error processing successful payment: {str(e)}")
 
+async def _process_webhook_event(event: Dict[str, Any]):
+    """Apply a verified Stripe webhook event (runs on the webhook queue)"""
+    if event["event_type"] == "checkout.session.completed":
+        session_id = event["session_id"]
+        
+        # Update transaction status
+        await payment_transactions_collection.update_one(
+            {"session_id": session_id},
+            {
+                "$set": {
+                    "payment_status": event["payment_status"],
+                    "webhook_received_at": event["received_at"],
+                    "updated_at": datetime.utcnow()
+                }
+            }
+        )
+        
+        # Get transaction for post-processing; errors propagate so the queue retries
+        transaction = await payment_transactions_collection.find_one({"session_id": session_id})
+        if transaction and event["payment_status"] == "paid":
+            await apply_plan_upgrade(transaction)
+        
+        # Answer status polls from the webhook result instead of asking Stripe again
+        if transaction:
+            checkout_status_cache.set(
+                session_id,
+                status_from_transaction(transaction, "complete", event["payment_status"])
+            )
+        else:
+            checkout_status_cache.invalidate(session_id)
+    elif event.get("session_id"):
+        checkout_status_cache.invalidate(event["session_id"])
+
 @router.post("/webhook/stripe")
 async def stripe_webhook(request: Request):
     """Handle Stripe webhook events"""
@@ -313,31 +411,25 @@ async def stripe_webhook(request: Request):
         # Initialize Stripe checkout
         stripe_checkout = get_stripe_checkout(webhook_url)
         
-        # Handle webhook
+        # Handle webhook (verifies the signature)
         webhook_response = await stripe_checkout.handle_webhook(body, stripe_signature)
         
-        # Process webhook event
-        if webhook_response.event_type == "checkout.session.completed":
-            session_id = webhook_response.session_id
-            
-            # Update transaction status
-            await payment_transactions_collection.update_one(
-                {"session_id": session_id},
-                {
-                    "$set": {
-                        "payment_status": webhook_response.payment_status,
-                        "webhook_received_at": datetime.utcnow(),
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
-            
-            # Get transaction for post-processing
-            transaction = await payment_transactions_collection.find_one({"session_id": session_id})
-            if transaction and webhook_response.payment_status == "paid":
-                await process_successful_payment(transaction)
+        # Acknowledge immediately; the event is processed once on the webhook queue
+        event_id = getattr(webhook_response, "event_id", None) or (
+            f"{webhook_response.event_type}:{webhook_response.session_id}"
+        )
+        queued = webhook_queue.submit(
+            f"event:{event_id}",
+            _process_webhook_event,
+            {
+                "event_type": webhook_response.event_type,
+                "session_id": webhook_response.session_id,
+                "payment_status": webhook_response.payment_status,
+                "received_at": datetime.utcnow()
+            }
+        )
         
-        return {"status": "success", "event_type": webhook_response.event_type}
+        return {"status": "success", "event_type": webhook_response.event_type, "duplicate": not queued}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Webhook processing failed: {str(e)}")
@@ -351,11 +443,40 @@ async def get_payment_history(user_id: str):
             {"user_id": user_id}
         ).sort("created_at", -1).limit(50).to_list(length=50)
         
-        return {"transactions": transactions}
+        return FastJSONResponse({"transactions": transactions})
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Payment history retrieval failed: {str(e)}")
 
+@router.post("/history/batch")
+async def get_payment_history_batch(request: BatchHistoryRequest, current_user: User = Depends(get_current_user)):
+    """Get payment history for many users of the caller's company in one call (corporate admin views)"""
+    # Plain employees (CORPORATE) may not read their coworkers' payments
+    if current_user.role != UserRole.ADMIN and (current_user.role != UserRole.CORPORATE_ADMIN or not current_user.company_id):
+        raise HTTPException(status_code=403, detail="Payment history is only available to your company's administrators")
+    if len(request.user_ids) > MAX_BATCH_HISTORY_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_HISTORY_USERS} users per request")
+    
+    if current_user.role == UserRole.CORPORATE_ADMIN:
+        for user_id in dict.fromkeys(request.user_ids):
+            if await company_directory.company_of(user_id) != current_user.company_id:
+                raise HTTPException(status_code=403, detail="Payment history is only available for members of your company")
+    
+    try:
+        limit = max(1, min(request.limit, 50))
+        histories = {}
+        
+        # Each lookup is served by the (user_id, created_at) index
+        for user_id in dict.fromkeys(request.user_ids):
+            histories[user_id] = await payment_transactions_collection.find(
+                {"user_id": user_id}
+            ).sort("created_at", -1).limit(limit).to_list(length=limit)
+        
+        return FastJSONResponse({"histories": histories})
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch payment history retrieval failed: {str(e)}")
+
 @router.get("/transaction/{payment_id}")
 async def get_payment_transaction(payment_id: str):
     """Get specific payment transaction"""
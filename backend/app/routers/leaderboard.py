@@ -0,0 +1,70 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Dict, Any, List, Optional
+from ..models import User
+from ..auth import get_current_user
+from ..database import users_collection
+from ..leaderboard import leaderboards, Leaderboard, week_key
+
+router = APIRouter(prefix="/api/leaderboard", tags=["leaderboard"])
+
+SCOPES = ("global", "company", "weekly")
+
+def _board(scope: str, user: User, week: Optional[str] = None) -> Optional[Leaderboard]:
+    if scope == "global":
+        return leaderboards.global_board
+    if scope == "company":
+        return leaderboards.company(user.company_id) if user.company_id else None
+    return leaderboards.week(week)
+
+async def _with_names(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    users = await asyncio.gather(*(users_collection.find_one({"_id": entry["user_id"]}) for entry in entries))
+    for entry, user in zip(entries, users):
+        entry["name"] = user.get("name") if user else None
+    return entries
+
+@router.get("")
+async def get_leaderboard(
+    scope: str = "global",
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    week: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Top users by WellyPoints: global, within your company, or for a week (default this one)"""
+    if scope not in SCOPES:
+        raise HTTPException(status_code=400, detail=f"scope must be one of {', '.join(SCOPES)}")
+
+    board = _board(scope, current_user, week)
+    if board is None:
+        raise HTTPException(status_code=404, detail="You are not part of a company")
+
+    try:
+        response = {
+            "scope": scope,
+            "total": len(board),
+            "entries": await _with_names(board.top(limit, offset)),
+            "you": {"rank": board.rank(current_user.id), "points": board.score(current_user.id) or 0}
+        }
+        if scope == "company":
+            response["company_id"] = current_user.company_id
+        elif scope == "weekly":
+            response["week"] = week or week_key()
+        return response
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get leaderboard: {str(e)}")
+
+@router.get("/me")
+async def get_my_rankings(current_user: User = Depends(get_current_user)):
+    """Your rank and points on every leaderboard you appear on"""
+    rankings = {}
+    for scope in SCOPES:
+        board = _board(scope, current_user)
+        if board is not None:
+            rankings[scope] = {
+                "rank": board.rank(current_user.id),
+                "points": board.score(current_user.id) or 0,
+                "total": len(board)
+            }
+    return rankings
@@ -735,10 +735,10 @@ async def oauth_logout(request: Request):
         
         session_token = auth_header.split(' ')[1]
         
-        # Deactivate session
+        # Deactivate session and let the TTL sweeper evict it
         await user_sessions_collection.update_one(
             {"session_token": session_token},
-            {"$set": {"active": False}}
+            {"$set": {"active": False, "expires_at": datetime.utcnow()}}
         )
         
         return {"message": "Successfully logged out"}
@@ -6,6 +6,9 @@ from ..models import User, PaymentRequest, PaymentTransaction, WELLNESS_PACKAGES
 from ..database import payment_transactions_collection, users_collection
 from ..auth import get_current_user, get_optional_user
 from ..behavior_tracker import BehaviorTracker
+from ..webhook_queue import idempotency_store, webhook_queue
+from ..checkout_status import checkout_status_cache, status_from_transaction
+from ..responses import FastJSONResponse, static_json
 import os
 from dotenv import load_dotenv
 
@@ -105,39 +108,53 @@ async def get_checkout_status(
 ):
     """Get checkout session status"""
     try:
-        # Initialize Stripe checkout
-        stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url="")
-        
-        # Get checkout status
-        checkout_status: CheckoutStatusResponse = await stripe_checkout.get_checkout_status(session_id)
-        
-        # Update transaction record
-        update_data = {
-            "status": checkout_status.status,
-            "payment_status": checkout_status.payment_status,
-            "updated_at": datetime.utcnow()
-        }
-        
-        await payment_transactions_collection.update_one(
-            {"session_id": session_id},
-            {"$set": update_data}
-        )
-        
-        # If payment is successful, update user plan
-        if checkout_status.payment_status == "paid":
-            await _handle_successful_payment(session_id, checkout_status)
+        # Served from the status cache; Stripe is called at most once per TTL per session
+        status = await checkout_status_cache.get_or_fetch(session_id, lambda: _fetch_checkout_status(session_id))
         
         return {
-            "status": checkout_status.status,
-            "payment_status": checkout_status.payment_status,
-            "amount_total": checkout_status.amount_total,
-            "currency": checkout_status.currency,
-            "metadata": checkout_status.metadata
+            "status": status["status"],
+            "payment_status": status["payment_status"],
+            "amount_total": status["amount_total"],
+            "currency": status["currency"],
+            "metadata": status["metadata"]
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get checkout status: {str(e)}")
 
+async def _fetch_checkout_status(session_id: str) -> Dict[str, Any]:
+    """Get checkout status from Stripe and update the transaction record"""
+    # Initialize Stripe checkout
+    stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url="")
+    
+    # Get checkout status
+    checkout_status: CheckoutStatusResponse = await stripe_checkout.get_checkout_status(session_id)
+    
+    # Update transaction record
+    update_data = {
+        "status": checkout_status.status,
+        "payment_status": checkout_status.payment_status,
+        "updated_at": datetime.utcnow()
+    }
+    
+    await payment_transactions_collection.update_one(
+        {"session_id": session_id},
+        {"$set": update_data}
+    )
+    
+    # If payment is successful, update user plan
+    if checkout_status.payment_status == "paid":
+        await _handle_successful_payment(session_id, checkout_status)
+    
+    return {
+        "session_id": session_id,
+        "status": checkout_status.status,
+        "payment_status": checkout_status.payment_status,
+        "amount_total": checkout_status.amount_total,
+        "currency": checkout_status.currency,
+        "metadata": checkout_status.metadata
+    }
+
 @router.post("/webhook/stripe")
 async def stripe_webhook(request: Request):
     """Handle Stripe webhook events"""
@@ -155,38 +172,70 @@ async def stripe_webhook(request: Request):
             stripe_signature
         )
         
-        # Update transaction record
+        # Acknowledge immediately and process once on the webhook queue
         if webhook_response.session_id:
-            await payment_transactions_collection.update_one(
-                {"session_id": webhook_response.session_id},
-                {
-                    "$set": {
-                        "status": webhook_response.event_type,
-                        "payment_status": webhook_response.payment_status,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
+            event_id = getattr(webhook_response, "event_id", None) or (
+                f"{webhook_response.event_type}:{webhook_response.session_id}"
             )
-            
-            # Handle successful payment
-            if webhook_response.payment_status == "paid":
-                await _handle_successful_payment_webhook(webhook_response)
+            webhook_queue.submit(f"event:{event_id}", _process_webhook_event, {
+                "event_type": webhook_response.event_type,
+                "session_id": webhook_response.session_id,
+                "payment_status": webhook_response.payment_status,
+                "metadata": webhook_response.metadata or {}
+            })
         
         return {"message": "Webhook processed successfully"}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Webhook processing failed: {str(e)}")
 
-async def _handle_successful_payment(session_id: str, checkout_status: CheckoutStatusResponse):
-    """Handle successful payment - update user plan"""
+async def _process_webhook_event(event: Dict[str, Any]):
+    """Apply a verified webhook event (runs on the webhook queue)"""
+    await payment_transactions_collection.update_one(
+        {"session_id": event["session_id"]},
+        {
+            "$set": {
+                "status": event["event_type"],
+                "payment_status": event["payment_status"],
+                "updated_at": datetime.utcnow()
+            }
+        }
+    )
+    
+    # Handle successful payment; errors propagate so the queue retries
+    if event["payment_status"] == "paid":
+        await _apply_successful_payment(
+            event["session_id"],
+            package_id=event["metadata"].get("package_id"),
+            details={"event_type": event["event_type"]}
+        )
+        
+        transaction = await payment_transactions_collection.find_one({"session_id": event["session_id"]})
+        if transaction:
+            checkout_status_cache.set(
+                event["session_id"],
+                status_from_transaction(transaction, "complete", event["payment_status"])
+            )
+            return
+    
+    checkout_status_cache.invalidate(event["session_id"])
+
+async def _apply_successful_payment(session_id: str, package_id: str = None, details: Dict[str, Any] = None):
+    """Upgrade the user's plan and award the bonus, at most once per checkout session"""
+    key = f"upgrade:{session_id}"
+    # Raises ClaimInProgress while another worker applies it, so a queued webhook retries
+    if not idempotency_store.claim_or_skip(key):
+        return
+    
     try:
         # Get transaction details
         transaction = await payment_transactions_collection.find_one({"session_id": session_id})
-        if not transaction:
+        if not transaction or transaction.get("plan_applied_at"):
+            idempotency_store.complete(key)
             return
         
         # Get package info from metadata
-        package_id = transaction.get("metadata", {}).get("package_id")
+        package_id = package_id or transaction.get("metadata", {}).get("package_id")
         user_id = transaction.get("user_id")
         
         if user_id and package_id:
@@ -208,8 +257,8 @@ async def _handle_successful_payment(session_id: str, checkout_status: CheckoutS
                 page="payments",
                 details={
                     "package_id": package_id,
-                    "amount": checkout_status.amount_total / 100,  # Convert from cents
-                    "session_id": session_id
+                    "session_id": session_id,
+                    **(details or {})
                 }
             )
             
@@ -224,49 +273,27 @@ async def _handle_successful_payment(session_id: str, checkout_status: CheckoutS
                 }
             )
         
-    except Exception as e:
-        print(f"Error handling successful payment: {e}")
+        await payment_transactions_collection.update_one(
+            {"session_id": session_id},
+            {"$set": {"plan_applied_at": datetime.utcnow()}}
+        )
+        idempotency_store.complete(key)
+    except Exception:
+        idempotency_store.fail(key)
+        raise
 
-async def _handle_successful_payment_webhook(webhook_response):
-    """Handle successful payment from webhook"""
+async def _handle_successful_payment(session_id: str, checkout_status: CheckoutStatusResponse):
+    """Handle successful payment - update user plan"""
     try:
-        # Get transaction details
-        transaction = await payment_transactions_collection.find_one({"session_id": webhook_response.session_id})
-        if not transaction:
-            return
-        
-        # Get package info from metadata
-        package_id = webhook_response.metadata.get("package_id")
-        user_id = transaction.get("user_id")
-        
-        if user_id and package_id:
-            # Update user plan
-            await users_collection.update_one(
-                {"_id": user_id},
-                {
-                    "$set": {
-                        "plan": package_id,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
-            
-            # Track successful payment
-            await BehaviorTracker.track_action(
-                user_id=user_id,
-                action="payment_success",
-                page="payments",
-                details={
-                    "package_id": package_id,
-                    "session_id": webhook_response.session_id,
-                    "event_type": webhook_response.event_type
-                }
-            )
-        
+        await _apply_successful_payment(
+            session_id,
+            details={"amount": checkout_status.amount_total / 100}  # Convert from cents
+        )
     except Exception as e:
-        print(f"Error handling webhook payment: {e}")
+        print(f"Error handling successful payment: {e}")
 
 @router.get("/packages")
+@static_json
 async def get_wellness_packages():
     """Get available wellness packages"""
     return {
@@ -282,7 +309,7 @@ async def get_payment_history(current_user: User = Depends(get_current_user)):
         ).sort("created_at", -1).limit(50)
         transactions = await transactions_query.to_list(length=50)
         
-        return {"transactions": transactions}
+        return FastJSONResponse({"transactions": transactions})
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get payment history: {str(e)}")
\ No newline at end of file
@@ -1,13 +1,20 @@
 from fastapi import APIRouter, HTTPException, Depends
+from pydantic import TypeAdapter
 from typing import List, Dict, Any
 from datetime import datetime
 from ..models import User, Program
 from ..database import programs_collection, user_progress_collection
 from ..auth import get_current_user
 from ..behavior_tracker import BehaviorTracker
+from ..responses import VersionedCache
+from ..compression import Precompressed
 
 router = APIRouter(prefix="/api/programs", tags=["programs"])
 
+# Serialized and compressed catalog per (category, level), rebuilt whenever the programs collection changes
+_catalog_cache = VersionedCache("program_catalog")
+_program_list = TypeAdapter(List[Program])
+
 @router.get("/")
 async def get_programs(
     category: str = None,
@@ -23,8 +30,15 @@ async def get_programs(
         if level:
             query["level"] = level
         
-        # Get programs
-        programs = await programs_collection.find(query).sort("title", 1).to_list(length=100)
+        # Get programs, serialized once per catalog version
+        version = programs_collection.version
+        cached = _catalog_cache.get((category, level), version)
+        if cached is None:
+            programs = await programs_collection.find(query).sort("title", 1).to_list(length=100)
+            body = Precompressed(_program_list.dump_json(_program_list.validate_python(programs)))
+            cached = (body, len(programs))
+            _catalog_cache.set((category, level), version, cached)
+        body, programs_count = cached
         
         # Track program browsing
         await BehaviorTracker.track_action(
@@ -34,15 +48,48 @@ async def get_programs(
             details={
                 "category": category,
                 "level": level,
-                "programs_count": len(programs)
+                "programs_count": programs_count
             }
         )
         
-        return programs
+        return body.response()
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get programs: {str(e)}")
 
+# Declared before /{program_id} so the static path is not captured as a program ID
+@router.get("/recommendations")
+async def get_program_recommendations(current_user: User = Depends(get_current_user)):
+    """Get personalized program recommendations"""
+    try:
+        # Get user data
+        user_doc = await user_progress_collection.find_one({"user_id": current_user.id})
+        completed_programs = user_doc.get("completed_programs", []) if user_doc else []
+        
+        # Get user goals
+        user_info = await user_progress_collection.find_one({"user_id": current_user.id})
+        goals = user_info.get("selected_goals", []) if user_info else []
+        
+        # Get programs not yet completed
+        all_programs_query = programs_collection.find()
+        all_programs = await all_programs_query.to_list(length=1000)
+        
+        # Filter and recommend programs
+        recommendations = []
+        for program in all_programs:
+            if program.get("id") not in completed_programs:
+                # Simple recommendation logic based on goals
+                if any(goal.lower() in program.get("description", "").lower() for goal in goals):
+                    recommendations.append(program)
+        
+        # Limit to top 5 recommendations
+        recommendations = recommendations[:5]
+        
+        return {"recommendations": recommendations}
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get recommendations: {str(e)}")
+
 @router.get("/{program_id}")
 async def get_program(
     program_id: str,
@@ -238,35 +285,3 @@ async def get_category_stats(current_user: User = Depends(get_current_user)):
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get category stats: {str(e)}")
-
-@router.get("/recommendations")
-async def get_program_recommendations(current_user: User = Depends(get_current_user)):
-    """Get personalized program recommendations"""
-    try:
-        # Get user data
-        user_doc = await user_progress_collection.find_one({"user_id": current_user.id})
-        completed_programs = user_doc.get("completed_programs", []) if user_doc else []
-        
-        # Get user goals
-        user_info = await user_progress_collection.find_one({"user_id": current_user.id})
-        goals = user_info.get("selected_goals", []) if user_info else []
-        
-        # Get programs not yet completed
-        all_programs_query = programs_collection.find()
-        all_programs = await all_programs_query.to_list(length=1000)
-        
-        # Filter and recommend programs
-        recommendations = []
-        for program in all_programs:
-            if program.get("id") not in completed_programs:
-                # Simple recommendation logic based on goals
-                if any(goal.lower() in program.get("description", "").lower() for goal in goals):
-                    recommendations.append(program)
-        
-        # Limit to top 5 recommendations
-        recommendations = recommendations[:5]
-        
-        return {"recommendations": recommendations}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get recommendations: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,67 @@
+import os
+import sys
+from types import CodeType, FrameType
+from typing import Dict, Any, List, Optional, Set, Tuple
+from .metrics import MetricsMiddleware, route_template
+
+# Code objects of ASGI callables whose `scope` local identifies the request a frame belongs to
+_request_scope_codes: Set[CodeType] = set()
+
+def register_request_frame(function):
+    """Mark an ASGI `__call__(self, scope, receive, send)` so sampled stacks can be attributed to its request"""
+    _request_scope_codes.add(function.__code__)
+    return function
+
+def thread_frame(thread_id: int) -> Optional[FrameType]:
+    """Current innermost frame of another thread"""
+    return sys._current_frames().get(thread_id)
+
+def frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+def extract_stack(frame: Optional[FrameType], limit: int = 64) -> List[str]:
+    """Frame labels from the outermost caller to `frame`, keeping the innermost `limit`"""
+    labels = []
+    while frame is not None and len(labels) < limit:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+def collapse(labels: List[str]) -> str:
+    """Collapsed-stack line (root;...;leaf) as consumed by flamegraph tools"""
+    return ";".join(label.replace(";", ":") for label in labels)
+
+def request_scope(frame: Optional[FrameType]) -> Optional[Dict[str, Any]]:
+    """ASGI scope of the request a frame is running for, if any"""
+    while frame is not None:
+        if frame.f_code in _request_scope_codes:
+            scope = frame.f_locals.get("scope")
+            if isinstance(scope, dict):
+                return scope
+        frame = frame.f_back
+    return None
+
+def request_stack(frame: Optional[FrameType], limit: int = 128) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """(scope, labels) for the request a frame runs for, with labels rooted at the request's middleware frame"""
+    labels = []
+    while frame is not None:
+        if frame.f_code in _request_scope_codes:
+            scope = frame.f_locals.get("scope")
+            if isinstance(scope, dict):
+                labels.reverse()
+                return scope, labels[-limit:]
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return None, []
+
+def request_route(frame: Optional[FrameType]) -> str:
+    """Route template of the request a frame is running for, or "background" outside requests"""
+    scope = request_scope(frame)
+    if scope is None:
+        return "background"
+    return route_template(scope)
+
+# Every app installs the metrics middleware, so its frame marks the request being served
+register_request_frame(MetricsMiddleware.__call__)
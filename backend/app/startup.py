@@ -0,0 +1,47 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+class StartupTimer:
+    """Time spent in each startup phase, printed once the app is ready and reported by /health
+
+    The clock starts when this module is first imported, so app entry points
+    import it before anything else and `mark("imports")` once their imports
+    and app wiring are done.
+    """
+
+    def __init__(self):
+        self._last = self._started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.ready_ms: Optional[float] = None
+
+    def mark(self, name: str):
+        """Record the time since the previous mark or phase as `name`"""
+        now = time.perf_counter()
+        self.phases[name] = (now - self._last) * 1000
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block as `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._last = time.perf_counter()
+            self.phases[name] = (self._last - start) * 1000
+
+    def ready(self):
+        """Startup is complete; print the phase breakdown"""
+        self.mark("background tasks")
+        self.ready_ms = (self._last - self._started) * 1000
+        breakdown = ", ".join(f"{name} {ms:.0f}ms" for name, ms in self.phases.items())
+        print(f"⏱️  Ready in {self.ready_ms:.0f}ms ({breakdown})")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready_ms": round(self.ready_ms, 1) if self.ready_ms is not None else None,
+            "phases_ms": {name: round(ms, 1) for name, ms in self.phases.items()}
+        }
+
+startup_timer = StartupTimer()
@@ -0,0 +1,290 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable
+from datetime import datetime
+from .metrics import queue_depth
+from .database import sqlite_connection, sqlite_transaction
+
+# How long a claimed key stays "processing" before another delivery may take it
+# over, in case the worker holding it crashed or shut down mid-job
+IDEMPOTENCY_PROCESSING_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_PROCESSING_LEASE_SECONDS", "300"))
+
+class ClaimInProgress(Exception):
+    """A key is claimed by another delivery that has not finished; raised so the caller retries later"""
+
+class IdempotencyStore:
+    """Record of processed webhook events and payment side effects, keyed by ID
+
+    `claim` is synchronous, so check-and-set cannot interleave with another
+    coroutine on the event loop. Completed keys are remembered for `ttl_seconds`
+    (Stripe retries for up to three days); failed keys can be claimed again, and
+    so can keys left "processing" for longer than `lease_seconds`.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 100_000,
+        lease_seconds: float = IDEMPOTENCY_PROCESSING_LEASE_SECONDS
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lease_seconds = lease_seconds
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    def _held(self, state: str, age: float) -> bool:
+        """Whether an entry in `state`, last updated `age` seconds ago, blocks a new claim"""
+        if state == "done":
+            return age < self.ttl_seconds
+        if state == "processing":
+            return age < self.lease_seconds
+        return False
+
+    def claim(self, key: str) -> bool:
+        """Claim a key for processing; False if it is in progress or already done"""
+        entry = self._entries.get(key)
+        if entry and self._held(entry["state"], time.monotonic() - entry["updated"]):
+            return False
+
+        if len(self._entries) >= self.max_entries:
+            self._evict()
+
+        self._entries[key] = {"state": "processing", "updated": time.monotonic()}
+        return True
+
+    def claim_or_skip(self, key: str) -> bool:
+        """Claim a key; False if it is already done, ClaimInProgress if another delivery holds it"""
+        if self.claim(key):
+            return True
+        if self.state(key) == "done":
+            return False
+        raise ClaimInProgress(key)
+
+    def renew(self, key: str):
+        """Extend the processing lease of a key this worker is still working on"""
+        entry = self._entries.get(key)
+        if entry and entry["state"] == "processing":
+            entry["updated"] = time.monotonic()
+
+    def complete(self, key: str):
+        """Mark a claimed key as successfully processed"""
+        self._entries[key] = {"state": "done", "updated": time.monotonic()}
+
+    def fail(self, key: str):
+        """Mark a claimed key as failed so a later delivery can retry it"""
+        self._entries[key] = {"state": "failed", "updated": time.monotonic()}
+
+    def release(self, key: str):
+        """Forget a key entirely"""
+        self._entries.pop(key, None)
+
+    def state(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        return entry["state"] if entry else None
+
+    def _evict(self):
+        """Drop expired entries, then the oldest ones if still full"""
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if now - entry["updated"] >= self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+        if len(self._entries) >= self.max_entries:
+            # Dicts keep insertion order, so the first keys are the oldest claims
+            for key in list(self._entries)[: len(self._entries) - self.max_entries + 1]:
+                del self._entries[key]
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """IdempotencyStore kept in the shared SQLite database so every worker sees the same claims
+
+    Claims run in a write transaction, so two workers receiving the same Stripe
+    retry cannot both claim it. Times are wall-clock since they are compared
+    across processes.
+    """
+
+    def __init__(
+        self,
+        connection,
+        ttl_seconds: float = 7 * 24 * 3600,
+        prune_every: int = 1000,
+        lease_seconds: float = IDEMPOTENCY_PROCESSING_LEASE_SECONDS
+    ):
+        super().__init__(ttl_seconds=ttl_seconds, lease_seconds=lease_seconds)
+        self.connection = connection
+        self.prune_every = prune_every
+        self._claims = 0
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency_keys (key TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _put(self, key: str, state: str):
+        self.connection.execute(
+            "INSERT INTO idempotency_keys (key, state, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET state = excluded.state, updated = excluded.updated",
+            (key, state, time.time())
+        )
+
+    def claim(self, key: str) -> bool:
+        """Claim a key for processing; False if it is in progress or already done"""
+        self._claims += 1
+        if self._claims % self.prune_every == 0:
+            self._evict()
+
+        with sqlite_transaction(self.connection) as connection:
+            row = connection.execute("SELECT state, updated FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+            if row and self._held(row[0], time.time() - row[1]):
+                return False
+            self._put(key, "processing")
+            return True
+
+    def renew(self, key: str):
+        self.connection.execute(
+            "UPDATE idempotency_keys SET updated = ? WHERE key = ? AND state = 'processing'", (time.time(), key)
+        )
+
+    def complete(self, key: str):
+        self._put(key, "done")
+
+    def fail(self, key: str):
+        self._put(key, "failed")
+
+    def release(self, key: str):
+        self.connection.execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+
+    def state(self, key: str) -> Optional[str]:
+        row = self.connection.execute("SELECT state FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _evict(self):
+        self.connection.execute("DELETE FROM idempotency_keys WHERE updated < ?", (time.time() - self.ttl_seconds,))
+
+class WebhookQueue:
+    """Async work queue for webhook events with retry and dead-letter handling
+
+    Webhook endpoints verify the event, `submit` it and return immediately; worker
+    tasks run the handler off the request path. Failed jobs are retried with
+    exponential backoff and moved to `dead_letters` after `max_attempts`.
+    """
+
+    def __init__(
+        self,
+        store: IdempotencyStore,
+        workers: int = 2,
+        max_attempts: int = 5,
+        base_delay: float = 0.5,
+        max_size: int = 10_000
+    ):
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_size = max_size
+        self.dead_letters = deque(maxlen=1000)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._retrying = 0
+
+    @property
+    def depth(self) -> int:
+        """Jobs waiting to run, including those scheduled for retry"""
+        return (self._queue.qsize() if self._queue else 0) + self._retrying
+
+    def submit(self, key: str, handler: Callable[[Dict[str, Any]], Awaitable[None]], payload: Dict[str, Any]) -> bool:
+        """Queue an event for processing; False if the key was already seen"""
+        if not self.store.claim(key):
+            return False
+
+        self._ensure_started()
+        job = {"key": key, "handler": handler, "payload": payload, "attempts": 0, "queued_at": datetime.utcnow()}
+
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            # Let Stripe redeliver later instead of dropping the event
+            self.store.fail(key)
+            raise
+        return True
+
+    def _ensure_started(self):
+        """Start worker tasks on first use"""
+        self._tasks = [task for task in self._tasks if not task.done()]
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                # The job may have waited in the queue or for a retry; keep the claim alive
+                self.store.renew(job["key"])
+                await job["handler"](job["payload"])
+                self.store.complete(job["key"])
+            except Exception as e:
+                job["attempts"] += 1
+                job["last_error"] = str(e)
+                self._handle_failure(job)
+            finally:
+                self._queue.task_done()
+
+    def _handle_failure(self, job: Dict[str, Any]):
+        """Schedule a retry or move the job to the dead-letter list"""
+        if job["attempts"] >= self.max_attempts:
+            print(f"❌ Webhook event {job['key']} dead-lettered after {job['attempts']} attempts: {job['last_error']}")
+            self.store.fail(job["key"])
+            job["dead_lettered_at"] = datetime.utcnow()
+            self.dead_letters.append(job)
+            return
+
+        delay = self.base_delay * (2 ** (job["attempts"] - 1))
+        print(f"⚠️  Webhook event {job['key']} failed (attempt {job['attempts']}), retrying in {delay:.1f}s")
+        self._retrying += 1
+        asyncio.get_running_loop().call_later(delay, self._requeue, job)
+
+    def _requeue(self, job: Dict[str, Any]):
+        self._retrying -= 1
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._handle_failure(job)
+
+    def retry_dead_letters(self) -> int:
+        """Requeue every dead-lettered job; returns how many were requeued"""
+        count = 0
+        while self.dead_letters:
+            job = self.dead_letters.popleft()
+            if not self.store.claim(job["key"]):
+                continue
+            job["attempts"] = 0
+            self._ensure_started()
+            self._queue.put_nowait(job)
+            count += 1
+        return count
+
+    async def stop(self, timeout: float = 5.0):
+        """Drain queued jobs (bounded by timeout) and stop the workers"""
+        if self._queue is not None and self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️  Stopping webhook queue with {self.depth} jobs pending")
+
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+# Shared by the enhanced and legacy payment routers so an event or upgrade is
+# processed once no matter which path (or, with the SQLite engine, which worker) observes it first
+_shared_db = sqlite_connection()
+idempotency_store = SQLiteIdempotencyStore(_shared_db) if _shared_db is not None else IdempotencyStore()
+webhook_queue = WebhookQueue(idempotency_store)
+queue_depth.labels("webhooks").set_function(lambda: webhook_queue.depth)
+queue_depth.labels("webhook_dead_letters").set_function(lambda: len(webhook_queue.dead_letters))
@@ -0,0 +1,38 @@
+import importlib
+import os
+from typing import List, Tuple
+from fastapi import FastAPI
+
+# Benchmarks never call the real LLM; use the deterministic local backend unless overridden
+os.environ.setdefault("LLM_BACKEND", "local")
+os.environ.setdefault("LLM_LOCAL_PROFILE", "instant")
+# Every benchmark request comes from one client; measure latency, not admission control
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("LOAD_SHEDDING_ENABLED", "false")
+
+from app.factory import PROFILES, create_app
+
+# Scenario groups and the router each one needs
+_GROUP_ROUTERS = {"payments": "enhanced_payments", "ai": "ai_chat"}
+
+def build_bench_app(profile: str = "full") -> Tuple[FastAPI, List[str]]:
+    """The app a profile deploys (create_app(profile)), with the same routers, paths and middleware
+
+    Returns (app, skipped) where skipped names route groups the profile does not
+    mount or whose optional dependencies are not installed.
+    """
+    app = create_app(profile)
+    skipped = []
+
+    for group, router in _GROUP_ROUTERS.items():
+        if router not in PROFILES[profile]["routers"]:
+            print(f"⚠️  Skipping {group} benchmarks: the {profile} profile does not mount {router}")
+            skipped.append(group)
+            continue
+        try:
+            importlib.import_module(f"app.routers.{router}")
+        except ImportError as e:
+            print(f"⚠️  Skipping {group} benchmarks: {e}")
+            skipped.append(group)
+
+    return app, skipped
@@ -0,0 +1,199 @@
+"""Microbenchmarks for MemoryCollection operations
+
+Each case runs one operation or query shape against a collection of a given
+size, indexed the way init_database indexes the real collections, and reports
+the median time per operation over several repeats.
+
+    cd backend
+    python -m benchmarks.microbench                              # 1k, 10k, 100k; compare with the stored baseline
+    python -m benchmarks.microbench --sizes 1000 1000000         # include 1M documents
+    python -m benchmarks.microbench --update-baseline            # store this run as the new baseline
+
+Baselines are machine-specific; regenerate them on the hardware you compare on.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from datetime import datetime, timedelta
+
+from app import database
+from app.database import MemoryCollection
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "memory_collection.json")
+COLLECTION_NAME = "microbench"
+DOCS_PER_USER = 50
+CATEGORIES = ["stretch_mobility", "breath_stress", "mindset_growth", "strength", "workplace", "pain_performance"]
+
+async def build_collection(size: int, seed: int = 7) -> MemoryCollection:
+    """Fresh collection of `size` behavior-like documents with production-style indexes"""
+    database._memory_db[COLLECTION_NAME] = {}
+    collection = MemoryCollection(COLLECTION_NAME)
+    await collection.create_index("email")
+    await collection.create_index("user_id")
+    await collection.create_index([("user_id", 1), ("timestamp", -1)])
+
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    documents = []
+    for i in range(size):
+        documents.append({
+            "_id": f"doc-{i}",
+            "email": f"user{i}@example.com",
+            "user_id": f"user-{i // DOCS_PER_USER}",
+            "category": rng.choice(CATEGORIES),
+            "points": rng.randint(0, 10_000),
+            "tags": [rng.choice(CATEGORIES)],
+            "timestamp": start + timedelta(seconds=rng.randint(0, 90 * 86400))
+        })
+    await collection.insert_many(documents)
+    return collection
+
+def cases(size: int) -> Dict[str, Callable[[MemoryCollection, random.Random], Awaitable[Any]]]:
+    """Operation name -> coroutine function running one operation"""
+    users = max(size // DOCS_PER_USER, 1)
+    since = datetime(2025, 3, 1)
+
+    def doc_id(rng):
+        return f"doc-{rng.randrange(size)}"
+
+    def user_id(rng):
+        return f"user-{rng.randrange(users)}"
+
+    return {
+        "find_one._id": lambda c, rng: c.find_one({"_id": doc_id(rng)}),
+        "find_one.indexed": lambda c, rng: c.find_one({"email": f"user{rng.randrange(size)}@example.com"}),
+        "find_one.unindexed": lambda c, rng: c.find_one({"points": -1}),
+        "find.indexed.sort.limit": lambda c, rng: c.find({"user_id": user_id(rng)}).sort("timestamp", -1).limit(10).to_list(10),
+        "find.indexed.range": lambda c, rng: c.find({"user_id": user_id(rng), "timestamp": {"$gte": since}}).to_list(None),
+        "find.unindexed.sort.limit": lambda c, rng: c.find({"category": rng.choice(CATEGORIES)}).sort("points", -1).limit(10).to_list(10),
+        "update_one.$set": lambda c, rng: c.update_one({"_id": doc_id(rng)}, {"$set": {"category": rng.choice(CATEGORIES)}}),
+        "update_one.$inc": lambda c, rng: c.update_one({"email": f"user{rng.randrange(size)}@example.com"}, {"$inc": {"points": 5}}),
+        "update_one.$addToSet": lambda c, rng: c.update_one({"_id": doc_id(rng)}, {"$addToSet": {"tags": rng.choice(CATEGORIES)}}),
+        "update_one.$pull": lambda c, rng: c.update_one({"_id": doc_id(rng)}, {"$pull": {"tags": rng.choice(CATEGORIES)}}),
+        "update_one.upsert.existing": lambda c, rng: c.update_one({"user_id": user_id(rng)}, {"$inc": {"points": 1}}, upsert=True),
+        "update_one.upsert.new": lambda c, rng: c.update_one({"user_id": f"new-{rng.getrandbits(64)}"}, {"$set": {"points": 0}}, upsert=True),
+        "insert_one": lambda c, rng: c.insert_one({"user_id": user_id(rng), "email": f"new{rng.getrandbits(64)}@example.com", "points": 0, "timestamp": since}),
+    }
+
+async def measure(collection: MemoryCollection, operation, min_time: float, repeats: int, seed: int = 11) -> Dict[str, Any]:
+    """Median and best microseconds per operation across `repeats` timed batches"""
+    rng = random.Random(seed)
+
+    # Calibrate the batch size so each repeat runs for about min_time
+    iterations, elapsed = 1, 0.0
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await operation(collection, rng)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 4 or iterations >= 1_000_000:
+            break
+        iterations *= 4
+    iterations = max(1, int(iterations * min_time / max(elapsed, 1e-9)))
+
+    per_op = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await operation(collection, rng)
+        per_op.append((time.perf_counter() - start) / iterations * 1e6)
+
+    return {
+        "us_per_op": round(statistics.median(per_op), 3),
+        "best_us_per_op": round(min(per_op), 3),
+        "iterations": iterations,
+        "repeats": repeats
+    }
+
+async def run(sizes: List[int], only: Optional[List[str]], min_time: float, repeats: int) -> Dict[str, Any]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for size in sizes:
+        build_start = time.perf_counter()
+        collection = await build_collection(size)
+        print(f"\n📦 {size:,} documents (built in {time.perf_counter() - build_start:.1f}s)")
+        for name, operation in cases(size).items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            result = await measure(collection, operation, min_time, repeats)
+            results.setdefault(str(size), {})[name] = result
+            print(f"   {name:<28} {result['us_per_op']:>12.2f} µs/op")
+    database._memory_db.pop(COLLECTION_NAME, None)
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "min_time": min_time,
+            "repeats": repeats
+        },
+        "results": results
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print a comparison report; returns "size/case" keys slower than baseline by more than `threshold`"""
+    regressions = []
+    print(f"\n{'size':>9} {'case':<28} {'baseline µs':>12} {'current µs':>12} {'change':>8}")
+    for size, size_results in current["results"].items():
+        for name, result in size_results.items():
+            previous = baseline.get("results", {}).get(size, {}).get(name)
+            if not previous:
+                print(f"{int(size):>9,} {name:<28} {'-':>12} {result['us_per_op']:>12.2f} {'new':>8}")
+                continue
+            change = (result["us_per_op"] - previous["us_per_op"]) / previous["us_per_op"]
+            flag = ""
+            if change > threshold:
+                regressions.append(f"{size}/{name}")
+                flag = "  ⚠️  regression"
+            elif change < -threshold:
+                flag = "  🚀 faster"
+            print(f"{int(size):>9,} {name:<28} {previous['us_per_op']:>12.2f} {result['us_per_op']:>12.2f} {change:>+7.1%}{flag}")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmark MemoryCollection operations")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="collection sizes to test")
+    parser.add_argument("--only", nargs="*", help="case name prefixes to run (e.g. find update_one.$inc)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timed repeat")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline instead of comparing")
+    args = parser.parse_args(argv)
+
+    current = asyncio.run(run(args.sizes, args.only, args.min_time, args.repeats))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\n📌 Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} case(s) regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
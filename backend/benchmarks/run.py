@@ -0,0 +1,211 @@
+"""In-process API benchmark for the Team Welly backend
+
+Requests go through httpx's ASGI transport straight into the app, so the
+numbers measure handler, middleware and database cost without any network.
+
+    cd backend
+    python -m benchmarks.run --users 200 --requests 500 --concurrency 20 --output bench.json
+    python -m benchmarks.run --compare bench.json        # exit 1 on regressions
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from datetime import datetime
+
+from .app import build_bench_app
+from .seed import seed_data, PROGRAM_IDS
+
+# name -> (group, request builder); builders take (account, accounts, i) and return (method, path, json body)
+Scenario = Callable[[Dict[str, Any], List[Dict[str, Any]], int], Tuple[str, str, Optional[Dict[str, Any]]]]
+
+SCENARIOS: Dict[str, Tuple[str, Scenario]] = {
+    "auth.login": ("auth", lambda a, _, i: ("POST", "/api/auth/login", {"email": a["email"], "password": "bench"})),
+    "auth.me": ("auth", lambda a, _, i: ("GET", "/api/auth/me", None)),
+    "programs.list": ("programs", lambda a, _, i: ("GET", "/api/programs/", None)),
+    "programs.detail": ("programs", lambda a, _, i: ("GET", f"/api/programs/{PROGRAM_IDS[i % len(PROGRAM_IDS)]}", None)),
+    "programs.start": ("programs", lambda a, _, i: ("POST", f"/api/programs/{PROGRAM_IDS[i % len(PROGRAM_IDS)]}/start", None)),
+    "programs.recommendations": ("programs", lambda a, _, i: ("GET", "/api/programs/recommendations", None)),
+    "programs.category_stats": ("programs", lambda a, _, i: ("GET", "/api/programs/categories/stats", None)),
+    "analytics.user": ("analytics", lambda a, _, i: ("GET", "/api/analytics/user", None)),
+    "analytics.behavior": ("analytics", lambda a, _, i: ("GET", "/api/analytics/behavior?days=30", None)),
+    "analytics.progress": ("analytics", lambda a, _, i: ("GET", "/api/analytics/progress", None)),
+    "analytics.wellness_score": ("analytics", lambda a, _, i: ("GET", "/api/analytics/wellness-score", None)),
+    "payments.packages": ("payments", lambda a, _, i: ("GET", "/api/payments/packages", None)),
+    "payments.history": ("payments", lambda a, _, i: ("GET", f"/api/payments/history?user_id={a['id']}", None)),
+    "payments.history_batch": ("payments", lambda a, accounts, i: (
+        "POST", "/api/payments/history/batch",
+        {"user_ids": [acc["id"] for acc in accounts if acc["company_id"] == a["company_id"]][:100], "limit": 10}
+    )),
+    "ai.chat": ("ai", lambda a, _, i: ("POST", "/api/ai/chat", {"user_id": a["id"], "message": "How can I sleep better?", "session_id": f"bench-{a['id']}"})),
+    "ai.insights": ("ai", lambda a, _, i: ("GET", "/api/ai/insights", None)),
+    "ai.motivation": ("ai", lambda a, _, i: ("GET", "/api/ai/motivation", None)),
+}
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies: List[float], statuses: Dict[int, int], wall_seconds: float) -> Dict[str, Any]:
+    values = sorted(latency * 1000 for latency in latencies)
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(values) / wall_seconds, 1) if wall_seconds else 0.0,
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0
+    }
+
+async def run_scenario(client, build: Scenario, accounts: List[Dict[str, Any]], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Issue `requests` requests with at most `concurrency` in flight, rotating through users"""
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            account = accounts[i % len(accounts)]
+            method, path, body = build(account, accounts, i)
+            headers = {"Authorization": f"Bearer {account['token']}"}
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+async def run_benchmarks(args) -> Dict[str, Any]:
+    app, skipped = build_bench_app(args.profile)
+    # Start and stop the app as the server would: database, caches and background workers
+    async with app.router.lifespan_context(app):
+        return await _run_benchmarks(app, skipped, args)
+
+async def _run_benchmarks(app, skipped: List[str], args) -> Dict[str, Any]:
+    import httpx
+
+    seed_start = time.perf_counter()
+    accounts = await seed_data(
+        users=args.users,
+        behaviors_per_user=args.behaviors,
+        chats_per_user=args.chats,
+        payments_per_user=args.payments,
+        seed=args.seed
+    )
+    seed_seconds = time.perf_counter() - seed_start
+
+    selected = [
+        name for name, (group, _) in SCENARIOS.items()
+        if group not in skipped and (not args.only or any(name.startswith(prefix) for prefix in args.only))
+    ]
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in selected:
+            build = SCENARIOS[name][1]
+            if args.warmup:
+                await run_scenario(client, build, accounts, args.warmup, args.concurrency)
+            results[name] = await run_scenario(client, build, accounts, args.requests, args.concurrency)
+            print(f"{name:<28} p50 {results[name]['p50_ms']:>8.2f}ms  p95 {results[name]['p95_ms']:>8.2f}ms  "
+                  f"p99 {results[name]['p99_ms']:>8.2f}ms  {results[name]['throughput_rps']:>8.1f} req/s"
+                  f"{'  (' + str(results[name]['errors']) + ' errors)' if results[name]['errors'] else ''}")
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "llm_backend": os.getenv("LLM_BACKEND"),
+            "skipped_groups": skipped,
+            "seed_seconds": round(seed_seconds, 3),
+            "config": {
+                "users": args.users,
+                "behaviors_per_user": args.behaviors,
+                "chats_per_user": args.chats,
+                "payments_per_user": args.payments,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "warmup": args.warmup,
+                "seed": args.seed
+            }
+        },
+        "scenarios": results
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, metric: str = "p95_ms") -> List[str]:
+    """Print a comparison table; returns the scenarios that regressed by more than `threshold`"""
+    regressions = []
+    print(f"\n{'scenario':<28} {'baseline':>10} {'current':>10} {'change':>8}  ({metric})")
+    for name, result in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None or not previous.get(metric):
+            print(f"{name:<28} {'-':>10} {result[metric]:>10.2f} {'new':>8}")
+            continue
+        change = (result[metric] - previous[metric]) / previous[metric]
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  ⚠️  regression"
+        print(f"{name:<28} {previous[metric]:>10.2f} {result[metric]:>10.2f} {change:>+7.1%}{flag}")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Team Welly API routes in-process")
+    parser.add_argument("--profile", default="full", help="app profile to benchmark (extended adds payments and AI)")
+    parser.add_argument("--users", type=int, default=100, help="synthetic users to seed")
+    parser.add_argument("--behaviors", type=int, default=50, help="behavior events per user")
+    parser.add_argument("--chats", type=int, default=5, help="chat messages per user")
+    parser.add_argument("--payments", type=int, default=2, help="payment transactions per user")
+    parser.add_argument("--requests", type=int, default=300, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight per scenario")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for synthetic data")
+    parser.add_argument("--only", nargs="*", help="scenario name prefixes to run (e.g. analytics programs.list)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed p95 slowdown before failing (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_benchmarks(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📊 Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} scenario(s) regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\n✅ No regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import random
+import uuid
+from typing import Dict, Any, List
+from datetime import datetime, timedelta
+from app.auth import create_access_token
+from app.database import (
+    users_collection,
+    user_sessions_collection,
+    user_progress_collection,
+    user_behavior_collection,
+    chat_history_collection,
+    payment_transactions_collection
+)
+
+ACTIONS = ["login", "start_program", "complete_program", "chat_interaction", "bookmark_program", "complete_challenge"]
+PAGES = ["dashboard", "programs", "challenges", "ai_chat", "profile"]
+GOALS = ["stress_management", "mobility", "nutrition", "sleep", "fitness"]
+PROGRAM_IDS = ["stretch_mobility_1", "breath_stress_1", "mindset_growth_1", "strength_1", "workplace_1", "pain_performance_1"]
+PACKAGES = {"basic": 9.99, "plus": 19.99, "premium": 39.99}
+
+async def seed_data(
+    users: int = 100,
+    behaviors_per_user: int = 50,
+    chats_per_user: int = 5,
+    payments_per_user: int = 2,
+    days: int = 30,
+    seed: int = 42
+) -> List[Dict[str, Any]]:
+    """Insert synthetic users with behavior, chat and payment history
+
+    Returns one {"id", "email", "company_id", "token"} entry per user for authenticated requests.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    accounts = []
+
+    def recent(max_days: int = days) -> datetime:
+        return now - timedelta(seconds=rng.randint(0, max_days * 86400))
+
+    for i in range(users):
+        user_id = f"bench-user-{i}"
+        email = f"bench{i}@example.com"
+        company_id = f"company-{i % 10}"
+        await users_collection.insert_one({
+            "_id": user_id,
+            "id": user_id,
+            "email": email,
+            "name": f"Bench User {i}",
+            # Company admins, so every token can call batch payment history
+            "role": "corporate_admin",
+            "plan": rng.choice(list(PACKAGES)),
+            "company_id": company_id,
+            "created_at": now - timedelta(days=days),
+            "updated_at": now,
+            "is_active": True,
+            "onboarding_completed": True,
+            "selected_goals": rng.sample(GOALS, 2),
+            "assessment_data": {"stress_level": rng.randint(1, 10)}
+        })
+
+        completed = rng.sample(PROGRAM_IDS, rng.randint(0, len(PROGRAM_IDS)))
+        await user_progress_collection.insert_one({
+            "user_id": user_id,
+            "daily_completion": rng.random(),
+            "weekly_completion": rng.random(),
+            "monthly_completion": rng.random(),
+            "welly_points": rng.randint(0, 5000),
+            "current_streak": rng.randint(0, 30),
+            "completed_programs": completed,
+            "bookmarked_programs": rng.sample(PROGRAM_IDS, 1),
+            "completed_challenges": [],
+            "last_activity": recent(2),
+            "updated_at": now
+        })
+
+        for _ in range(behaviors_per_user):
+            await user_behavior_collection.insert_one({
+                "user_id": user_id,
+                "action": rng.choice(ACTIONS),
+                "page": rng.choice(PAGES),
+                "details": {"program_id": rng.choice(PROGRAM_IDS)},
+                "timestamp": recent(),
+                "session_id": None
+            })
+
+        session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        for n in range(chats_per_user):
+            await chat_history_collection.insert_one({
+                "user_id": user_id,
+                "session_id": session_id,
+                "user_message": f"Question {n} about {rng.choice(GOALS)}",
+                "ai_response": "Keep going, small steps add up.",
+                "timestamp": recent()
+            })
+
+        for _ in range(payments_per_user):
+            package_id = rng.choice(list(PACKAGES))
+            created_at = recent()
+            await payment_transactions_collection.insert_one({
+                "payment_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "session_id": f"cs_bench_{uuid.UUID(int=rng.getrandbits(128)).hex}",
+                "user_id": user_id,
+                "package_id": package_id,
+                "amount": PACKAGES[package_id],
+                "currency": "usd",
+                "status": "complete",
+                "payment_status": "paid",
+                "metadata": {"package_id": package_id},
+                "created_at": created_at,
+                "updated_at": created_at
+            })
+
+        token = await create_access_token(data={"sub": user_id})
+        # /api/auth/me looks the bearer token up as a session; register the JWT as one
+        await user_sessions_collection.insert_one({
+            "user_id": user_id,
+            "session_token": token,
+            "created_at": now,
+            "expires_at": now + timedelta(days=7),
+            "active": True
+        })
+        accounts.append({"id": user_id, "email": email, "company_id": company_id, "token": token})
+
+    return accounts
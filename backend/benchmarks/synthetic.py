@@ -0,0 +1,380 @@
+"""Synthetic data generator for scale-testing the database and analytics code
+
+Generates users with realistic activity: each user gets an archetype (how
+often and how much they use the app), a chronotype (when in the day they are
+active) and day-to-day persistence, so activity comes in streaks with gaps
+instead of uniform noise. Behavior events use the action mix and details that
+BehaviorTracker understands, and each user's progress document (points,
+streak, completed programs/challenges) is derived from their own events.
+
+    cd backend
+    python -m benchmarks.synthetic --users 20000 --days 90 --jsonl data/        # ~millions of events to disk
+    python -m benchmarks.synthetic --users 2000 --days 30                      # into the in-memory collections
+
+Output goes straight into the MemoryCollections or to one JSONL file per
+collection (datetimes as {"$date": ...}), which `load_jsonl` reads back.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Iterator
+from datetime import datetime, timedelta
+
+from app.activity_calendar import ActivityCalendar
+from app.behavior_tracker import ACTION_POINTS
+from app import database
+
+# Archetypes: share of users, probability of being active tomorrow given active/inactive today,
+# mean events per active day, and chance the user churns partway through the window
+ARCHETYPES = {
+    "power": {"weight": 0.05, "stay": 0.95, "return": 0.7, "events": 18, "churn": 0.02},
+    "daily": {"weight": 0.20, "stay": 0.85, "return": 0.5, "events": 9, "churn": 0.05},
+    "regular": {"weight": 0.35, "stay": 0.65, "return": 0.3, "events": 6, "churn": 0.15},
+    "casual": {"weight": 0.30, "stay": 0.35, "return": 0.12, "events": 4, "churn": 0.30},
+    "lapsed": {"weight": 0.10, "stay": 0.5, "return": 0.2, "events": 5, "churn": 1.0}
+}
+
+# Peak hour and spread (hours) of each chronotype, with its share of users
+CHRONOTYPES = {
+    "early": {"weight": 0.3, "peak": 6.5, "spread": 1.0},
+    "lunch": {"weight": 0.25, "peak": 12.5, "spread": 1.0},
+    "evening": {"weight": 0.35, "peak": 19.5, "spread": 1.5},
+    "night": {"weight": 0.1, "peak": 23.0, "spread": 1.5}
+}
+
+# Actions after the login that opens each session, with their pages
+ACTION_MIX = [
+    ("view_program", "programs", 0.28),
+    ("start_program", "programs", 0.14),
+    ("complete_program", "programs", 0.10),
+    ("chat_interaction", "ai_chat", 0.14),
+    ("bookmark_program", "programs", 0.05),
+    ("complete_challenge", "challenges", 0.05),
+    ("book_session", "coaching", 0.02),
+    ("page_view", "dashboard", 0.22)
+]
+
+GOALS = ["stress_management", "mobility", "strength", "mindset", "sleep", "nutrition"]
+CHAT_PROMPTS = [
+    "How do I stay consistent?", "Any tips for neck pain at my desk?", "I feel stressed today",
+    "What should I do after a long run?", "Can you suggest a short breathing exercise?"
+]
+
+def _weighted(rng: random.Random, table: Dict[str, Dict[str, Any]]) -> str:
+    names = list(table)
+    return rng.choices(names, weights=[table[name]["weight"] for name in names])[0]
+
+def _poisson(rng: random.Random, mean: float) -> int:
+    """Knuth's method; means here are small"""
+    limit, k, p = math.exp(-mean), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+class SyntheticGenerator:
+    """Deterministic per-user generator; user i is the same for a given seed regardless of batch size"""
+
+    def __init__(
+        self,
+        users: int,
+        days: int = 90,
+        seed: int = 1,
+        end: Optional[datetime] = None,
+        programs: Optional[List[Dict[str, Any]]] = None,
+        challenges: Optional[List[Dict[str, Any]]] = None,
+        companies: int = 50
+    ):
+        self.users = users
+        self.days = days
+        self.seed = seed
+        self.end = end or datetime.utcnow()
+        self.programs = programs or [{"id": "stretch_mobility_1", "category": "stretch_mobility", "title": "Stretch"}]
+        self.challenges = challenges or [{"id": "daily_stretch", "points": 50}]
+        self.companies = companies
+
+    def generate_user(self, index: int) -> Dict[str, List[Dict[str, Any]]]:
+        """All documents for one user, keyed by collection name"""
+        rng = random.Random(f"{self.seed}:{index}")
+        archetype_name = _weighted(rng, ARCHETYPES)
+        archetype = ARCHETYPES[archetype_name]
+        chronotype = CHRONOTYPES[_weighted(rng, CHRONOTYPES)]
+        # Office workers are less active at weekends
+        weekend_factor = rng.choice([0.5, 0.8, 1.0, 1.2])
+        intensity = rng.lognormvariate(0, 0.4)
+
+        user_id = f"synthetic-{index}"
+        start_day = (self.end - timedelta(days=rng.randint(1, self.days))).date()
+        churn_day = None
+        if rng.random() < archetype["churn"]:
+            span = (self.end.date() - start_day).days
+            churn_day = start_day + timedelta(days=rng.randint(0, max(span, 0)))
+
+        user = {
+            "_id": user_id,
+            "email": f"user{index}@synthetic.teamwelly.test",
+            "name": f"Synthetic User {index}",
+            "role": "corporate" if rng.random() < 0.6 else "individual",
+            "plan": rng.choices(["basic", "plus", "premium"], weights=[0.6, 0.3, 0.1])[0],
+            "company_id": f"company-{rng.randrange(self.companies)}" if self.companies else None,
+            "created_at": datetime.combine(start_day, datetime.min.time()) + timedelta(hours=chronotype["peak"]),
+            "is_active": churn_day is None,
+            "onboarding_completed": True,
+            "selected_goals": rng.sample(GOALS, rng.randint(1, 3)),
+            "assessment_data": {"stress_level": rng.randint(1, 10), "activity_level": archetype_name},
+            "synthetic_profile": {"archetype": archetype_name, "peak_hour": chronotype["peak"]}
+        }
+
+        behaviors, chats, sessions = [], [], []
+        started, completed_programs, bookmarked, completed_challenges = [], set(), set(), set()
+        points, last_activity = 0, None
+        active = True
+        day = start_day
+
+        while day <= self.end.date():
+            if churn_day is not None and day > churn_day:
+                break
+            if active:
+                mean = archetype["events"] * intensity * (weekend_factor if day.weekday() >= 5 else 1.0)
+                session_start = datetime.combine(day, datetime.min.time()) + timedelta(
+                    hours=min(max(rng.gauss(chronotype["peak"], chronotype["spread"]), 0.0), 23.5)
+                )
+                if session_start <= self.end:
+                    session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+                    moment = session_start
+                    for n in range(1 + _poisson(rng, max(mean - 1, 0.1))):
+                        if moment > self.end:
+                            break
+                        if n == 0:
+                            action, page, details = "login", "auth", {"method": "email"}
+                        else:
+                            action, page, details = self._next_action(rng, started)
+
+                        if action == "start_program":
+                            started.append(details["program_id"])
+                        elif action == "complete_program":
+                            completed_programs.add(details["program_id"])
+                        elif action == "bookmark_program":
+                            bookmarked.add(details["program_id"])
+                        elif action == "complete_challenge":
+                            completed_challenges.add(details["challenge_id"])
+
+                        awarded = details["challenge_points"] if action == "complete_challenge" else ACTION_POINTS.get(action, 0)
+                        if awarded:
+                            points += awarded
+                            last_activity = moment
+
+                        behaviors.append({
+                            "user_id": user_id,
+                            "action": action,
+                            "page": page,
+                            "details": details,
+                            "timestamp": moment,
+                            "session_id": session_id
+                        })
+                        if action == "chat_interaction":
+                            chats.append({
+                                "user_id": user_id,
+                                "session_id": session_id,
+                                "user_message": rng.choice(CHAT_PROMPTS),
+                                "ai_response": "Small, steady steps add up. Let's pick one thing for today.",
+                                "timestamp": moment,
+                                "user_context": {"goals": user["selected_goals"], "welly_points": points}
+                            })
+                        # Gaps between actions within a session average 90 seconds
+                        moment += timedelta(seconds=rng.expovariate(1 / 90))
+
+                    # Only sessions younger than their 7-day lifetime still exist
+                    if self.end - session_start < timedelta(days=7):
+                        sessions.append({
+                            "user_id": user_id,
+                            "session_token": session_id,
+                            "created_at": session_start,
+                            "expires_at": session_start + timedelta(days=7),
+                            "active": True
+                        })
+            active = rng.random() < (archetype["stay"] if active else archetype["return"])
+            day += timedelta(days=1)
+
+        progress = self._progress(user_id, behaviors, points, last_activity, completed_programs, bookmarked, completed_challenges)
+        user["last_login"] = max((b["timestamp"] for b in behaviors if b["action"] == "login"), default=None)
+        user["updated_at"] = user["last_login"] or user["created_at"]
+
+        return {
+            "users": [user],
+            "user_progress": [progress],
+            "user_behavior": behaviors,
+            "chat_history": chats,
+            "sessions": sessions
+        }
+
+    def _next_action(self, rng: random.Random, started: List[str]):
+        action, page, _ = rng.choices(ACTION_MIX, weights=[weight for _, _, weight in ACTION_MIX])[0]
+        if action == "complete_program" and not started:
+            action, page = "start_program", "programs"
+
+        if action in ("view_program", "start_program", "bookmark_program"):
+            program = rng.choice(self.programs)
+            return action, page, {"program_id": program["id"], "category": program.get("category")}
+        if action == "complete_program":
+            return action, page, {"program_id": rng.choice(started[-5:])}
+        if action == "complete_challenge":
+            challenge = rng.choice(self.challenges)
+            return action, page, {"challenge_id": challenge["id"], "challenge_points": challenge.get("points", 30)}
+        if action == "chat_interaction":
+            return action, page, {"message_length": rng.randint(10, 200)}
+        if action == "book_session":
+            return action, page, {"session_type": rng.choice(["1-on-1", "group"])}
+        return action, rng.choice(["dashboard", "profile", "challenges"]), {}
+
+    def _progress(self, user_id, behaviors, points, last_activity, completed_programs, bookmarked, completed_challenges):
+        """Progress document consistent with the user's events, as BehaviorTracker would leave it"""
+        # Every event marks its day active, as in BehaviorTracker._update_progress
+        calendar = ActivityCalendar()
+        for behavior in behaviors:
+            calendar.record(behavior["timestamp"].date())
+
+        return {
+            "user_id": user_id,
+            **calendar.fields(self.end.date()),
+            "welly_points": points,
+            "completed_programs": sorted(completed_programs),
+            "bookmarked_programs": sorted(bookmarked),
+            "completed_challenges": sorted(completed_challenges),
+            "last_activity": last_activity,
+            "updated_at": last_activity or self.end
+        }
+
+    def iter_users(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict[str, List[Dict[str, Any]]]]:
+        for index in range(start, self.users if stop is None else stop):
+            yield self.generate_user(index)
+
+COLLECTIONS = {
+    "users": database.users_collection,
+    "user_progress": database.user_progress_collection,
+    "user_behavior": database.user_behavior_collection,
+    "chat_history": database.chat_history_collection,
+    "sessions": database.user_sessions_collection
+}
+
+async def write_to_collections(generator: SyntheticGenerator, batch_users: int = 500) -> Dict[str, int]:
+    """Insert generated documents into the in-memory collections in batches"""
+    counts = {name: 0 for name in COLLECTIONS}
+    batch = {name: [] for name in COLLECTIONS}
+
+    async def flush():
+        for name, documents in batch.items():
+            if documents:
+                await COLLECTIONS[name].insert_many(documents)
+                counts[name] += len(documents)
+                batch[name] = []
+
+    for n, docs in enumerate(generator.iter_users(), start=1):
+        for name, documents in docs.items():
+            batch[name].extend(documents)
+        if n % batch_users == 0:
+            await flush()
+            # Let background tasks (TTL sweeper, probes) run between batches
+            await asyncio.sleep(0)
+    await flush()
+    return counts
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _decode(document: Dict[str, Any]) -> Dict[str, Any]:
+    for key, value in document.items():
+        if isinstance(value, dict):
+            if "$date" in value and len(value) == 1:
+                document[key] = datetime.fromisoformat(value["$date"])
+            else:
+                _decode(value)
+    return document
+
+def write_jsonl(generator: SyntheticGenerator, directory: str) -> Dict[str, int]:
+    """Stream generated documents to <directory>/<collection>.jsonl without holding them in memory"""
+    os.makedirs(directory, exist_ok=True)
+    files = {name: open(os.path.join(directory, f"{name}.jsonl"), "w") for name in COLLECTIONS}
+    counts = {name: 0 for name in COLLECTIONS}
+    try:
+        for docs in generator.iter_users():
+            for name, documents in docs.items():
+                for document in documents:
+                    if "_id" not in document:
+                        document["_id"] = str(uuid.uuid4())
+                    files[name].write(json.dumps(document, default=_encode, separators=(",", ":")) + "\n")
+                counts[name] += len(documents)
+    finally:
+        for f in files.values():
+            f.close()
+    return counts
+
+async def load_jsonl(directory: str, batch_size: int = 10_000) -> Dict[str, int]:
+    """Load JSONL files written by write_jsonl into the in-memory collections"""
+    counts = {}
+    for name, collection in COLLECTIONS.items():
+        path = os.path.join(directory, f"{name}.jsonl")
+        if not os.path.exists(path):
+            continue
+        counts[name] = 0
+        batch = []
+        with open(path) as f:
+            for line in f:
+                batch.append(_decode(json.loads(line)))
+                if len(batch) >= batch_size:
+                    await collection.insert_many(batch)
+                    counts[name] += len(batch)
+                    batch = []
+        if batch:
+            await collection.insert_many(batch)
+            counts[name] += len(batch)
+    return counts
+
+async def build_generator(args) -> SyntheticGenerator:
+    """Generator using the seeded programs and challenges so IDs match the catalog"""
+    await database.init_database()
+    programs = await database.programs_collection.find().to_list(length=None)
+    challenges = await database.challenges_collection.find().to_list(length=None)
+    return SyntheticGenerator(
+        users=args.users, days=args.days, seed=args.seed,
+        programs=programs, challenges=challenges, companies=args.companies
+    )
+
+async def main_async(args) -> Dict[str, int]:
+    generator = await build_generator(args)
+    start = time.perf_counter()
+    if args.jsonl:
+        counts = write_jsonl(generator, args.jsonl)
+        target = args.jsonl
+    else:
+        counts = await write_to_collections(generator)
+        target = "memory collections"
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"✅ Generated {total:,} documents for {args.users:,} users in {elapsed:.1f}s ({total / elapsed:,.0f} docs/s) into {target}")
+    for name, count in counts.items():
+        print(f"   {name:<15} {count:>12,}")
+    return counts
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate synthetic Team Welly data")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90, help="history window in days")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--companies", type=int, default=50, help="companies corporate users are spread over")
+    parser.add_argument("--jsonl", help="write JSONL files to this directory instead of the in-memory collections")
+    args = parser.parse_args(argv)
+    asyncio.run(main_async(args))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Start the Team Welly API with one or more worker processes
+
+    python serve.py                          # server:app, WEB_CONCURRENCY workers (default 1)
+    python serve.py main:app --workers 4
+    python -m backend.serve backend.main:app # from the repository root
+
+With more than one worker the in-memory database would give every process its
+own data, so the launcher switches to the shared SQLite engine
+(DATABASE_ENGINE=sqlite, file at SQLITE_PATH) unless an engine is set
+explicitly. Workers then share collections, webhook idempotency keys and
+cache invalidations through that file.
+"""
+import argparse
+import os
+import sys
+import uvicorn
+
+def run(app: str, host: str = "0.0.0.0", port: int = None, workers: int = None):
+    port = port or int(os.getenv("PORT", "8000"))
+    workers = workers or int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    if workers > 1:
+        engine = os.environ.setdefault("DATABASE_ENGINE", "sqlite")
+        if engine == "memory":
+            print("❌ DATABASE_ENGINE=memory cannot be shared between workers; use sqlite or a single worker")
+            sys.exit(1)
+        print(f"🚀 Starting {app} with {workers} workers ({engine} database engine)")
+    else:
+        print(f"🚀 Starting {app} with a single worker")
+
+    # Workers import the app themselves, so it must be passed as an import string
+    uvicorn.run(app, host=host, port=port, workers=workers)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Start the Team Welly API")
+    parser.add_argument("app", nargs="?", default=os.getenv("APP_MODULE", "server:app"), help="import string, e.g. server:app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, help="defaults to $PORT or 8000")
+    parser.add_argument("--workers", type=int, help="defaults to $WEB_CONCURRENCY or 1")
+    args = parser.parse_args(argv)
+    run(args.app, host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
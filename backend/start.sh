@@ -12,5 +12,5 @@ echo "TWITTER_CLIENT_ID present: $(if [ -n "$TWITTER_CLIENT_ID" ]; then echo "
 echo "GOOGLE_CLIENT_ID present: $(if [ -n "$GOOGLE_CLIENT_ID" ]; then echo "✅ Yes"; else echo "❌ No"; fi)"
 
 # Start the server
-echo "🌐 Starting server with server_minimal.py..."
-python -m uvicorn server_minimal:app --host 0.0.0.0 --port $PORT
\ No newline at end of file
+echo "🌐 Starting server with main.py..."
+python serve.py main:app
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""Who may read batched payment history: company admins for their own company, never plain employees
+
+Run from backend/:  python -m pytest -q tests
+"""
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+
+enhanced_payments = pytest.importorskip("app.routers.enhanced_payments")
+
+from app.auth import create_access_token
+from app.database import companies_collection, users_collection
+from app.routers import auth
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/api/auth-legacy")
+    app.include_router(enhanced_payments.router, prefix="/api/payments")
+    return app
+
+async def _history(client: httpx.AsyncClient, token: str, user_ids):
+    return await client.post(
+        "/api/payments/history/batch",
+        json={"user_ids": user_ids},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+async def _scenario():
+    await companies_collection.update_one({"_id": "acme"}, {"$set": {"name": "Acme", "invite_code": "ACME-TEST"}}, upsert=True)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=_app()), base_url="http://test") as client:
+        employees = []
+        for email in ("employee1@acme.example.com", "employee2@acme.example.com"):
+            response = await client.post(
+                "/api/auth-legacy/api/auth/signup",
+                json={"email": email, "name": "Employee", "company_code": "ACME-TEST"}
+            )
+            assert response.status_code == 200, response.text
+            assert response.json()["user"]["role"] == "corporate"
+            employees.append(response.json())
+
+        await users_collection.insert_one({
+            "_id": "acme-admin", "email": "admin@acme.example.com", "name": "Admin",
+            "role": "corporate_admin", "company_id": "acme"
+        })
+        await users_collection.insert_one({"_id": "outsider", "email": "outsider@other.example.com", "name": "Outsider", "company_id": "other"})
+        admin_token = await create_access_token({"sub": "acme-admin"})
+        coworker_id = employees[1]["user"]["id"]
+
+        return (
+            await _history(client, employees[0]["access_token"], [coworker_id]),
+            await _history(client, admin_token, [coworker_id]),
+            await _history(client, admin_token, [coworker_id, "outsider"])
+        )
+
+def test_batch_history_is_limited_to_company_admins():
+    employee, admin, admin_outside_company = asyncio.run(_scenario())
+
+    # A plain employee who joined with the invite code cannot read a coworker's payments
+    assert employee.status_code == 403
+    assert admin.status_code == 200
+    assert admin_outside_company.status_code == 403
@@ -8,9 +8,9 @@ sys.path.append('/app')
 sys.path.append('/app/backend')
 
 # Import the app from backend
-from backend.twitter_oauth_server import app
+from backend.main import app
 
 if __name__ == "__main__":
-    import uvicorn
-    port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    # WEB_CONCURRENCY > 1 starts several workers sharing a SQLite database
+    from backend.serve import run
+    run("backend.main:app")
\ No newline at end of file
@@ -12,4 +12,4 @@ echo "🔧 Checking if backend module exists..."
 python -c "import backend.main; print('✅ Backend module found')" || echo "❌ Backend module not found"
 
 echo "🌐 Starting server..."
-python -m uvicorn backend.main:app --host 0.0.0.0 --port $PORT
\ No newline at end of file
+python -m backend.serve backend.main:app
\ No newline at end of file